@@ -1,8 +1,16 @@
 from flask import Flask, request
-from queue import Queue
-from services.webhook import send_webhook
-import threading
+from services.webhook import send_webhook, start_dispatcher
+from services.job_executor import JobExecutor
+from services.whisper_models import preload_models
+from services.font_catalog import load_font_catalog
+from services.gcp_toolkit import get_gcs_client
+from services.transcription import sentence_tokenizer
+from services.encoding_profiles import available_video_encoder
+from services.startup import start_warmup, mark_serving
+from services.job_registry import register_job, mark_job_running, complete_job
+from services.scheduler import DEFAULT_PRIORITY, DEFAULT_JOB_COST, get_flow, get_flow_weight
 import uuid
+import inspect
 import os
 import time
 from version import BUILD_NUMBER  # Import the BUILD_NUMBER
@@ -16,55 +24,73 @@ def create_app():
     app = Flask(__name__)
     CORS(app)
 
-    # Create a queue to hold tasks
-    task_queue = Queue()
-    queue_id = id(task_queue)  # Generate a single queue_id for this worker
-
-    # Function to process tasks from the queue
-    def process_queue():
-        while True:
-            job_id, data, task_func, queue_start_time = task_queue.get()
-            queue_time = time.time() - queue_start_time
-            run_start_time = time.time()
-            pid = os.getpid()  # Get the PID of the actual processing thread
-            response = task_func()
-            run_time = time.time() - run_start_time
-            total_time = time.time() - queue_start_time
-
-            response_data = {
-                "endpoint": response[1],
-                "code": response[2],
-                "id": data.get("id"),
-                "job_id": job_id,
-                "response": response[0] if response[2] == 200 else None,
-                "message": "success" if response[2] == 200 else response[0],
-                "pid": pid,
-                "queue_id": queue_id,
-                "run_time": round(run_time, 3),
-                "queue_time": round(queue_time, 3),
-                "total_time": round(total_time, 3),
-                "queue_length": task_queue.qsize(),
-                "build_number": BUILD_NUMBER
-            }
-
-            send_webhook(data.get("webhook_url"), response_data)
-            task_queue.task_done()
-
-    # Start the queue processing in a separate thread
-    threading.Thread(target=process_queue, daemon=True).start()
-
-    # Decorator to add tasks to the queue or bypass it
-    def queue_task(bypass_queue=False):
+    # Function to process a single job pulled from one of the executor pools
+    def process_job(job, pool):
+        job_id = job['job_id']
+        data = job['data']
+        queue_time = time.time() - job['queue_start_time']
+        run_start_time = time.time()
+        pid = os.getpid()  # Get the PID of the actual processing thread
+        mark_job_running(job_id)
+        # Queued jobs only carry the endpoint name so they can be stored durably
+        # and picked up by any worker; resolve the undecorated view function here.
+        task_func = inspect.unwrap(app.view_functions[job['endpoint']])
+        try:
+            response = task_func(job_id=job_id, data=data, **job['view_args'])
+        except Exception as e:
+            logging.error("Job %s: Unhandled exception: %s", job_id, traceback.format_exc())
+            response = (str(e), job['path'], 500)
+        run_time = time.time() - run_start_time
+        total_time = time.time() - job['queue_start_time']
+        # Endpoints may return a fourth element with extra fields for the response
+        extra = response[3] if len(response) > 3 else {}
+
+        response_data = {
+            "endpoint": response[1],
+            "code": response[2],
+            "id": data.get("id"),
+            "job_id": job_id,
+            "response": response[0] if response[2] == 200 else None,
+            "message": "success" if response[2] == 200 else response[0],
+            "pid": pid,
+            "queue_id": queue_id,
+            "pool": pool.name,
+            "run_time": round(run_time, 3),
+            "queue_time": round(queue_time, 3),
+            "total_time": round(total_time, 3),
+            "queue_length": pool.queue_length(),
+            "build_number": BUILD_NUMBER,
+            **extra
+        }
+
+        complete_job(job_id, response_data)
+        send_webhook(data.get("webhook_url"), response_data)
+
+    # Start the worker pools that drain queued jobs
+    executor = JobExecutor(process_job)
+    queue_id = id(executor)  # Generate a single queue_id for this worker
+    executor.start()
+    # Deliver any webhooks left in the outbox by a previous run
+    start_dispatcher()
+    # Import heavy dependencies and warm caches in the background so the worker answers
+    # health checks right away; each step also runs on first use if a request needs it first
+    start_warmup([load_font_catalog, available_video_encoder, get_gcs_client, 'boto3', sentence_tokenizer, 'whisper', preload_models])
+
+    # Decorator to add tasks to the queue or bypass it. With follow, the task is always
+    # queued and follow(job_id, data) builds the response that tracks it instead of a 202
+    def queue_task(bypass_queue=False, follow=None):
         def decorator(f):
             def wrapper(*args, **kwargs):
                 job_id = str(uuid.uuid4())
                 data = request.json if request.is_json else {}
                 pid = os.getpid()  # Get PID for non-queued tasks
                 start_time = time.time()
+                pool = executor.get_pool(request.path)
                 
-                if bypass_queue or 'webhook_url' not in data:
+                if follow is None and (bypass_queue or 'webhook_url' not in data):
                     response = f(job_id=job_id, data=data, *args, **kwargs)
                     run_time = time.time() - start_time
+                    extra = response[3] if len(response) > 3 else {}
                     return {
                         "code": response[2],
                         "id": data.get("id"),
@@ -76,11 +102,13 @@ def create_app():
                         "total_time": round(run_time, 3),
                         "pid": pid,
                         "queue_id": queue_id,
-                        "queue_length": task_queue.qsize(),
-                        "build_number": BUILD_NUMBER
+                        "pool": pool.name,
+                        "queue_length": pool.queue_length(),
+                        "build_number": BUILD_NUMBER,
+                        **extra
                     }, response[2]
                 else:
-                    if MAX_QUEUE_LENGTH > 0 and task_queue.qsize() >= MAX_QUEUE_LENGTH:
+                    if MAX_QUEUE_LENGTH > 0 and pool.queue_length() >= MAX_QUEUE_LENGTH:
                         return {
                             "code": 429,
                             "id": data.get("id"),
@@ -88,12 +116,29 @@ def create_app():
                             "message": f"MAX_QUEUE_LENGTH ({MAX_QUEUE_LENGTH}) reached",
                             "pid": pid,
                             "queue_id": queue_id,
-                            "queue_length": task_queue.qsize(),
+                            "pool": pool.name,
+                            "queue_length": pool.queue_length(),
                             "build_number": BUILD_NUMBER
                         }, 429
                     
-                    task_queue.put((job_id, data, lambda: f(job_id=job_id, data=data, *args, **kwargs), start_time))
-                    
+                    client = request.headers.get('X-Client-Id', 'default')
+                    priority = data.get("priority", DEFAULT_PRIORITY)
+                    register_job(job_id, request.path, pool.name, data.get("id"), start_time)
+                    pool.submit({
+                        "job_id": job_id,
+                        "data": data,
+                        "endpoint": request.endpoint,
+                        "path": request.path,
+                        "view_args": kwargs,
+                        "queue_start_time": start_time,
+                        "priority": priority,
+                        "flow": get_flow(client, request.path),
+                        "weight": get_flow_weight(client, request.path),
+                        "expected_cost": DEFAULT_JOB_COST
+                    })
+
+                    if follow is not None:
+                        return follow(job_id, data)
                     return {
                         "code": 202,
                         "id": data.get("id"),
@@ -101,8 +146,10 @@ def create_app():
                         "message": "processing",
                         "pid": pid,
                         "queue_id": queue_id,
+                        "pool": pool.name,
+                        "priority": priority,
                         "max_queue_length": MAX_QUEUE_LENGTH if MAX_QUEUE_LENGTH > 0 else "unlimited",
-                        "queue_length": task_queue.qsize(),
+                        "queue_length": pool.queue_length(),
                         "build_number": BUILD_NUMBER
                     }, 202
             return wrapper
@@ -141,6 +188,12 @@ def create_app():
     from routes.v1.image.transform.image_to_video import v1_image_transform_video_bp
     from routes.v1.toolkit.test import v1_toolkit_test_bp
     from routes.v1.toolkit.authenticate import v1_toolkit_auth_bp
+    from routes.v1.toolkit.job_status import v1_toolkit_job_status_bp
+    from routes.v1.toolkit.webhooks import v1_toolkit_webhooks_bp
+    from routes.v1.toolkit.download_cache import v1_toolkit_download_cache_bp
+    from routes.v1.toolkit.models import v1_toolkit_models_bp
+    from routes.v1.toolkit.fonts import v1_toolkit_fonts_bp
+    from routes.v1.toolkit.health import v1_toolkit_health_bp
     from routes.v1.code.execute.execute_python import v1_code_execute_bp
 
     app.register_blueprint(v1_ffmpeg_compose_bp)
@@ -151,6 +204,12 @@ def create_app():
     app.register_blueprint(v1_image_transform_video_bp)
     app.register_blueprint(v1_toolkit_test_bp)
     app.register_blueprint(v1_toolkit_auth_bp)
+    app.register_blueprint(v1_toolkit_job_status_bp)
+    app.register_blueprint(v1_toolkit_webhooks_bp)
+    app.register_blueprint(v1_toolkit_download_cache_bp)
+    app.register_blueprint(v1_toolkit_models_bp)
+    app.register_blueprint(v1_toolkit_fonts_bp)
+    app.register_blueprint(v1_toolkit_health_bp)
     app.register_blueprint(v1_code_execute_bp)
 
     @app.errorhandler(Exception)
@@ -160,9 +219,10 @@ def create_app():
         # You can also return a custom error response here if needed
         return {"error": "An unexpected error occurred"}, 500
 
+    mark_serving()
     return app
 
-app = create_app()
-
+# The WSGI application lives in wsgi.py: spawned worker processes (long-form transcription)
+# re-import the main module, which must not build the app and start its executor again
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=8080)
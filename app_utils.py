@@ -34,13 +34,13 @@ def bypass_queue(f):
         return f(job_id, data)
     return wrapper
 
-def queue_task_wrapper(bypass_queue=False):
+def queue_task_wrapper(bypass_queue=False, follow=None):
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             try:
                 if hasattr(current_app, 'queue_task'):
-                    return current_app.queue_task(bypass_queue=bypass_queue)(f)(*args, **kwargs)
+                    return current_app.queue_task(bypass_queue=bypass_queue, follow=follow)(f)(*args, **kwargs)
                 data = request.json
                 job_id = data.get('id', 'default_job_id')
                 return f(job_id, data)
@@ -0,0 +1,90 @@
+"""Time ASS caption event generation on a large synthetic transcript.
+
+Run from the repository root:
+
+    python -m benchmarks.ass_events --words 50000
+
+Each caption style of /v1/video/caption and the legacy ASS writer are timed
+against a reference implementation of the previous approach, which
+rebuilt every line word by word and appended each dialogue to a string.
+"""
+import time
+import random
+import logging
+import argparse
+from services.v1.video.caption_video import STYLE_HANDLERS, format_ass_time
+from services.transcription import generate_ass_subtitle
+
+VOCABULARY = ["the", "caption", "render", "speed", "words", "per", "line", "transcript", "video", "audio"]
+
+def synthetic_transcript(word_count, words_per_segment=12):
+    random.seed(0)
+    segments = []
+    t = 0.0
+    for first in range(0, word_count, words_per_segment):
+        words = []
+        for _ in range(min(words_per_segment, word_count - first)):
+            duration = random.uniform(0.1, 0.6)
+            words.append({"word": " " + random.choice(VOCABULARY), "start": t, "end": t + duration})
+            t += duration + random.uniform(0.0, 0.2)
+        segments.append({"start": words[0]["start"], "end": words[-1]["end"], "text": "".join(w["word"] for w in words), "words": words})
+    return {"segments": segments}
+
+def previous_highlight(result, max_words_per_line):
+    """The former highlight handler: each event re-joins its whole line."""
+    events = []
+    for segment in result['segments']:
+        words = [(w['word'], w['start'], w['end']) for w in segment['words'] if w['word']]
+        step = max_words_per_line or len(words)
+        for line_set in [words[i:i + step] for i in range(0, len(words), step)]:
+            for idx, (_, w_start, w_end) in enumerate(line_set):
+                line_words = []
+                for w_idx, (w_text, _, _) in enumerate(line_set):
+                    line_words.append(f"{{\\c&H00FFFF00}}{w_text}{{\\c&H00FFFFFF}}" if w_idx == idx else w_text)
+                events.append(f"Dialogue: 0,{format_ass_time(w_start)},{format_ass_time(w_end)},Default,,0,0,0,,{' '.join(line_words)}")
+    return "\n".join(events)
+
+def previous_legacy(result, words_per_line):
+    """The former legacy writer: string concatenation per dialogue line."""
+    ass_content = ""
+    for segment in result['segments']:
+        words = segment['words']
+        for first in range(0, len(words), words_per_line):
+            group = words[first:first + words_per_line]
+            for i, word_info in enumerate(group):
+                end_time = group[i + 1]['start'] if i + 1 < len(group) else group[-1]['end']
+                caption = ' '.join((r'{\c&H00FFFF&}' if w == word_info else r'{\c&HFFFFFF&}') + w['word'] for w in group)
+                ass_content += f"Dialogue: 0,{format_ass_time(word_info['start'])},{format_ass_time(end_time)},Default,,0,0,0,,{caption}\n"
+    return ass_content
+
+def timed(function, *args):
+    start_time = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start_time
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ASS caption event generation.")
+    parser.add_argument('--words', type=int, default=50000, help="words in the synthetic transcript")
+    parser.add_argument('--max-words-per-line', type=int, default=8, help="max_words_per_line caption setting")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    result = synthetic_transcript(args.words)
+    style_options = {'font_size': 48, 'max_words_per_line': args.max_words_per_line, 'all_caps': False}
+    resolution = (1920, 1080)
+
+    print(f"{args.words} words, max_words_per_line={args.max_words_per_line}")
+    for style, handler in STYLE_HANDLERS.items():
+        seconds = timed(handler, result, dict(style_options), {}, resolution)
+        print(f"{style:<14} {seconds:8.3f}s")
+
+    previous = timed(previous_highlight, result, args.max_words_per_line)
+    current = timed(STYLE_HANDLERS['highlight'], result, dict(style_options), {}, resolution)
+    print(f"highlight: previous {previous:.3f}s, current {current:.3f}s ({previous / current:.1f}x)")
+
+    previous = timed(previous_legacy, result, args.max_words_per_line)
+    current = timed(generate_ass_subtitle, result, 56, args.max_words_per_line)
+    print(f"legacy ASS: previous {previous:.3f}s, current {current:.3f}s ({previous / current:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Compare transcription backends on speed and accuracy.
+
+Run from the repository root:
+
+    python -m benchmarks.transcription_backends clip1.mp3 clip2.mp4 --model base
+
+Every backend transcribes every file. Accuracy is reported as word error
+rate against a reference transcript: a <name>.txt file next to each media
+file if --references is given, otherwise the output of the first backend
+listed (by default the float32 whisper backend).
+"""
+import os
+import re
+import time
+import argparse
+from services.audio_extraction import extracted_audio, SAMPLE_RATE
+from services.transcription_backends import BACKENDS
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length."""
+    reference = normalize_words(reference)
+    hypothesis = normalize_words(hypothesis)
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / max(1, len(reference))
+
+def read_reference(media_path):
+    path = os.path.splitext(media_path)[0] + '.txt'
+    with open(path) as f:
+        return f.read()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare transcription backends on speed and word error rate.")
+    parser.add_argument('files', nargs='+', help="media files to transcribe")
+    parser.add_argument('--model', default='base', help="whisper model size")
+    parser.add_argument('--backends', default=','.join(BACKENDS), help="comma separated backends, the first is the reference unless --references")
+    parser.add_argument('--language', default=None, help="language of the media, detected when omitted")
+    parser.add_argument('--references', action='store_true', help="compare against <file>.txt reference transcripts")
+    args = parser.parse_args()
+
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    options = {'verbose': None}
+    if args.language:
+        options['language'] = args.language
+
+    audio = {}
+    for path in args.files:
+        with extracted_audio(path) as samples:
+            audio[path] = samples.copy()
+    audio_seconds = sum(len(samples) for samples in audio.values()) / SAMPLE_RATE
+
+    texts = {}
+    rows = []
+    for name in backends:
+        start_time = time.time()
+        model = BACKENDS[name].load(args.model)
+        load_seconds = time.time() - start_time
+
+        start_time = time.time()
+        texts[name] = {path: model.transcribe(samples, **options)['text'] for path, samples in audio.items()}
+        transcribe_seconds = time.time() - start_time
+        del model
+
+        rows.append((name, load_seconds, transcribe_seconds))
+        print(f"{name}: transcribed {audio_seconds:.1f}s of audio in {transcribe_seconds:.1f}s")
+
+    print()
+    print(f"{'backend':<10} {'load s':>8} {'transcribe s':>13} {'x realtime':>11} {'WER':>7}")
+    for name, load_seconds, transcribe_seconds in rows:
+        if args.references:
+            errors = [word_error_rate(read_reference(path), texts[name][path]) for path in audio]
+        else:
+            errors = [word_error_rate(texts[backends[0]][path], texts[name][path]) for path in audio]
+        wer = sum(errors) / len(errors)
+        print(f"{name:<10} {load_seconds:>8.1f} {transcribe_seconds:>13.1f} {audio_seconds / transcribe_seconds:>11.1f} {wer:>7.2%}")
+
+if __name__ == '__main__':
+    main()
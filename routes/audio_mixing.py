@@ -4,6 +4,7 @@ import logging
 from services.audio_mixing import process_audio_mixing
 from services.authentication import authenticate
 from services.cloud_storage import upload_file
+from services.encoding_profiles import PROFILES
 
 audio_mixing_bp = Blueprint('audio_mixing', __name__)
 logger = logging.getLogger(__name__)
@@ -18,7 +19,9 @@ logger = logging.getLogger(__name__)
         "video_vol": {"type": "number", "minimum": 0, "maximum": 100},
         "audio_vol": {"type": "number", "minimum": 0, "maximum": 100},
         "output_length": {"type": "string", "enum": ["video", "audio"]},
+        "encoding_profile": {"type": "string", "enum": list(PROFILES)},
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"}
     },
     "required": ["video_url", "audio_url"],
@@ -31,6 +34,7 @@ def audio_mixing(job_id, data):
     video_vol = data.get('video_vol', 100)
     audio_vol = data.get('audio_vol', 100)
     output_length = data.get('output_length', 'video')
+    encoding_profile = data.get('encoding_profile')
     webhook_url = data.get('webhook_url')
     id = data.get('id')
 
@@ -38,8 +42,8 @@ def audio_mixing(job_id, data):
 
     try:
         # Process audio and video mixing
-        output_filename = process_audio_mixing(
-            video_url, audio_url, video_vol, audio_vol, output_length, job_id, webhook_url
+        output_filename, encoding = process_audio_mixing(
+            video_url, audio_url, video_vol, audio_vol, output_length, job_id, webhook_url, encoding_profile
         )
 
         # Upload the mixed file using the unified upload_file() method
@@ -48,7 +52,7 @@ def audio_mixing(job_id, data):
         logger.info(f"Job {job_id}: Mixed media uploaded to cloud storage: {cloud_url}")
 
         # Return the cloud URL for the uploaded file
-        return cloud_url, "/audio-mixing", 200
+        return cloud_url, "/audio-mixing", 200, {"encoding": encoding}
         
     except Exception as e:
         logger.error(f"Job {job_id}: Error during audio mixing process - {str(e)}")
@@ -25,6 +25,7 @@ logger = logging.getLogger(__name__)
             "minItems": 1
         },
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"}
     },
     "required": ["video_urls"],
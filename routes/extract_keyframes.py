@@ -15,6 +15,7 @@ logger = logging.getLogger(__name__)
     "properties": {
         "video_url": {"type": "string", "format": "uri"},
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"}
     },
     "required": ["video_url"],
@@ -5,8 +5,6 @@ import threading
 import requests
 import uuid
 import json
-from google.oauth2.service_account import Credentials
-from google.auth.transport.requests import Request
 from datetime import datetime
 import time
 import psutil
@@ -43,6 +41,9 @@ def get_access_token():
     """
     Retrieves an access token for Google APIs using service account credentials.
     """
+    # The Google auth libraries are only imported once a Drive upload needs them
+    from google.oauth2.service_account import Credentials
+    from google.auth.transport.requests import Request
     credentials_info = json.loads(GCP_SA_CREDENTIALS)
     credentials = Credentials.from_service_account_info(
         credentials_info,
@@ -152,6 +153,7 @@ def upload_file_in_chunks(file_url, upload_url, total_size, job_id, chunk_size):
         "mime_type": {"type": "string"},
         "chunk_size": {"type": "integer", "minimum": 1},
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"}
     },
     "required": ["file_url", "filename", "folder_id"],
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
-from services.transcription import process_transcription
+from services.transcription import process_transcription_outputs
+from services.whisper_models import WHISPER_ALLOWED_MODELS
 from app_utils import validate_payload, queue_task_wrapper
 from services.authentication import authenticate
 from services.gcp_toolkit import upload_to_gcs
@@ -17,9 +18,11 @@ logger = logging.getLogger(__name__)
     "properties": {
         "media_url": {"type": "string", "format": "uri"},
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"},
         "option": {"type": ["string", "integer"]},
-        "output": {"type": "string", "enum": ["transcript", "srt", "vtt", "ass"]}
+        "output": {"type": "string", "enum": ["transcript", "srt", "vtt", "ass"]},
+        "model": {"type": "string", "enum": WHISPER_ALLOWED_MODELS}
     },
     "required": ["media_url"],
     "additionalProperties": False
@@ -31,6 +34,7 @@ def transcribe_media(job_id, data):
     id = data.get('id', job_id)
     words_per_subtitle = data.get('option')
     output = data.get('output', 'transcript')
+    model_size = data.get('model')
 
     logger.info(f"Job {id}: Received transcription request for {media_url}")
 
@@ -40,8 +44,10 @@ def transcribe_media(job_id, data):
         else:
             words_per_subtitle = None
 
-        # Get transcription result
-        transcription = process_transcription(media_url, output, words_per_subtitle=words_per_subtitle)
+        # Transcribe once and build the requested output together with the transcript details
+        output_types = [output] if output == 'transcript' else [output, 'transcript']
+        outputs = process_transcription_outputs(media_url, output_types, words_per_subtitle=words_per_subtitle, model_size=model_size)
+        transcription = outputs[output]
         
         # Initialize result dictionary
         result = {
@@ -54,8 +60,8 @@ def transcribe_media(job_id, data):
             cloud_url = upload_to_gcs(transcription)
             os.remove(transcription)  # Remove the temporary file after uploading
             
-            # Get additional transcription details
-            transcript_details = process_transcription(media_url, 'transcript', words_per_subtitle=words_per_subtitle)
+            # Additional transcription details from the same decode
+            transcript_details = outputs['transcript']
             
             # Add subtitle specific information
             result.update({
@@ -19,6 +19,7 @@ logger = logging.getLogger(__name__)
         "code": {"type": "string"},
         "timeout": {"type": "integer", "minimum": 1, "maximum": 300},
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"}
     },
     "required": ["code"],
@@ -89,6 +89,7 @@ logger = logging.getLogger(__name__)
             }
         },
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"}
     },
     "required": ["inputs", "outputs"],
@@ -99,7 +100,7 @@ def ffmpeg_api(job_id, data):
     logger.info(f"Job {job_id}: Received flexible FFmpeg request")
 
     try:
-        output_filenames, metadata = process_ffmpeg_compose(data, job_id)
+        output_filenames, metadata, download_timings = process_ffmpeg_compose(data, job_id)
         
         # Upload output files to GCP and create result array
         output_urls = []
@@ -124,7 +125,7 @@ def ffmpeg_api(job_id, data):
             else:
                 raise Exception(f"Expected output file {output_filename} not found")
 
-        return output_urls, "/v1/ffmpeg/compose", 200
+        return output_urls, "/v1/ffmpeg/compose", 200, {"downloads": download_timings}
         
     except Exception as e:
         logger.error(f"Job {job_id}: Error processing FFmpeg request - {str(e)}")
@@ -4,6 +4,7 @@ import logging
 from services.v1.image.transform.image_to_video import process_image_to_video
 from services.authentication import authenticate
 from services.cloud_storage import upload_file
+from services.encoding_profiles import PROFILES
 
 v1_image_transform_video_bp = Blueprint('v1_image_transform_video', __name__)
 logger = logging.getLogger(__name__)
@@ -17,7 +18,9 @@ logger = logging.getLogger(__name__)
         "length": {"type": "number", "minimum": 1, "maximum": 60},
         "frame_rate": {"type": "integer", "minimum": 15, "maximum": 60},
         "zoom_speed": {"type": "number", "minimum": 0, "maximum": 100},
+        "encoding_profile": {"type": "string", "enum": list(PROFILES)},
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"}
     },
     "required": ["image_url"],
@@ -29,6 +32,7 @@ def image_to_video(job_id, data):
     length = data.get('length', 5)
     frame_rate = data.get('frame_rate', 30)
     zoom_speed = data.get('zoom_speed', 3) / 100
+    encoding_profile = data.get('encoding_profile')
     webhook_url = data.get('webhook_url')
     id = data.get('id')
 
@@ -36,8 +40,8 @@ def image_to_video(job_id, data):
 
     try:
         # Process image to video conversion
-        output_filename = process_image_to_video(
-            image_url, length, frame_rate, zoom_speed, job_id, webhook_url
+        output_filename, encoding = process_image_to_video(
+            image_url, length, frame_rate, zoom_speed, job_id, webhook_url, encoding_profile
         )
 
         # Upload the resulting file using the unified upload_file() method
@@ -47,7 +51,7 @@ def image_to_video(job_id, data):
         logger.info(f"Job {job_id}: Converted video uploaded to cloud storage: {cloud_url}")
 
         # Return the cloud URL for the uploaded file
-        return cloud_url, "/v1/image/transform/video", 200
+        return cloud_url, "/v1/image/transform/video", 200, {"encoding": encoding}
         
     except Exception as e:
         logger.error(f"Job {job_id}: Error processing image to video: {str(e)}", exc_info=True)
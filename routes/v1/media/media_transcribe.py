@@ -1,14 +1,46 @@
-from flask import Blueprint
+from flask import Blueprint, Response, request, stream_with_context
 from app_utils import *
 import logging
 import os
-from services.v1.media.media_transcribe import process_transcribe_media
+import json
+import time
+from services.v1.media.media_transcribe import process_transcribe_media, process_transcribe_media_batch
+from services.transcription_engine import stream_transcription
+from services.webhook import send_webhook
+from services.job_registry import get_job, update_job_progress
+from services.thread_budget import track_leases
+from services.whisper_models import WHISPER_ALLOWED_MODELS
+from services.transcription_backends import BACKENDS
 from services.authentication import authenticate
 from services.cloud_storage import upload_file
 
 v1_media_transcribe_bp = Blueprint('v1_media_transcribe', __name__)
 logger = logging.getLogger(__name__)
 
+# Largest number of media URLs accepted in one batch request
+TRANSCRIBE_BATCH_MAX_ITEMS = int(os.environ.get('TRANSCRIBE_BATCH_MAX_ITEMS', 500))
+# Seconds between checks for new segments while relaying a streaming transcription
+TRANSCRIBE_STREAM_POLL_SECONDS = float(os.environ.get('TRANSCRIBE_STREAM_POLL_SECONDS', 0.5))
+
+def upload_transcription_outputs(result, include_text, include_srt, include_segments):
+    """Upload the files written for a cloud response and return their URLs."""
+    cloud_urls = {
+        "text": upload_file(result[0]) if include_text is True else None,
+        "srt": upload_file(result[1]) if include_srt is True else None,
+        "segments": upload_file(result[2]) if include_segments is True else None,
+    }
+
+    if include_text is True:
+        os.remove(result[0])  # Remove the temporary file after uploading
+
+    if include_srt is True:
+        os.remove(result[1])
+
+    if include_segments is True:
+        os.remove(result[2])
+
+    return cloud_urls
+
 @v1_media_transcribe_bp.route('/v1/media/transcribe', methods=['POST'])
 @authenticate
 @validate_payload({
@@ -22,7 +54,13 @@ logger = logging.getLogger(__name__)
         "word_timestamps": {"type": "boolean"},
         "response_type": {"type": "string", "enum": ["direct", "cloud"]},
         "language": {"type": "string"},
+        "model": {"type": "string", "enum": WHISPER_ALLOWED_MODELS},
+        "backend": {"type": "string", "enum": list(BACKENDS)},
+        "vad": {"type": "boolean"},
+        "long_form": {"type": "boolean"},
+        "partial_results": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"}
     },
     "required": ["media_url"],
@@ -38,13 +76,39 @@ def transcribe(job_id, data):
     word_timestamps = data.get('word_timestamps', False)
     response_type = data.get('response_type', 'direct')
     language = data.get('language', None)
+    model_size = data.get('model')
+    backend = data.get('backend')
+    vad = data.get('vad')
+    long_form = data.get('long_form', False)
+    partial_results = data.get('partial_results', False)
     webhook_url = data.get('webhook_url')
     id = data.get('id')
 
     logger.info(f"Job {job_id}: Received transcription request for {media_url}")
 
+    if partial_results and long_form:
+        return "partial_results cannot be combined with long_form", "/v1/transcribe/media", 400
+
+    on_segments = None
+    if partial_results and webhook_url:
+        sent = {"windows": 0}
+        def on_segments(segments):
+            # Each finished window is posted as its own webhook ahead of the final result
+            sent["windows"] += 1
+            send_webhook(webhook_url, {
+                "endpoint": "/v1/transcribe/media",
+                "id": id,
+                "job_id": job_id,
+                "partial": True,
+                "sequence": sent["windows"],
+                "segments": segments
+            })
+
     try:
-        result = process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id)
+        # Threads are leased only while the model decodes; report the allocation it ran with
+        with track_leases() as leases:
+            result = process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id, model_size, long_form, on_segments, backend, vad)
+        threads = leases[-1] if leases else None
         logger.info(f"Job {job_id}: Transcription process completed successfully")
 
         # If the result is a file path, upload it using the unified upload_file() method
@@ -53,30 +117,216 @@ def transcribe(job_id, data):
             result_json = {
                 "text": result[0],
                 "srt": result[1],
-                "segments": result[2]
+                "segments": result[2],
+                "language": result[3]
             }
 
-            return result_json, "/v1/transcribe/media", 200
+            return result_json, "/v1/transcribe/media", 200, {"threads": threads}
 
         else:
 
-            cloud_urls = {
-                "text": upload_file(result[0]) if include_text is True else None,
-                "srt": upload_file(result[1]) if include_srt is True else None,
-                "segments": upload_file(result[2]) if include_segments is True else None,
-            }
+            cloud_urls = upload_transcription_outputs(result, include_text, include_srt, include_segments)
+            cloud_urls["language"] = result[3]
+            return cloud_urls, "/v1/transcribe/media", 200, {"threads": threads}
 
-            if include_text is True:
-                os.remove(result[0])  # Remove the temporary file after uploading
-            
-            if include_srt is True:
-                os.remove(result[1])
+    except Exception as e:
+        logger.error(f"Job {job_id}: Error during transcription process - {str(e)}")
+        return str(e), "/v1/transcribe/media", 500
 
-            if include_segments is True:
-                os.remove(result[2])
-            
-            return cloud_urls, "/v1/transcribe/media", 200
+@v1_media_transcribe_bp.route('/v1/media/transcribe/batch', methods=['POST'])
+@authenticate
+@validate_payload({
+    "type": "object",
+    "properties": {
+        "media_urls": {
+            "type": "array",
+            "items": {"type": "string", "format": "uri"},
+            "minItems": 1,
+            "maxItems": TRANSCRIBE_BATCH_MAX_ITEMS
+        },
+        "task": {"type": "string", "enum": ["transcribe", "translate"]},
+        "include_text": {"type": "boolean"},
+        "include_srt": {"type": "boolean"},
+        "include_segments": {"type": "boolean"},
+        "word_timestamps": {"type": "boolean"},
+        "response_type": {"type": "string", "enum": ["direct", "cloud"]},
+        "language": {"type": "string"},
+        "model": {"type": "string", "enum": WHISPER_ALLOWED_MODELS},
+        "backend": {"type": "string", "enum": list(BACKENDS)},
+        "vad": {"type": "boolean"},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
+        "id": {"type": "string"}
+    },
+    "required": ["media_urls"],
+    "additionalProperties": False
+})
+@queue_task_wrapper(bypass_queue=False)
+def transcribe_batch(job_id, data):
+    media_urls = data['media_urls']
+    task = data.get('task', 'transcribe')
+    include_text = data.get('include_text', True)
+    include_srt = data.get('include_srt', False)
+    include_segments = data.get('include_segments', False)
+    word_timestamps = data.get('word_timestamps', False)
+    response_type = data.get('response_type', 'direct')
+    language = data.get('language', None)
+    model_size = data.get('model')
+    backend = data.get('backend')
+    vad = data.get('vad')
+
+    logger.info(f"Job {job_id}: Received batch transcription request for {len(media_urls)} media URLs")
+
+    try:
+        with track_leases() as leases:
+            items = process_transcribe_media_batch(media_urls, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id, model_size, backend, vad)
+        threads = leases[-1] if leases else None
+
+        results = []
+        for media_url, (outputs, error) in zip(media_urls, items):
+            item = {"media_url": media_url}
+            if error is None and response_type == "cloud":
+                try:
+                    item.update(upload_transcription_outputs(outputs, include_text, include_srt, include_segments))
+                    item["language"] = outputs[3]
+                except Exception as e:
+                    logger.error(f"Job {job_id}: Failed to upload outputs for {media_url} - {str(e)}")
+                    error = str(e)
+            elif error is None:
+                item.update({"text": outputs[0], "srt": outputs[1], "segments": outputs[2], "language": outputs[3]})
+            item["error"] = error
+            results.append(item)
+
+        failed = sum(1 for item in results if item["error"] is not None)
+        logger.info(f"Job {job_id}: Batch transcription completed, {len(results) - failed} succeeded, {failed} failed")
+        return {"items": results, "failed": failed}, "/v1/media/transcribe/batch", 200, {"threads": threads}
 
     except Exception as e:
-        logger.error(f"Job {job_id}: Error during transcription process - {str(e)}")
-        return str(e), "/v1/transcribe/media", 500
\ No newline at end of file
+        logger.error(f"Job {job_id}: Error during batch transcription process - {str(e)}")
+        return str(e), "/v1/media/transcribe/batch", 500
+
+
+def format_event(event, data, event_id=None):
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data, default=float)}\n\n"
+
+def follow_transcription_stream(job_id, data, last_event_id=None):
+    """Return a Server-Sent Events response relaying the segments of a queued streaming job.
+
+    The transcription runs in the CPU pool and records its segments with the
+    job; this only polls them, so it holds no model or thread lease. Segment
+    events carry their index as the event id, and last_event_id skips the
+    segments a reconnecting client already has.
+    """
+    id = data.get('id')
+
+    def events():
+        sent = last_event_id + 1 if last_event_id is not None else 0
+        yield format_event("start", {"job_id": job_id, "id": id})
+        while True:
+            job = get_job(job_id)
+            if job is None:
+                yield format_event("error", {"job_id": job_id, "id": id, "message": f"Job {job_id} not found"})
+                return
+            details = job.get('details') or {}
+            segments = details.get('segments', [])
+            for index in range(sent, len(segments)):
+                yield format_event("segment", segments[index], index)
+            sent = max(sent, len(segments))
+            if job['status'] == 'done':
+                yield format_event("done", {
+                    "job_id": job_id,
+                    "id": id,
+                    **job['response'],
+                    "queue_time": job['queue_time'],
+                    "run_time": job['run_time']
+                })
+                return
+            if job['status'] == 'failed':
+                yield format_event("error", {"job_id": job_id, "id": id, "message": job['message']})
+                return
+            time.sleep(TRANSCRIBE_STREAM_POLL_SECONDS)
+
+    # Disable proxy buffering so each event reaches the client as soon as it is written
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@v1_media_transcribe_bp.route('/v1/media/transcribe/stream', methods=['POST'])
+@authenticate
+@validate_payload({
+    "type": "object",
+    "properties": {
+        "media_url": {"type": "string", "format": "uri"},
+        "task": {"type": "string", "enum": ["transcribe", "translate"]},
+        "word_timestamps": {"type": "boolean"},
+        "language": {"type": "string"},
+        "model": {"type": "string", "enum": WHISPER_ALLOWED_MODELS},
+        "backend": {"type": "string", "enum": list(BACKENDS)},
+        "vad": {"type": "boolean"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
+        "id": {"type": "string"}
+    },
+    "required": ["media_url"],
+    "additionalProperties": False
+})
+@queue_task_wrapper(bypass_queue=False, follow=follow_transcription_stream)
+def transcribe_stream(job_id, data):
+    media_url = data['media_url']
+    task = data.get('task', 'transcribe')
+    word_timestamps = data.get('word_timestamps', False)
+    language = data.get('language', None)
+    model_size = data.get('model')
+    backend = data.get('backend')
+    vad = data.get('vad')
+
+    logger.info(f"Job {job_id}: Received streaming transcription request for {media_url}")
+
+    start_time = time.time()
+    time_to_first_segment = None
+    segments = []
+    detected = {}
+    progress = {"value": 0}
+    try:
+        with track_leases() as leases:
+            windows = stream_transcription(
+                media_url,
+                model_size,
+                task=task,
+                language=language,
+                word_timestamps=word_timestamps,
+                backend=backend,
+                vad=vad,
+                on_language=lambda language: detected.update(language=language),
+                on_progress=lambda value: progress.update(value=value)
+            )
+            for window in windows:
+                if time_to_first_segment is None and window:
+                    time_to_first_segment = round(time.time() - start_time, 3)
+                    logger.info(f"Job {job_id}: First segment ready after {time_to_first_segment}s")
+                segments.extend(window)
+                # The SSE response of the request that queued the job relays these as they arrive
+                update_job_progress(job_id, progress["value"], {"segments": segments, "language": detected.get('language')})
+        logger.info(f"Job {job_id}: Streaming transcription completed in {round(time.time() - start_time, 3)}s")
+        return {
+            "text": "".join(segment['text'] for segment in segments),
+            "language": detected.get('language'),
+            "time_to_first_segment": time_to_first_segment,
+            "threads": leases[-1] if leases else None
+        }, "/v1/media/transcribe/stream", 200
+
+    except Exception as e:
+        logger.error(f"Job {job_id}: Error during streaming transcription - {str(e)}")
+        return str(e), "/v1/media/transcribe/stream", 500
+
+@v1_media_transcribe_bp.route('/v1/media/transcribe/stream/<job_id>', methods=['GET'])
+@authenticate
+def follow_stream(job_id):
+    """Reattach to a streaming transcription, e.g. after the connection dropped."""
+    job = get_job(job_id)
+    if job is None:
+        return {"message": f"Job {job_id} not found"}, 404
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    return follow_transcription_stream(job_id, {"id": job['id']}, int(last_event_id) if last_event_id.isdigit() else None)
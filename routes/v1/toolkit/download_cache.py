@@ -0,0 +1,12 @@
+import logging
+from flask import Blueprint, jsonify
+from services.authentication import authenticate
+from services.download_cache import get_cache_stats
+
+v1_toolkit_download_cache_bp = Blueprint('v1_toolkit_download_cache', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_download_cache_bp.route('/v1/toolkit/download-cache', methods=['GET'])
+@authenticate
+def get_download_cache_stats():
+    return jsonify(get_cache_stats()), 200
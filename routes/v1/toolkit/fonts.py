@@ -0,0 +1,12 @@
+import logging
+from flask import Blueprint, jsonify
+from services.authentication import authenticate
+from services.font_catalog import list_font_families
+
+v1_toolkit_fonts_bp = Blueprint('v1_toolkit_fonts', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_fonts_bp.route('/v1/toolkit/fonts', methods=['GET'])
+@authenticate
+def get_fonts():
+    return jsonify({"fonts": list_font_families()}), 200
@@ -0,0 +1,16 @@
+import logging
+from flask import Blueprint, jsonify
+from services.startup import get_startup_report
+from version import BUILD_NUMBER
+
+v1_toolkit_health_bp = Blueprint('v1_toolkit_health', __name__)
+logger = logging.getLogger(__name__)
+
+# Unauthenticated so load balancers and orchestrators can probe it; it never waits on warm-up
+@v1_toolkit_health_bp.route('/v1/toolkit/health', methods=['GET'])
+def health():
+    return jsonify({
+        "status": "ok",
+        "build_number": BUILD_NUMBER,
+        **get_startup_report()
+    }), 200
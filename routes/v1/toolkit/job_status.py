@@ -0,0 +1,36 @@
+import logging
+from flask import Blueprint, request, jsonify
+from services.authentication import authenticate
+from services.job_registry import get_job, get_jobs
+from app_utils import validate_payload
+
+v1_toolkit_job_status_bp = Blueprint('v1_toolkit_job_status', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_job_status_bp.route('/v1/toolkit/job/<job_id>', methods=['GET'])
+@authenticate
+def get_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"message": f"Job {job_id} not found"}), 404
+    return jsonify(job), 200
+
+@v1_toolkit_job_status_bp.route('/v1/toolkit/jobs/status', methods=['POST'])
+@authenticate
+@validate_payload({
+    "type": "object",
+    "properties": {
+        "job_ids": {
+            "type": "array",
+            "items": {"type": "string"},
+            "minItems": 1,
+            "maxItems": 500
+        }
+    },
+    "required": ["job_ids"],
+    "additionalProperties": False
+})
+def get_jobs_status():
+    job_ids = request.json['job_ids']
+    logger.info(f"Received status request for {len(job_ids)} jobs")
+    return jsonify({"jobs": get_jobs(job_ids)}), 200
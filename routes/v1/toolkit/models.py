@@ -0,0 +1,19 @@
+import logging
+from flask import Blueprint, jsonify
+from services.authentication import authenticate
+from services.whisper_models import WHISPER_MODEL, WHISPER_ALLOWED_MODELS, get_loaded_models
+from services.transcription_backends import BACKENDS, WHISPER_BACKEND
+
+v1_toolkit_models_bp = Blueprint('v1_toolkit_models', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_models_bp.route('/v1/toolkit/models', methods=['GET'])
+@authenticate
+def get_models():
+    return jsonify({
+        "default": WHISPER_MODEL,
+        "allowed": WHISPER_ALLOWED_MODELS,
+        "default_backend": WHISPER_BACKEND,
+        "backends": {name: backend.description for name, backend in BACKENDS.items()},
+        "loaded": get_loaded_models()
+    }), 200
@@ -0,0 +1,12 @@
+import logging
+from flask import Blueprint, jsonify
+from services.authentication import authenticate
+from services.webhook import get_webhook_metrics
+
+v1_toolkit_webhooks_bp = Blueprint('v1_toolkit_webhooks', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_webhooks_bp.route('/v1/toolkit/webhooks', methods=['GET'])
+@authenticate
+def get_webhooks_status():
+    return jsonify(get_webhook_metrics()), 200
@@ -2,8 +2,13 @@ from flask import Blueprint, jsonify
 from app_utils import validate_payload, queue_task_wrapper
 import logging
 from services.v1.video.caption_video import process_captioning_v1
+from services.whisper_models import WHISPER_ALLOWED_MODELS
+from services.transcription_backends import BACKENDS
+from services.encoding_profiles import PROFILES
+from services.v1.video.caption_segments import RENDER_MODES
 from services.authentication import authenticate
 from services.cloud_storage import upload_file
+from services.thread_budget import track_leases
 import os
 import requests  # Ensure requests is imported for webhook handling
 
@@ -68,8 +73,14 @@ logger = logging.getLogger(__name__)
             }
         },
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"},
-        "language": {"type": "string"}
+        "language": {"type": "string"},
+        "model": {"type": "string", "enum": WHISPER_ALLOWED_MODELS},
+        "backend": {"type": "string", "enum": list(BACKENDS)},
+        "vad": {"type": "boolean"},
+        "encoding_profile": {"type": "string", "enum": list(PROFILES)},
+        "render_mode": {"type": "string", "enum": RENDER_MODES}
     },
     "required": ["video_url"],
     "additionalProperties": False
@@ -83,6 +94,11 @@ def caption_video_v1(job_id, data):
     webhook_url = data.get('webhook_url')
     id = data.get('id')
     language = data.get('language', 'auto')
+    model_size = data.get('model')
+    backend = data.get('backend')
+    vad = data.get('vad')
+    encoding_profile = data.get('encoding_profile')
+    render_mode = data.get('render_mode')
 
     logger.info(f"Job {job_id}: Received v1 captioning request for {video_url}")
     logger.info(f"Job {job_id}: Settings received: {settings}")
@@ -94,7 +110,10 @@ def caption_video_v1(job_id, data):
         # This ensures position and alignment remain independent keys.
         
         # Process video with the enhanced v1 service
-        output = process_captioning_v1(video_url, captions, settings, replace, job_id, language)
+        # Only transcription leases torch threads, and only while the model decodes
+        with track_leases() as leases:
+            output = process_captioning_v1(video_url, captions, settings, replace, job_id, language, model_size, backend, vad, encoding_profile, render_mode)
+        threads = leases[-1] if leases else None
         
         if isinstance(output, dict) and 'error' in output:
             # Check if this is a font-related error by checking for 'available_fonts' key
@@ -105,8 +124,8 @@ def caption_video_v1(job_id, data):
                 # Non-font error scenario, do not return available_fonts
                 return {"error": output['error']}, "/v1/video/caption", 400
 
-        # If processing was successful, output is the file path
-        output_path = output
+        # If processing was successful, output is the file path, transcription language and encoding report
+        output_path, detected_language, encoding = output
         logger.info(f"Job {job_id}: Captioning process completed successfully")
 
         # Upload the captioned video
@@ -117,7 +136,7 @@ def caption_video_v1(job_id, data):
         os.remove(output_path)
         logger.info(f"Job {job_id}: Cleaned up local output file")
 
-        return cloud_url, "/v1/video/caption", 200
+        return cloud_url, "/v1/video/caption", 200, {"threads": threads, "language": detected_language, "encoding": encoding}
 
     except Exception as e:
         logger.error(f"Job {job_id}: Error during captioning process - {str(e)}", exc_info=True)
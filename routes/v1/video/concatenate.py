@@ -25,6 +25,7 @@ logger = logging.getLogger(__name__)
             "minItems": 1
         },
         "webhook_url": {"type": "string", "format": "uri"},
+        "priority": {"type": "integer", "minimum": 0, "maximum": 10},
         "id": {"type": "string"}
     },
     "required": ["video_urls"],
@@ -39,13 +40,13 @@ def combine_videos(job_id, data):
     logger.info(f"Job {job_id}: Received combine-videos request for {len(media_urls)} videos")
 
     try:
-        output_file = process_video_concatenate(media_urls, job_id)
+        output_file, download_timings = process_video_concatenate(media_urls, job_id)
         logger.info(f"Job {job_id}: Video combination process completed successfully")
 
         cloud_url = upload_file(output_file)
         logger.info(f"Job {job_id}: Combined video uploaded to cloud storage: {cloud_url}")
 
-        return cloud_url, "/v1/video/concatenate", 200
+        return cloud_url, "/v1/video/concatenate", 200, {"downloads": download_timings}
 
     except Exception as e:
         logger.error(f"Job {job_id}: Error during video combination process - {str(e)}")
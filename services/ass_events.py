@@ -0,0 +1,117 @@
+import re
+import numpy as np
+
+class WordColumns:
+    """Word timings of a transcript as parallel columns: start and end arrays, texts and segment ids."""
+
+    def __init__(self, starts, ends, texts, segment_ids):
+        self.starts = starts
+        self.ends = ends
+        self.texts = texts
+        self.segment_ids = segment_ids
+
+    def __len__(self):
+        return len(self.texts)
+
+def make_text_transform(replace_dict, all_caps):
+    """Return a function applying case-insensitive replacements and optional upper-casing to a word.
+
+    Patterns are compiled once instead of on every word.
+    """
+    patterns = [(re.compile(re.escape(old), flags=re.IGNORECASE), new) for old, new in replace_dict.items()]
+
+    def transform(text):
+        for pattern, new in patterns:
+            text = pattern.sub(new, text)
+        return text.upper() if all_caps else text
+    return transform
+
+def word_columns(segments, transform=None, drop_empty=False):
+    """Flatten the words of all segments into WordColumns.
+
+    transform is applied to each word's text; with drop_empty, words whose
+    transformed text is empty are left out.
+    """
+    starts = []
+    ends = []
+    texts = []
+    segment_ids = []
+    for segment_id, segment in enumerate(segments):
+        for word in segment.get('words') or []:
+            text = word.get('word', '')
+            if transform is not None:
+                text = transform(text)
+            if drop_empty and not text:
+                continue
+            starts.append(word['start'])
+            ends.append(word['end'])
+            texts.append(text)
+            segment_ids.append(segment_id)
+    return WordColumns(
+        np.asarray(starts, dtype=np.float64),
+        np.asarray(ends, dtype=np.float64),
+        texts,
+        np.asarray(segment_ids, dtype=np.int64)
+    )
+
+# Zero-padded two digit strings; centiseconds can round up to 100
+_TWO_DIGITS = [f"{i:02}" for i in range(101)]
+
+def format_ass_times(seconds):
+    """Format an array of seconds as ASS H:MM:SS.cc timestamps (same rounding as format_ass_time).
+
+    Each distinct timestamp is formatted once; word end times usually repeat
+    the next word's start.
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    if not len(seconds):
+        return []
+    hours = (seconds // 3600).astype(np.int64)
+    minutes = ((seconds % 3600) // 60).astype(np.int64)
+    secs = (seconds % 60).astype(np.int64)
+    centiseconds = np.round((seconds - seconds.astype(np.int64)) * 100).astype(np.int64)
+    keys, first, inverse = np.unique(((hours * 60 + minutes) * 60 + secs) * 101 + centiseconds, return_index=True, return_inverse=True)
+    two = _TWO_DIGITS
+    formatted = [
+        f"{h}:{two[m]}:{two[s]}.{two[c]}"
+        for h, m, s, c in zip(hours[first].tolist(), minutes[first].tolist(), secs[first].tolist(), centiseconds[first].tolist())
+    ]
+    return [formatted[i] for i in inverse.tolist()]
+
+def segment_ranges(segment_ids):
+    """Return (start, end) index ranges of consecutive words belonging to the same segment."""
+    if not len(segment_ids):
+        return []
+    breaks = (np.flatnonzero(np.diff(segment_ids)) + 1).tolist()
+    return list(zip([0] + breaks, breaks + [len(segment_ids)]))
+
+def line_ranges(segment_ids, max_words_per_line):
+    """Split each segment's word range into lines of at most max_words_per_line words (0 for no limit)."""
+    ranges = []
+    for start, end in segment_ranges(segment_ids):
+        step = max_words_per_line if max_words_per_line > 0 else end - start
+        ranges.extend((i, min(i + step, end)) for i in range(start, end, step))
+    return ranges
+
+def moving_highlight(words, before, after, separator=' ', prefix=''):
+    """Return one text per word of a line, with that word wrapped in before/after.
+
+    Every other word is preceded by prefix. The line is joined once and each
+    variant is built from slices of it, rather than re-joining the whole
+    line for every word.
+    """
+    line = separator.join(prefix + word for word in words)
+    texts = []
+    offset = 0
+    for word in words:
+        end = offset + len(prefix) + len(word)
+        texts.append(f"{line[:offset]}{before}{word}{after}{line[end:]}")
+        offset = end + len(separator)
+    return texts
+
+def dialogue_events(starts, ends, texts, prefix=''):
+    """Build the Dialogue lines for parallel start/end (seconds) and text columns, joined once."""
+    return "\n".join(
+        f"Dialogue: 0,{start},{end},Default,,0,0,0,,{prefix}{text}"
+        for start, end, text in zip(format_ass_times(starts), format_ass_times(ends), texts)
+    )
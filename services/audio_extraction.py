@@ -0,0 +1,73 @@
+import os
+import uuid
+import logging
+from contextlib import contextmanager
+import ffmpeg
+import numpy as np
+from services.media_stream import transcode_url
+
+logger = logging.getLogger(__name__)
+
+STORAGE_PATH = "/tmp/"
+SAMPLE_RATE = 16000
+
+# Raw 32-bit float mono PCM, the layout Whisper works on, so the file can be memory-mapped as-is
+AUDIO_OUTPUT_OPTIONS = {
+    'format': 'f32le',
+    'acodec': 'pcm_f32le',
+    'ac': 1,
+    'ar': SAMPLE_RATE,
+    'vn': None,
+    'sn': None,
+    'dn': None
+}
+
+def is_url(source):
+    return source.startswith(('http://', 'https://'))
+
+def extract_audio(source, output_path=None):
+    """Extract a 16 kHz mono float32 PCM track from a media file or URL and return its path.
+
+    Video, subtitle and data streams are dropped. URLs are streamed into
+    ffmpeg when the container allows it, so the video never touches disk.
+    """
+    output_path = output_path or os.path.join(STORAGE_PATH, f"{uuid.uuid4()}.f32")
+    try:
+        if is_url(source):
+            staging_path = os.path.join(STORAGE_PATH, f"{uuid.uuid4()}_input")
+            input_mode = transcode_url(source, output_path, staging_path, **AUDIO_OUTPUT_OPTIONS)
+            logger.info(f"Extracted audio from {source} ({input_mode} input) to {output_path}")
+        else:
+            (
+                ffmpeg
+                .input(source)
+                .output(output_path, **AUDIO_OUTPUT_OPTIONS)
+                .overwrite_output()
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+            logger.info(f"Extracted audio from {source} to {output_path}")
+    except Exception:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    return output_path
+
+def load_audio(path):
+    """Memory-map an extracted PCM file as a float32 array.
+
+    Copy-on-write mapping: pages are read lazily and never written back,
+    and the array is writable so it can be handed to torch without a copy.
+    """
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode='c')
+
+@contextmanager
+def extracted_audio(source):
+    """Yield the memory-mapped 16 kHz audio of source, removing the extracted file afterwards."""
+    path = extract_audio(source)
+    try:
+        yield load_audio(path)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
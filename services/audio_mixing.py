@@ -1,6 +1,8 @@
 import os
+import time
 import subprocess
 from services.file_management import download_file
+from services.encoding_profiles import get_profile, encoding_report
 
 STORAGE_PATH = "/tmp/"
 
@@ -9,7 +11,8 @@ def get_duration(file_path):
     result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     return float(result.stdout)
 
-def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_length, job_id, webhook_url=None):
+def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_length, job_id, webhook_url=None, encoding_profile=None):
+    """Mix an audio track into a video. Returns (output_path, encoding report)."""
     video_path = download_file(video_url, STORAGE_PATH)
     audio_path = download_file(audio_url, STORAGE_PATH)
     output_path = os.path.join(STORAGE_PATH, f"{job_id}.mp4")
@@ -45,8 +48,10 @@ def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_leng
     cmd.extend(['-map', '[a]'])  # Map processed audio
 
     if output_length == 'audio' and audio_duration > video_duration:
-        cmd.extend(['-c:v', 'libx264'])  # Re-encode video if looping
+        profile = get_profile(encoding_profile)
+        cmd.extend(profile.video_args())  # Re-encode video if looping
     else:
+        profile = None
         cmd.extend(['-c:v', 'copy'])  # Copy video codec otherwise
 
     cmd.extend(['-c:a', 'aac'])  # Always encode audio to AAC
@@ -57,10 +62,12 @@ def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_leng
     cmd.append(output_path)
 
     # Run FFmpeg command
+    encode_start = time.time()
     subprocess.run(cmd, check=True)
+    encoding = encoding_report(profile, output_path, time.time() - encode_start)
 
     # Clean up input files
     os.remove(video_path)
     os.remove(audio_path)
 
-    return output_path
\ No newline at end of file
+    return output_path, encoding
\ No newline at end of file
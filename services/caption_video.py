@@ -2,9 +2,10 @@ import os
 import ffmpeg
 import logging
 import requests
-import subprocess
 from services.file_management import download_file
 from services.gcp_toolkit import upload_to_gcs, GCP_BUCKET_NAME
+from services.font_catalog import FONTS_DIR, DYNAMIC_FONTS_DIR, find_font, add_font
+from services.encoding_profiles import get_profile
 import mimetypes
 import re
 from urllib.parse import urlparse, parse_qs
@@ -20,62 +21,13 @@ STORAGE_PATH = "/tmp/"
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Define the path to the fonts directory
-FONTS_DIR = '/usr/share/fonts/custom'
-DYNAMIC_FONTS_DIR = '/usr/share/fonts/custom/dynamic'
-
-# Create the FONT_PATHS dictionary by reading the fonts directory
-FONT_PATHS = {}
-for font_file in os.listdir(FONTS_DIR):
-    if font_file.endswith(('.ttf', '.TTF', '.otf', '.OTF', '.woff', '.WOFF')):
-        font_name = os.path.splitext(font_file)[0]
-        FONT_PATHS[font_name] = os.path.join(FONTS_DIR, font_file)
-
-# Also scan dynamic directory if it exists
-if os.path.exists(DYNAMIC_FONTS_DIR):
-    for font_file in os.listdir(DYNAMIC_FONTS_DIR):
-        if font_file.endswith(('.ttf', '.TTF', '.otf', '.OTF', '.woff', '.WOFF')):
-            font_name = os.path.splitext(font_file)[0]
-            FONT_PATHS[font_name] = os.path.join(DYNAMIC_FONTS_DIR, font_file)
-
-# Create a list of acceptable font names
-ACCEPTABLE_FONTS = list(FONT_PATHS.keys())
-
 # Set FONTCONFIG_PATH to include our custom fonts directory
 os.environ['FONTCONFIG_PATH'] = FONTS_DIR
 
-def match_fonts():
-    try:
-        result = subprocess.run(['fc-list', ':family'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if result.returncode == 0:
-            fontconfig_fonts = result.stdout.split('\n')
-            fontconfig_fonts = list(set(fontconfig_fonts))  # Remove duplicates
-            matched_fonts = {}
-            for font_file in FONT_PATHS.keys():
-                for fontconfig_font in fontconfig_fonts:
-                    if font_file.lower() in fontconfig_font.lower():
-                        matched_fonts[font_file] = fontconfig_font.strip()
-
-            # Parse and output the matched font names
-            unique_font_names = set()
-            for font in matched_fonts.values():
-                font_name = font.split(':')[1].strip()
-                unique_font_names.add(font_name)
-            
-            # Remove duplicates from font_name and sort them alphabetically
-            unique_font_names = sorted(list(set(unique_font_names)))
-            
-            for font_name in unique_font_names:
-                print(font_name)
-        else:
-            logger.error(f"Error matching fonts: {result.stderr}")
-    except Exception as e:
-        logger.error(f"Exception while matching fonts: {str(e)}")
-
-match_fonts()
-
-# After scanning FONTS_DIR
-logger.info(f"Detected fonts: {', '.join(FONT_PATHS.keys())}")
+def default_font_path():
+    """Path of the Arial font used when the requested font is unavailable."""
+    font = find_font('Arial')
+    return font.path if font else None
 
 def generate_style_line(options):
     """Generate ASS style line from options."""
@@ -158,10 +110,7 @@ def download_and_verify_font(font_url, job_id):
             os.remove(font_path)
             raise ValueError(f"Unsupported MIME type: {mime_type}")
         
-        # Update FONT_PATHS dictionary
-        font_name = os.path.splitext(new_filename)[0]
-        FONT_PATHS[font_name] = font_path
-        ACCEPTABLE_FONTS.append(font_name)
+        add_font(font_path)
         
         return font_path
     except Exception as e:
@@ -221,12 +170,11 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         font_name = options.get('font_name', 'Arial')
         logger.info(f"Job {job_id}: Font name from options: {font_name}")
 
-        # Case-insensitive font matching
-        font_name_lower = font_name.lower()
-        matching_fonts = [f for f in FONT_PATHS.keys() if f.lower() == font_name_lower]
+        # Case-insensitive font matching, by family or font file name
+        font = None if font_name.startswith('http') else find_font(font_name)
 
-        if matching_fonts:
-            font_path = FONT_PATHS[matching_fonts[0]]
+        if font:
+            font_path = font.path
             logger.info(f"Job {job_id}: Font path set to {font_path}")
         elif font_name.startswith('http'):
             # Download and verify the font
@@ -235,13 +183,13 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             font_name = os.path.splitext(os.path.basename(font_path))[0]
             logger.info(f"Job {job_id}: Using downloaded font: {font_name}")
         else:
-            font_path = FONT_PATHS.get('Arial')
+            font_path = default_font_path()
             logger.warning(f"Job {job_id}: Font {font_name} not found. Using default font Arial.")
 
         # Ensure the font file exists
         if not os.path.exists(font_path):
             logger.error(f"Job {job_id}: Font file not found at {font_path}")
-            font_path = FONT_PATHS.get('Arial')
+            font_path = default_font_path()
             logger.warning(f"Job {job_id}: Falling back to Arial font")
 
         # For ASS subtitles, we should avoid overriding styles
@@ -287,11 +235,12 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             # Log the FFmpeg command for debugging
             logger.info(f"Job {job_id}: Running FFmpeg with filter: {subtitle_filter}")
 
-            # Run FFmpeg to add subtitles to the video
+            # Run FFmpeg to add subtitles to the video, with the default encoding profile
             ffmpeg.input(video_path).output(
                 output_path,
                 vf=subtitle_filter,
-                acodec='copy'
+                acodec='copy',
+                **get_profile().video_options()
             ).run()
             logger.info(f"Job {job_id}: FFmpeg processing completed, output file at {output_path}")
         except ffmpeg.Error as e:
@@ -0,0 +1,202 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from services.transcription_backends import get_backend, resolve_backend
+from services.thread_budget import current_lease, lease_threads
+from services.voice_activity import clip_timestamps
+from services.language_detection import detect_language
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Worker processes used to transcribe the chunks of one long recording in parallel
+LONG_FORM_WORKERS = int(os.environ.get('LONG_FORM_WORKERS', max(1, (os.cpu_count() or 1) // 4)))
+# Target chunk length; each cut is moved to the quietest point near this boundary
+LONG_FORM_CHUNK_SECONDS = float(os.environ.get('LONG_FORM_CHUNK_SECONDS', 300))
+# How far from the target boundary to look for silence to cut at
+SPLIT_SEARCH_SECONDS = 30.0
+# Energy frame length used to find silence
+VAD_FRAME_SECONDS = 0.03
+# Silence shorter than this is not considered a safe cut point
+MIN_SILENCE_SECONDS = 0.3
+
+# (model_size, backend) -> {"pool": ProcessPoolExecutor, "users": jobs using it}
+_pools = {}
+_pool_lock = threading.Lock()
+
+_worker_model = None
+
+def _init_worker(model_size, backend):
+    """Load the model once in each worker process."""
+    global _worker_model
+    import torch
+    # Sized per chunk from the submitting job's thread lease
+    torch.set_num_threads(1)
+    _worker_model = get_backend(backend).load(model_size)
+
+def _transcribe_chunk(audio_path, start, end, options, threads):
+    import torch
+    torch.set_num_threads(threads)
+    # Each worker maps the shared PCM file itself instead of receiving a pickled copy of its chunk
+    audio = np.memmap(audio_path, dtype=np.float32, mode='c')[start:end]
+    return _worker_model.transcribe(audio, **options)
+
+@contextmanager
+def _borrow_pool(model_size, backend):
+    """Use the worker pool of a model, starting it if needed.
+
+    Pools are counted by the jobs using them, so a job for another model
+    never shuts down a pool that still has chunks to run; idle pools of
+    other models are shut down to free their memory.
+    """
+    key = (model_size, backend)
+    with _pool_lock:
+        for other_key, other in list(_pools.items()):
+            if other_key != key and other['users'] == 0:
+                other['pool'].shutdown(wait=True)
+                del _pools[other_key]
+        entry = _pools.get(key)
+        if entry is None:
+            # Spawned (not forked) workers: forking a process with torch threads running can deadlock
+            pool = ProcessPoolExecutor(
+                max_workers=LONG_FORM_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(model_size, backend)
+            )
+            entry = _pools[key] = {"pool": pool, "users": 0}
+            logger.info(f"Started {LONG_FORM_WORKERS} long-form transcription workers for the {model_size} model on the {backend} backend")
+        entry['users'] += 1
+    try:
+        yield entry['pool']
+    finally:
+        with _pool_lock:
+            entry['users'] -= 1
+
+def frame_energy(audio):
+    """Return the RMS energy of consecutive VAD_FRAME_SECONDS frames."""
+    frame = int(VAD_FRAME_SECONDS * SAMPLE_RATE)
+    usable = len(audio) // frame * frame
+    frames = np.asarray(audio[:usable], dtype=np.float32).reshape(-1, frame)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+def find_split_points(audio, chunk_seconds=None):
+    """Choose sample offsets to cut audio into chunks of roughly chunk_seconds at silent points.
+
+    Around each target boundary the frame energy is smoothed over
+    MIN_SILENCE_SECONDS and the quietest window is chosen, so cuts land in
+    pauses instead of mid-word.
+    """
+    chunk_seconds = chunk_seconds or LONG_FORM_CHUNK_SECONDS
+    energy = frame_energy(audio)
+    window = max(1, int(MIN_SILENCE_SECONDS / VAD_FRAME_SECONDS))
+    smoothed = np.convolve(energy, np.ones(window) / window, mode='same')
+
+    frames_per_chunk = int(chunk_seconds / VAD_FRAME_SECONDS)
+    search = int(SPLIT_SEARCH_SECONDS / VAD_FRAME_SECONDS)
+    frame = int(VAD_FRAME_SECONDS * SAMPLE_RATE)
+
+    points = []
+    target = frames_per_chunk
+    while target < len(smoothed) - search:
+        low = max(target - search, (points[-1] // frame if points else 0) + search)
+        high = min(target + search, len(smoothed))
+        cut = low + int(np.argmin(smoothed[low:high])) if low < high else target
+        points.append(cut * frame)
+        target = cut + frames_per_chunk
+    return points
+
+def offset_result(result, offset):
+    """Shift all timestamps of a Whisper result by offset seconds."""
+    for segment in result['segments']:
+        segment['start'] += offset
+        segment['end'] += offset
+        segment['seek'] = segment.get('seek', 0) + int(offset * 100)
+        for word in segment.get('words', []):
+            word['start'] += offset
+            word['end'] += offset
+    return result
+
+def stitch_results(results):
+    """Merge (offset, result) pairs in order into a single Whisper result."""
+    segments = []
+    texts = []
+    for offset, result in results:
+        for segment in offset_result(result, offset)['segments']:
+            segment['id'] = len(segments)
+            segments.append(segment)
+        texts.append(result['text'].strip())
+    return {
+        "text": " ".join(text for text in texts if text),
+        "segments": segments,
+        "language": results[0][1].get('language') if results else None
+    }
+
+def transcribe_long_form(audio, model_size, options, on_progress=None, backend=None, speech_regions=None):
+    """Transcribe memory-mapped 16 kHz audio by splitting it at silences and decoding the chunks in parallel processes.
+
+    Returns a result with the same text/segments/words structure as
+    model.transcribe, with every timestamp relative to the start of audio.
+    With speech_regions (seconds, from services.voice_activity) each chunk
+    only decodes its speech and chunks without any are skipped.
+
+    The chunks share the torch threads leased by the calling job (a lease
+    is taken if the caller holds none): at most that many chunks run at
+    once, each with an equal part of the lease.
+    """
+    lease = current_lease()
+    if lease is None:
+        with lease_threads():
+            return transcribe_long_form(audio, model_size, options, on_progress, backend, speech_regions)
+
+    start_time = time.time()
+    points = find_split_points(audio)
+    bounds = list(zip([0] + points, points + [len(audio)]))
+    logger.info(f"Transcribing {len(audio) / SAMPLE_RATE:.0f}s of audio as {len(bounds)} chunks")
+
+    options = dict(options, verbose=False)
+    if not options.get('language'):
+        # Decide the language once so every chunk is decoded consistently
+        options['language'] = detect_language(audio, model_size, backend)
+        logger.info(f"Detected language '{options['language']}' for long-form transcription")
+
+    chunks = []
+    for start, end in bounds:
+        chunk_options = options
+        if speech_regions is not None:
+            clips = clip_timestamps(speech_regions, start / SAMPLE_RATE, end / SAMPLE_RATE)
+            if not clips:
+                continue
+            chunk_options = dict(options, clip_timestamps=clips)
+        chunks.append((start, end, chunk_options))
+
+    parallel = max(1, min(LONG_FORM_WORKERS, lease['threads'], len(chunks)))
+    threads = max(1, lease['threads'] // parallel)
+    logger.info(f"Running {parallel} chunks at a time with {threads} threads each")
+    results = []
+    with _borrow_pool(model_size, resolve_backend(backend)) as pool:
+        pending = {}
+        remaining = iter(chunks)
+        while True:
+            # Keep at most `parallel` chunks in flight so the job stays within its lease
+            for start, end, chunk_options in remaining:
+                pending[pool.submit(_transcribe_chunk, audio.filename, start, end, chunk_options, threads)] = start / SAMPLE_RATE
+                if len(pending) >= parallel:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                results.append((pending.pop(future), future.result()))
+                if on_progress:
+                    on_progress(int(len(results) * 100 / len(chunks)))
+    results.sort(key=lambda item: item[0])
+
+    result = stitch_results(results)
+    logger.info(f"Long-form transcription of {len(bounds)} chunks finished in {time.time() - start_time:.2f}s")
+    return result
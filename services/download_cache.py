@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import logging
+from contextlib import contextmanager
+from services.sqlite_store import get_connection, owner_is_alive
+from services.downloader import download, open_url
+
+logger = logging.getLogger(__name__)
+
+# Downloaded inputs are kept here so repeated requests for the same URL skip the transfer
+DOWNLOAD_CACHE_DIR = os.environ.get('DOWNLOAD_CACHE_DIR', '/tmp/nca_download_cache')
+# Least recently used files are evicted once the cache grows beyond this size
+DOWNLOAD_CACHE_MAX_BYTES = int(os.environ.get('DOWNLOAD_CACHE_MAX_BYTES', 10 * 1024 ** 3))
+DOWNLOAD_CACHE_ENABLED = os.environ.get('DOWNLOAD_CACHE_ENABLED', 'true').lower() == 'true'
+# Partial downloads untouched for this many seconds, whose worker has exited, are deleted on eviction
+DOWNLOAD_CACHE_PARTIAL_TTL = float(os.environ.get('DOWNLOAD_CACHE_PARTIAL_TTL', 24 * 3600))
+
+_initialized_pid = None
+
+def _connection():
+    global _initialized_pid
+    conn = get_connection()
+    if _initialized_pid != os.getpid():
+        # Files are stored by the sha256 of their content; several URLs can share one blob
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS download_cache (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS download_cache_last_used ON download_cache (last_used_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS download_cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        os.makedirs(DOWNLOAD_CACHE_DIR, exist_ok=True)
+        _initialized_pid = os.getpid()
+    return conn
+
+def _increment_stat(conn, name, amount=1):
+    conn.execute(
+        "INSERT INTO download_cache_stats (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount)
+    )
+
+def _blob_path(content_hash):
+    return os.path.join(DOWNLOAD_CACHE_DIR, content_hash)
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        # Cache directory on another filesystem
+        shutil.copyfile(source, destination)
+
+def _is_cacheable(response):
+    cache_control = response.headers.get('Cache-Control', '').lower()
+    if 'no-store' in cache_control:
+        return False
+    # Without a validator the cached copy could never be revalidated
+    return bool(response.headers.get('ETag') or response.headers.get('Last-Modified'))
+
+def _url_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+def _lock_path(key):
+    return os.path.join(DOWNLOAD_CACHE_DIR, f".{key}.lock")
+
+@contextmanager
+def _url_lock(url):
+    """Hold an exclusive lock on url, shared by every thread and worker on the host, while it is fetched."""
+    lock_path = _lock_path(_url_key(url))
+    while True:
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            # The lock file may have been removed while waiting for it; lock the current one instead
+            current = os.fstat(fd).st_ino == os.stat(lock_path).st_ino
+        except FileNotFoundError:
+            current = False
+        if current:
+            break
+        os.close(fd)
+    try:
+        os.utime(lock_path)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 ** 2), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def fetch(url, destination):
+    """Download url to destination, serving it from the local cache when the origin confirms it is unchanged.
+
+    Cached entries are revalidated with a conditional GET (If-None-Match /
+    If-Modified-Since); a 304 response links the cached file into place.
+    Concurrent fetches of the same URL run one after another, so the later
+    ones are served from the cache. Returns the transfer statistics of
+    services.downloader.download, with cache_hit set.
+    """
+    conn = _connection()
+    with _url_lock(url):
+        return _fetch(conn, url, destination)
+
+def _fetch(conn, url, destination):
+    entry = conn.execute("SELECT * FROM download_cache WHERE url = ?", (url,)).fetchone()
+    if entry is not None and not os.path.exists(_blob_path(entry['content_hash'])):
+        entry = None
+
+    headers = {}
+    if entry is not None:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = open_url(url, headers)
+    try:
+        if response.status_code == 304 and entry is not None:
+            try:
+                _link_or_copy(_blob_path(entry['content_hash']), destination)
+            except FileNotFoundError:
+                # Evicted by another worker since it was looked up
+                conn.execute("DELETE FROM download_cache WHERE url = ?", (url,))
+                response.close()
+                return _fetch(conn, url, destination)
+            conn.execute("UPDATE download_cache SET last_used_at = ? WHERE url = ?", (time.time(), url))
+            _increment_stat(conn, 'hits')
+            _increment_stat(conn, 'bytes_saved', entry['size'])
+            logger.info(f"Download cache hit for {url} ({entry['size']} bytes)")
+            return {"bytes": entry['size'], "resumed_bytes": 0, "connections": 0, "seconds": 0, "bytes_per_second": None, "cache_hit": True}
+        response.raise_for_status()
+
+        _increment_stat(conn, 'misses')
+        if not _is_cacheable(response):
+            stats = download(url, destination, response)
+            stats['cache_hit'] = False
+            return stats
+
+        # A stable temporary name lets an interrupted download of the same URL resume
+        temp_path = os.path.join(DOWNLOAD_CACHE_DIR, f".{_url_key(url)}")
+        stats = download(url, temp_path, response)
+        content_hash = _hash_file(temp_path)
+        size = stats['bytes']
+        os.replace(temp_path, _blob_path(content_hash))
+    finally:
+        response.close()
+
+    now = time.time()
+    conn.execute(
+        "INSERT OR REPLACE INTO download_cache (url, content_hash, size, etag, last_modified, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (url, content_hash, size, response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now)
+    )
+    if entry is not None and entry['content_hash'] != content_hash:
+        _remove_unreferenced_blob(conn, entry['content_hash'])
+    _link_or_copy(_blob_path(content_hash), destination)
+    evict()
+    stats['cache_hit'] = False
+    return stats
+
+def _remove_unreferenced_blob(conn, content_hash):
+    if conn.execute("SELECT 1 FROM download_cache WHERE content_hash = ?", (content_hash,)).fetchone() is None:
+        try:
+            os.remove(_blob_path(content_hash))
+        except FileNotFoundError:
+            pass
+
+def _owner_alive(state_path):
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return owner_is_alive(state.get('owner_pid'), state.get('claimed_at'))
+
+def sweep_partials(ttl=None):
+    """Delete abandoned partial downloads and unused lock files, and return the disk space held by the remaining partials.
+
+    The temporary files of a URL (.<url key>.part, its .part.json progress
+    and the .lock file) are abandoned when none of them changed for ttl
+    seconds (default: DOWNLOAD_CACHE_PARTIAL_TTL), the worker that wrote
+    the progress has exited and no fetch of the URL holds its lock.
+    """
+    ttl = DOWNLOAD_CACHE_PARTIAL_TTL if ttl is None else ttl
+    if not os.path.isdir(DOWNLOAD_CACHE_DIR):
+        return 0
+    now = time.time()
+    groups = {}
+    for entry in os.scandir(DOWNLOAD_CACHE_DIR):
+        # Blobs are named by content hash; temporary files start with '.' and the URL key
+        if entry.name.startswith('.') and len(entry.name) > 65:
+            try:
+                groups.setdefault(entry.name[1:65], []).append((entry.path, entry.stat()))
+            except FileNotFoundError:
+                pass
+
+    held = 0
+    removed = 0
+    for key, files in groups.items():
+        partial_bytes = sum(stat.st_blocks * 512 for path, stat in files if not path.endswith('.lock'))
+        if now - max(stat.st_mtime for _, stat in files) <= ttl or any(
+            _owner_alive(path) for path, _ in files if path.endswith('.part.json')
+        ):
+            held += partial_bytes
+            continue
+        try:
+            fd = os.open(_lock_path(key), os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            held += partial_bytes
+            continue
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # A fetch of this URL is running
+            os.close(fd)
+            held += partial_bytes
+            continue
+        try:
+            for path, _ in files:
+                if not path.endswith('.lock'):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            # Fetches already waiting on this lock file notice it is gone and lock a new one
+            os.remove(_lock_path(key))
+        finally:
+            os.close(fd)
+        removed += 1
+    if removed:
+        logger.info(f"Removed the temporary files of {removed} abandoned download(s) from the download cache")
+    return held
+
+def evict(max_bytes=None):
+    """Delete abandoned partial downloads, then least recently used files until the cache fits in max_bytes.
+
+    Partial downloads still in progress count towards max_bytes.
+    """
+    max_bytes = DOWNLOAD_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    conn = _connection()
+    partial_bytes = sweep_partials()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        blobs = conn.execute(
+            "SELECT content_hash, MAX(size) AS size, MAX(last_used_at) AS last_used_at FROM download_cache GROUP BY content_hash ORDER BY last_used_at"
+        ).fetchall()
+        total = sum(blob['size'] for blob in blobs) + partial_bytes
+        evicted = []
+        for blob in blobs:
+            if total <= max_bytes:
+                break
+            conn.execute("DELETE FROM download_cache WHERE content_hash = ?", (blob['content_hash'],))
+            total -= blob['size']
+            evicted.append(blob['content_hash'])
+        if evicted:
+            _increment_stat(conn, 'evictions', len(evicted))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    for content_hash in evicted:
+        # Files already linked into a job's working directory are unaffected
+        try:
+            os.remove(_blob_path(content_hash))
+        except FileNotFoundError:
+            pass
+    if evicted:
+        logger.info(f"Evicted {len(evicted)} file(s) from the download cache")
+
+def get_cache_stats():
+    conn = _connection()
+    stats = {row['name']: row['value'] for row in conn.execute("SELECT name, value FROM download_cache_stats")}
+    usage = conn.execute("SELECT COUNT(DISTINCT content_hash) AS files, COUNT(*) AS urls FROM download_cache").fetchone()
+    size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM download_cache GROUP BY content_hash)").fetchone()[0]
+    hits = stats.get('hits', 0)
+    misses = stats.get('misses', 0)
+    return {
+        "enabled": DOWNLOAD_CACHE_ENABLED,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        "bytes_saved": stats.get('bytes_saved', 0),
+        "evictions": stats.get('evictions', 0),
+        "files": usage['files'],
+        "urls": usage['urls'],
+        "size_bytes": size,
+        "max_bytes": DOWNLOAD_CACHE_MAX_BYTES
+    }
@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from services.sqlite_store import owner_is_alive
+
+logger = logging.getLogger(__name__)
+
+# Parallel connections used for a single large download when the server supports Range requests
+DOWNLOAD_CONNECTIONS = int(os.environ.get('DOWNLOAD_CONNECTIONS', 4))
+# Each connection fetches at least this many bytes; smaller files use a single connection
+DOWNLOAD_SEGMENT_BYTES = int(os.environ.get('DOWNLOAD_SEGMENT_BYTES', 16 * 1024 ** 2))
+DOWNLOAD_BUFFER_BYTES = int(os.environ.get('DOWNLOAD_BUFFER_BYTES', 1024 ** 2))
+DOWNLOAD_TIMEOUT = float(os.environ.get('DOWNLOAD_TIMEOUT', 60))
+# Times a connection is re-established (resuming where it stopped) before the download fails
+DOWNLOAD_RETRIES = int(os.environ.get('DOWNLOAD_RETRIES', 3))
+# Interrupted downloads are kept here, named by URL, so a later attempt for the same URL resumes
+# them; the download cache directory, whose eviction removes abandoned ones
+DOWNLOAD_PARTIAL_DIR = os.environ.get('DOWNLOAD_CACHE_DIR', '/tmp/nca_download_cache')
+# Progress is written to the .part.json sidecar every this many bytes per connection
+STATE_SAVE_BYTES = 8 * 1024 ** 2
+# Times a download starts over when the server answers a Range request with the whole file;
+# after that it is fetched over a single connection without Range requests
+RANGE_RESTARTS = 1
+
+_session = None
+_session_lock = threading.Lock()
+_active_parts = set()
+_active_parts_lock = threading.Lock()
+
+class RangeIgnoredError(Exception):
+    """The server answered a Range request with the full file, e.g. because it changed."""
+    pass
+
+class DownloadStopped(Exception):
+    """A connection was told to stop because another connection of the same download failed."""
+    pass
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=DOWNLOAD_CONNECTIONS * 4)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            # Byte offsets must refer to the stored representation
+            session.headers['Accept-Encoding'] = 'identity'
+            _session = session
+        return _session
+
+def open_url(url, headers=None):
+    response = get_session().get(url, stream=True, headers=headers or {}, timeout=DOWNLOAD_TIMEOUT)
+    return response
+
+def _load_state(state_path):
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_state(state_path, state):
+    temp_path = f"{state_path}.{os.getpid()}.{threading.get_ident()}"
+    with open(temp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp_path, state_path)
+
+def _claim_partial(url):
+    """Return the .part path to download url into, resuming a previous attempt unless another download is using it."""
+    os.makedirs(DOWNLOAD_PARTIAL_DIR, exist_ok=True)
+    base_path = os.path.join(DOWNLOAD_PARTIAL_DIR, f".{hashlib.sha256(url.encode()).hexdigest()}")
+    part_path = f"{base_path}.part"
+    state = _load_state(f"{part_path}.json")
+    with _active_parts_lock:
+        in_use = part_path in _active_parts or (
+            state is not None and state.get('owner_pid') != os.getpid() and owner_is_alive(state.get('owner_pid'), state.get('claimed_at'))
+        )
+        if in_use:
+            part_path = f"{base_path}.{uuid.uuid4().hex}.part"
+            state = None
+        _active_parts.add(part_path)
+    return part_path, state
+
+def _release_partial(part_path):
+    with _active_parts_lock:
+        _active_parts.discard(part_path)
+
+def _plan_segments(size, ranged):
+    if not ranged or not size:
+        return [{"start": 0, "end": size - 1 if size else None, "done": 0}]
+    count = max(1, min(DOWNLOAD_CONNECTIONS, size // DOWNLOAD_SEGMENT_BYTES))
+    step = size // count
+    segments = []
+    for i in range(count):
+        start = i * step
+        end = size - 1 if i == count - 1 else start + step - 1
+        segments.append({"start": start, "end": end, "done": 0})
+    return segments
+
+def _move(source, destination):
+    try:
+        os.replace(source, destination)
+    except OSError:
+        # Destination on another filesystem than DOWNLOAD_PARTIAL_DIR
+        shutil.move(source, destination)
+
+def _fetch_segment(url, fd, segment, state, state_path, state_lock, ranged, response=None, stop=None):
+    attempts = 0
+    unsaved = 0
+    while True:
+        if stop is not None and stop.is_set():
+            raise DownloadStopped()
+        try:
+            if response is None:
+                headers = {}
+                if ranged:
+                    end = segment['end'] if segment['end'] is not None else ''
+                    headers['Range'] = f"bytes={segment['start'] + segment['done']}-{end}"
+                    # Servers must ignore Range when If-Range holds a weak ETag
+                    if state['validator'] and not state['validator'].startswith('W/'):
+                        headers['If-Range'] = state['validator']
+                response = open_url(url, headers)
+                response.raise_for_status()
+                if ranged and response.status_code != 206:
+                    response.close()
+                    raise RangeIgnoredError(f"Expected a partial response for {url}, got {response.status_code}")
+
+            with response:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_BUFFER_BYTES):
+                    if stop is not None and stop.is_set():
+                        raise DownloadStopped()
+                    os.pwrite(fd, chunk, segment['start'] + segment['done'])
+                    segment['done'] += len(chunk)
+                    unsaved += len(chunk)
+                    if unsaved >= STATE_SAVE_BYTES:
+                        with state_lock:
+                            _save_state(state_path, state)
+                        unsaved = 0
+            if segment['end'] is not None and segment['start'] + segment['done'] <= segment['end']:
+                raise requests.ConnectionError(f"Connection closed after {segment['done']} bytes")
+            return
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            response = None
+            attempts += 1
+            if attempts > DOWNLOAD_RETRIES:
+                raise
+            if not ranged:
+                # Without Range support the only option is to start over
+                segment['done'] = 0
+            logger.warning(f"Download of {url} interrupted ({e}), retrying from byte {segment['start'] + segment['done']}")
+            time.sleep(attempts)
+
+def download(url, path, response=None):
+    """Download url to path and return transfer statistics.
+
+    Large files are fetched over several connections using HTTP Range
+    requests when the server supports them. Data is written to a .part file
+    in DOWNLOAD_PARTIAL_DIR named after the URL, with progress kept next to
+    it in .part.json, so an interrupted download of the URL - dropped
+    connection, failed job or restarted worker - resumes from where it
+    stopped on the next attempt instead of starting over, whatever path
+    that attempt downloads to. response may be an already opened
+    streaming GET for url, which is reused when a single connection is used.
+    """
+    return _download(url, path, response, 0)
+
+def _download(url, path, response, restarts):
+    start_time = time.time()
+    part_path, previous_state = _claim_partial(url)
+    state_path = f"{part_path}.json"
+    try:
+        if response is None:
+            response = open_url(url)
+        response.raise_for_status()
+        size = int(response.headers['Content-Length']) if 'Content-Length' in response.headers else None
+        etag = response.headers.get('ETag')
+        # A strong ETag, else Last-Modified, can guard Range requests with If-Range
+        validator = (etag if etag and not etag.startswith('W/') else None) or response.headers.get('Last-Modified') or etag
+        ranged = restarts <= RANGE_RESTARTS and response.headers.get('Accept-Ranges', '').lower() == 'bytes' and size is not None
+
+        resumed_bytes = 0
+        if (
+            ranged and previous_state is not None and os.path.exists(part_path)
+            and (previous_state['url'], previous_state['size'], previous_state['validator']) == (url, size, validator)
+        ):
+            segments = previous_state['segments']
+            resumed_bytes = sum(segment['done'] for segment in segments)
+            logger.info(f"Resuming download of {url} at {resumed_bytes} of {size} bytes")
+        else:
+            segments = _plan_segments(size, ranged)
+            with open(part_path, 'wb') as f:
+                if size:
+                    f.truncate(size)
+
+        state = {
+            "url": url,
+            "size": size,
+            "validator": validator,
+            "owner_pid": os.getpid(),
+            "claimed_at": time.time(),
+            "segments": segments
+        }
+        _save_state(state_path, state)
+
+        pending = [segment for segment in segments if segment['end'] is None or segment['start'] + segment['done'] <= segment['end']]
+        reuse_response = len(pending) == 1 and resumed_bytes == 0
+        if not reuse_response:
+            response.close()
+
+        state_lock = threading.Lock()
+        stop = threading.Event()
+        fd = os.open(part_path, os.O_WRONLY)
+        try:
+            if len(pending) == 1:
+                _fetch_segment(url, fd, pending[0], state, state_path, state_lock, ranged, response if reuse_response else None)
+            elif pending:
+                with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+                    futures = [
+                        pool.submit(_fetch_segment, url, fd, segment, state, state_path, state_lock, ranged, None, stop)
+                        for segment in pending
+                    ]
+                    try:
+                        for future in as_completed(futures):
+                            future.result()
+                    except Exception:
+                        # Stop the other connections rather than waiting for them to finish their segments
+                        stop.set()
+                        raise
+        except RangeIgnoredError as e:
+            # The file changed since the partial copy was written, or the server does not honour Range after all
+            os.close(fd)
+            fd = None
+            for leftover in (part_path, state_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            _release_partial(part_path)
+            if restarts < RANGE_RESTARTS:
+                logger.warning(f"{e}; restarting download")
+            else:
+                logger.warning(f"{e}; downloading over a single connection without Range requests")
+            return _download(url, path, None, restarts + 1)
+        except Exception:
+            # Keep the progress made so far for the next attempt
+            with state_lock:
+                _save_state(state_path, state)
+            raise
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+        total_bytes = sum(segment['done'] for segment in segments)
+        if size is None:
+            os.truncate(part_path, total_bytes)
+        _move(part_path, path)
+        os.remove(state_path)
+    finally:
+        _release_partial(part_path)
+
+    elapsed = time.time() - start_time
+    transferred = total_bytes - resumed_bytes
+    stats = {
+        "bytes": total_bytes,
+        "resumed_bytes": resumed_bytes,
+        "connections": len(pending),
+        "seconds": round(elapsed, 3),
+        "bytes_per_second": round(transferred / elapsed) if elapsed > 0 else None
+    }
+    logger.info(f"Downloaded {url}: {total_bytes} bytes over {len(pending)} connection(s) in {elapsed:.2f}s ({stats['bytes_per_second']} B/s)")
+    return stats
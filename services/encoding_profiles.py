@@ -0,0 +1,134 @@
+import os
+import json
+import logging
+import subprocess
+import ffmpeg
+from services.startup import once
+
+logger = logging.getLogger(__name__)
+
+# Encoding profile used when a request does not choose one
+ENCODING_PROFILE = os.environ.get('ENCODING_PROFILE', 'balanced')
+# H.264 encoder for video re-encodes: libx264 (CPU), h264_nvenc (NVIDIA) or h264_qsv (Intel Quick Sync)
+VIDEO_ENCODER = os.environ.get('VIDEO_ENCODER', 'libx264')
+# Encoder threads per re-encode when a profile does not set them; 0 lets ffmpeg use every core
+ENCODING_THREADS = int(os.environ.get('ENCODING_THREADS', 0))
+# JSON object of profile overrides or additional profiles, e.g. {"fast": {"preset": "ultrafast", "tune": "fastdecode"}}
+ENCODING_PROFILES = os.environ.get('ENCODING_PROFILES')
+
+# x264 presets, fastest first
+X264_PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow']
+# The closest preset of each hardware encoder; NVENC ranges from p1 (fastest) to p7, Quick Sync starts at veryfast
+NVENC_PRESETS = dict(zip(X264_PRESETS, ['p1', 'p1', 'p2', 'p3', 'p3', 'p4', 'p5', 'p6', 'p7']))
+QSV_PRESETS = dict(zip(X264_PRESETS, ['veryfast', 'veryfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow']))
+
+class EncodingProfile:
+    """A named trade-off between encoding speed and quality for H.264 re-encodes.
+
+    preset and tune use x264 names and crf the x264 scale (lower is better);
+    they are translated for hardware encoders.
+    """
+
+    def __init__(self, name, preset, crf, tune=None, threads=None):
+        self.name = name
+        self.preset = preset
+        self.crf = crf
+        self.tune = tune
+        self.threads = ENCODING_THREADS if threads is None else threads
+
+    def video_options(self):
+        """Return the ffmpeg output options (without leading dashes) selecting the encoder and its settings."""
+        encoder = available_video_encoder()
+        if encoder == 'h264_nvenc':
+            options = {'c:v': encoder, 'preset': NVENC_PRESETS[self.preset], 'rc': 'vbr', 'cq': self.crf, 'b:v': 0}
+        elif encoder == 'h264_qsv':
+            options = {'c:v': encoder, 'preset': QSV_PRESETS[self.preset], 'global_quality': self.crf}
+        else:
+            options = {'c:v': encoder, 'preset': self.preset, 'crf': self.crf}
+            if self.tune:
+                options['tune'] = self.tune
+        if self.threads:
+            options['threads'] = self.threads
+        return options
+
+    def video_args(self):
+        """Return video_options() as ffmpeg command line arguments."""
+        args = []
+        for option, value in self.video_options().items():
+            args.extend([f'-{option}', str(value)])
+        return args
+
+    def describe(self):
+        """Settings of this profile for job responses."""
+        return {
+            "profile": self.name,
+            "encoder": available_video_encoder(),
+            "preset": self.preset,
+            "crf": self.crf,
+            "tune": self.tune,
+            "threads": self.threads
+        }
+
+def _build_profiles():
+    profiles = {
+        # Quickest turnaround, larger files
+        'fast': {'preset': 'veryfast', 'crf': 23},
+        # libx264's defaults, which every re-encode used before profiles were added
+        'balanced': {'preset': 'medium', 'crf': 23},
+        # Smallest files at high quality, several times slower than balanced
+        'archive': {'preset': 'slow', 'crf': 18}
+    }
+    if ENCODING_PROFILES:
+        for name, settings in json.loads(ENCODING_PROFILES).items():
+            profiles[name] = {**profiles.get(name, {}), **settings}
+    for name, settings in profiles.items():
+        if settings.get('preset') not in X264_PRESETS:
+            raise ValueError(f"Encoding profile '{name}' has an unknown preset '{settings.get('preset')}'. Choose one of: {', '.join(X264_PRESETS)}")
+    return {
+        name: EncodingProfile(name, settings['preset'], settings.get('crf', 23), settings.get('tune'), settings.get('threads'))
+        for name, settings in profiles.items()
+    }
+
+PROFILES = _build_profiles()
+
+@once('video encoder')
+def available_video_encoder():
+    """Return VIDEO_ENCODER if this ffmpeg build provides it, otherwise fall back to libx264."""
+    if VIDEO_ENCODER == 'libx264':
+        return VIDEO_ENCODER
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, text=True, check=True)
+        if any(line.split()[1:2] == [VIDEO_ENCODER] for line in result.stdout.splitlines()):
+            return VIDEO_ENCODER
+        logger.warning(f"ffmpeg has no {VIDEO_ENCODER} encoder; encoding with libx264")
+    except Exception as e:
+        logger.warning(f"Could not list ffmpeg encoders ({str(e)}); encoding with libx264")
+    return 'libx264'
+
+def get_profile(name=None):
+    """Return the EncodingProfile called name (default: ENCODING_PROFILE)."""
+    name = name or ENCODING_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Encoding profile '{name}' is not available. Choose one of: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+def encoding_report(profile, output_path, encode_seconds):
+    """Describe a finished re-encode: its settings, how long it took and the output's duration, size and bitrate.
+
+    speed is seconds of output encoded per second of wall time. profile is
+    None when the video stream was copied rather than re-encoded.
+    """
+    report = profile.describe() if profile else {"profile": None, "encoder": "copy"}
+    report["encode_seconds"] = round(encode_seconds, 3)
+    try:
+        media_format = ffmpeg.probe(output_path)['format']
+        duration = float(media_format['duration'])
+        report.update({
+            "duration": round(duration, 3),
+            "size": int(media_format['size']),
+            "bitrate": int(media_format['bit_rate']),
+            "speed": round(duration / encode_seconds, 2) if encode_seconds > 0 else None
+        })
+    except Exception as e:
+        logger.warning(f"Could not probe encoded output {output_path}: {str(e)}")
+    return report
@@ -1,9 +1,22 @@
 import os
+import time
 import uuid
-import requests
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, parse_qs
+from services import download_cache, downloader
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of input files of one job that are downloaded at the same time
+DOWNLOAD_CONCURRENCY = int(os.environ.get('DOWNLOAD_CONCURRENCY', 8))
 
 def download_file(url, storage_path="/tmp/"):
+    local_filename, _ = download_file_with_stats(url, storage_path)
+    return local_filename
+
+def download_file_with_stats(url, storage_path="/tmp/"):
+    """Download url into storage_path, returning (local_filename, transfer statistics)."""
     # Parse the URL to extract the file ID from the query parameters
     parsed_url = urlparse(url)
     query_params = parse_qs(parsed_url.query)
@@ -21,15 +34,57 @@ def download_file(url, storage_path="/tmp/"):
     # Use the file ID as the filename and save it in the specified storage path
     local_filename = os.path.join(storage_path, f"{file_id}.mp4")  # Assuming mp4; adjust extension if needed
     
-    # Download the file
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
-    
-    with open(local_filename, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
+    # Download the file, reusing the host-wide cached copy if it is still current
+    if download_cache.DOWNLOAD_CACHE_ENABLED:
+        stats = download_cache.fetch(url, local_filename)
+    else:
+        stats = downloader.download(url, local_filename)
+        stats['cache_hit'] = False
+        # Partial downloads are kept in the cache directory even when caching is off
+        download_cache.sweep_partials()
     
-    return local_filename
+    return local_filename, stats
+
+def download_files_concurrently(downloads, max_workers=None):
+    """Download several (url, storage_path) pairs in parallel.
+
+    Returns the local filenames in input order and a matching list of
+    per-input timings. If any download fails the others are cancelled,
+    files already downloaded are removed and the error is raised.
+    """
+    if not downloads:
+        return [], []
+    max_workers = min(max_workers or DOWNLOAD_CONCURRENCY, len(downloads))
+    local_filenames = [None] * len(downloads)
+    timings = [None] * len(downloads)
+    start_time = time.time()
+
+    def fetch(index, url, storage_path):
+        queued_for = time.time() - start_time
+        local_filename, stats = download_file_with_stats(url, storage_path)
+        stats.update({"index": index, "url": url, "wait_time": round(queued_for, 3)})
+        return index, local_filename, stats
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(fetch, i, url, storage_path) for i, (url, storage_path) in enumerate(downloads)]
+        try:
+            for future in as_completed(futures):
+                index, local_filename, stats = future.result()
+                local_filenames[index] = local_filename
+                timings[index] = stats
+        except Exception:
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=True)
+            for future in futures:
+                if not future.cancelled() and future.exception() is None:
+                    _, local_filename, _ = future.result()
+                    if os.path.exists(local_filename):
+                        os.remove(local_filename)
+            raise
+
+    logger.info(f"Downloaded {len(downloads)} files with {max_workers} parallel downloads in {time.time() - start_time:.2f}s")
+    return local_filenames, timings
 
 
 def delete_old_files():
@@ -0,0 +1,145 @@
+import os
+import time
+import logging
+import threading
+from services.startup import once
+
+logger = logging.getLogger(__name__)
+
+# Fonts shipped with the image
+FONTS_DIR = '/usr/share/fonts/custom'
+# Fonts downloaded by caption requests
+DYNAMIC_FONTS_DIR = '/usr/share/fonts/custom/dynamic'
+# Directories searched for fonts, recursively (FONTS_DIR lives under /usr/share/fonts)
+FONT_SEARCH_DIRS = [
+    d for d in os.environ.get(
+        'FONT_SEARCH_DIRS',
+        f"/usr/share/fonts:/usr/local/share/fonts:{os.path.expanduser('~/.fonts')}:{os.path.expanduser('~/.local/share/fonts')}"
+    ).split(':') if d
+]
+FONT_EXTENSIONS = ('.ttf', '.otf', '.woff')
+
+class Font:
+    """A font file with the family and style names read from it (None if the file could not be parsed)."""
+
+    def __init__(self, path, family, style):
+        self.path = path
+        self.family = family
+        self.style = style
+
+    @property
+    def name(self):
+        """File name without extension, which the legacy caption endpoint also accepts as a font name."""
+        return os.path.splitext(os.path.basename(self.path))[0]
+
+# path -> Font
+_fonts = {}
+# lower-cased family name -> [Font, ...]
+_families = {}
+# lower-cased file name without extension -> Font
+_names = {}
+# mtime of DYNAMIC_FONTS_DIR when it was last scanned
+_dynamic_mtime = None
+_lock = threading.RLock()
+
+def _font_reader():
+    try:
+        from matplotlib.font_manager import get_font
+        return get_font
+    except ImportError:
+        logger.error("matplotlib not installed. Install via 'pip install matplotlib'.")
+        return None
+
+def _read_font(path, get_font):
+    if get_font is None:
+        return Font(path, None, None)
+    try:
+        font = get_font(path)
+        return Font(path, font.family_name, font.style_name)
+    except Exception as e:
+        logger.warning(f"Could not read font {path}: {str(e)}")
+        return Font(path, None, None)
+
+def _font_files(directory):
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file.lower().endswith(FONT_EXTENSIONS):
+                yield os.path.join(root, file)
+
+def _index(font):
+    _fonts[font.path] = font
+    if font.family:
+        _families.setdefault(font.family.lower(), []).append(font)
+    # Custom fonts take precedence over system fonts with the same file name
+    if font.name.lower() not in _names or font.path.startswith(FONTS_DIR):
+        _names[font.name.lower()] = font
+
+def _dir_mtime(directory):
+    try:
+        return os.stat(directory).st_mtime
+    except OSError:
+        return None
+
+@once('font catalog')
+def load_font_catalog():
+    """Scan FONT_SEARCH_DIRS and index every font by family and file name, once per process."""
+    global _dynamic_mtime
+    with _lock:
+        start_time = time.time()
+        dynamic_mtime = _dir_mtime(DYNAMIC_FONTS_DIR)
+        paths = set()
+        for directory in FONT_SEARCH_DIRS + [FONTS_DIR, DYNAMIC_FONTS_DIR]:
+            paths.update(_font_files(directory))
+        _fonts.clear()
+        _families.clear()
+        _names.clear()
+        get_font = _font_reader()
+        for path in sorted(paths):
+            _index(_read_font(path, get_font))
+        _dynamic_mtime = dynamic_mtime
+    logger.info(f"Font catalog loaded: {len(_families)} families from {len(_fonts)} files in {time.time() - start_time:.2f}s")
+
+def _ensure_current():
+    """Load the catalog on first use, and index fonts added to DYNAMIC_FONTS_DIR since the last scan."""
+    global _dynamic_mtime
+    load_font_catalog()
+    with _lock:
+        dynamic_mtime = _dir_mtime(DYNAMIC_FONTS_DIR)
+        if dynamic_mtime == _dynamic_mtime:
+            return
+        get_font = None
+        for path in sorted(_font_files(DYNAMIC_FONTS_DIR)):
+            if path not in _fonts:
+                get_font = get_font or _font_reader()
+                add_font(path, get_font)
+        _dynamic_mtime = dynamic_mtime
+
+def add_font(path, get_font=None):
+    """Index a newly installed font file and return its Font."""
+    with _lock:
+        if path in _fonts:
+            return _fonts[path]
+        font = _read_font(path, get_font or _font_reader())
+        _index(font)
+    logger.info(f"Added font {font.family or font.name} from {path}")
+    return font
+
+def find_font(name):
+    """Return the Font for a family name, or failing that a font file name, matched case-insensitively.
+
+    Of a family's files, the regular style is preferred. Returns None if no
+    font matches.
+    """
+    _ensure_current()
+    key = name.lower()
+    with _lock:
+        fonts = _families.get(key)
+        if fonts:
+            return next((font for font in fonts if (font.style or '').lower() == 'regular'), fonts[0])
+        return _names.get(key)
+
+def list_font_families():
+    """Return the sorted family names of all available fonts."""
+    _ensure_current()
+    with _lock:
+        return sorted({fonts[0].family for fonts in _families.values()})
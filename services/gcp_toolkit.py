@@ -1,8 +1,7 @@
 import os
 import json
 import logging
-from google.oauth2 import service_account
-from google.cloud import storage
+from services.startup import once
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -11,9 +10,10 @@ logger = logging.getLogger(__name__)
 # GCS environment variables
 GCP_BUCKET_NAME = os.getenv('GCP_BUCKET_NAME')
 STORAGE_PATH = "/tmp/"
-gcs_client = None
 
-def initialize_gcp_client():
+@once('gcs client')
+def get_gcs_client():
+    """Build the GCS client from GCP_SA_CREDENTIALS on first use (None without credentials)."""
     GCP_SA_CREDENTIALS = os.getenv('GCP_SA_CREDENTIALS')
 
     if not GCP_SA_CREDENTIALS:
@@ -24,6 +24,8 @@ def initialize_gcp_client():
     GCS_SCOPES = ['https://www.googleapis.com/auth/devstorage.full_control']
 
     try:
+        from google.oauth2 import service_account
+        from google.cloud import storage
         credentials_info = json.loads(GCP_SA_CREDENTIALS)
         gcs_credentials = service_account.Credentials.from_service_account_info(
             credentials_info,
@@ -34,10 +36,8 @@ def initialize_gcp_client():
         logger.error(f"Failed to initialize GCS client: {e}")
         return None
 
-# Initialize the GCS client
-gcs_client = initialize_gcp_client()
-
 def upload_to_gcs(file_path, bucket_name=GCP_BUCKET_NAME):
+    gcs_client = get_gcs_client()
     if not gcs_client:
         raise ValueError("GCS client is not initialized. Skipping file upload.")
 
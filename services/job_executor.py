@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+import logging
+from services.queue_backend import get_queue_backend
+from services.scheduler import estimate_job_cost_later
+
+logger = logging.getLogger(__name__)
+
+# Number of worker threads per pool. Keep the CPU pool close to the number of
+# cores available to this worker; the IO pool can be much larger since its
+# jobs spend most of their time waiting on the network.
+POOL_SIZES = {
+    'cpu': int(os.environ.get('CPU_POOL_WORKERS', 1)),
+    'io': int(os.environ.get('IO_POOL_WORKERS', 4))
+}
+
+# Endpoints whose work is dominated by network transfer rather than encoding.
+# Additional endpoints can be moved to the IO pool with a comma separated
+# IO_POOL_ENDPOINTS environment variable.
+IO_POOL_ENDPOINTS = {
+    '/gdrive-upload',
+    '/v1/toolkit/test'
+}
+IO_POOL_ENDPOINTS.update(e.strip() for e in os.environ.get('IO_POOL_ENDPOINTS', '').split(',') if e.strip())
+
+def get_pool_name(endpoint):
+    """Return the name of the pool that should run jobs for the given endpoint."""
+    return 'io' if endpoint in IO_POOL_ENDPOINTS else 'cpu'
+
+class WorkerPool:
+    """A fixed number of worker threads draining one pool of the queue backend."""
+
+    def __init__(self, name, size, handler, backend):
+        self.name = name
+        self.size = max(1, size)
+        self.handler = handler
+        self.backend = backend
+        self.active = 0
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        for i in range(self.size):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"Started {self.size} worker(s) for the '{self.name}' pool")
+
+    def submit(self, job):
+        job['pool'] = self.name
+        self.backend.put(job)
+        # Probing the input media can take seconds; the job waits at its default cost until it is known
+        estimate_job_cost_later(job['path'], job['data'], lambda cost: self.backend.set_expected_cost(job['job_id'], cost))
+
+    def queue_length(self):
+        return self.backend.qsize(self.name)
+
+    def active_count(self):
+        with self.lock:
+            return self.active
+
+    def _work(self):
+        while True:
+            try:
+                job = self.backend.get(self.name)
+            except Exception as e:
+                logger.error(f"Error pulling a job for the '{self.name}' pool - {str(e)}")
+                time.sleep(1)
+                continue
+            with self.lock:
+                self.active += 1
+            try:
+                self.handler(job, self)
+            except Exception as e:
+                logger.error(f"Job {job.get('job_id')}: Unhandled error in '{self.name}' pool - {str(e)}", exc_info=True)
+            finally:
+                with self.lock:
+                    self.active -= 1
+                self.backend.complete(job)
+
+class JobExecutor:
+    """Routes queued jobs to per-endpoint-class worker pools."""
+
+    def __init__(self, handler, backend=None):
+        self.backend = backend or get_queue_backend()
+        self.pools = {name: WorkerPool(name, size, handler, self.backend) for name, size in POOL_SIZES.items()}
+
+    def start(self):
+        for pool in self.pools.values():
+            pool.start()
+
+    def get_pool(self, endpoint):
+        return self.pools[get_pool_name(endpoint)]
+
+    def submit(self, endpoint, job):
+        pool = self.get_pool(endpoint)
+        pool.submit(job)
+        return pool
+
+    def stats(self):
+        return {
+            name: {
+                "workers": pool.size,
+                "active": pool.active_count(),
+                "queue_length": pool.queue_length()
+            }
+            for name, pool in self.pools.items()
+        }
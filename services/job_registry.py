@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import logging
+from services.sqlite_store import get_connection
+from services.language_detection import purge_detected_languages
+
+logger = logging.getLogger(__name__)
+
+# How long finished jobs stay available to the status endpoints
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', 86400))
+PURGE_INTERVAL = 300
+
+_last_purge = 0
+_initialized_pid = None
+
+def _connection():
+    global _initialized_pid
+    conn = get_connection()
+    if _initialized_pid != os.getpid():
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_status (
+                job_id TEXT PRIMARY KEY,
+                id TEXT,
+                endpoint TEXT,
+                pool TEXT,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                queued_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                pid INTEGER,
+                code INTEGER,
+                message TEXT,
+                response TEXT,
+                details TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS job_status_finished_at ON job_status (finished_at)")
+        _initialized_pid = os.getpid()
+    return conn
+
+def register_job(job_id, endpoint, pool, request_id=None, queued_at=None):
+    """Record a newly accepted job in the 'queued' state."""
+    conn = _connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO job_status (job_id, id, endpoint, pool, status, queued_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+        (job_id, request_id, endpoint, pool, queued_at or time.time())
+    )
+    purge_expired_jobs()
+
+def mark_job_running(job_id):
+    _connection().execute(
+        "UPDATE job_status SET status = 'running', started_at = ?, pid = ? WHERE job_id = ?",
+        (time.time(), os.getpid(), job_id)
+    )
+
+def update_job_progress(job_id, progress, details=None):
+    """Record progress (0-100) for a running job, with optional endpoint-specific details."""
+    try:
+        progress = max(0, min(100, int(progress)))
+        if details is None:
+            _connection().execute("UPDATE job_status SET progress = ? WHERE job_id = ?", (progress, job_id))
+        else:
+            _connection().execute(
+                "UPDATE job_status SET progress = ?, details = ? WHERE job_id = ?",
+                (progress, json.dumps(details), job_id)
+            )
+    except Exception as e:
+        # Progress reporting must never fail the job itself
+        logger.warning(f"Job {job_id}: Failed to record progress - {str(e)}")
+
+def complete_job(job_id, response_data):
+    """Store the final result of a job, as sent to its webhook."""
+    status = 'done' if response_data.get('code') == 200 else 'failed'
+    _connection().execute(
+        "UPDATE job_status SET status = ?, progress = 100, finished_at = ?, code = ?, message = ?, response = ? WHERE job_id = ?",
+        (
+            status,
+            time.time(),
+            response_data.get('code'),
+            json.dumps(response_data.get('message')),
+            json.dumps(response_data.get('response')),
+            job_id
+        )
+    )
+
+def _row_to_job(row):
+    now = time.time()
+    started_at = row['started_at']
+    finished_at = row['finished_at']
+    queue_end = started_at or finished_at or now
+    job = {
+        "job_id": row['job_id'],
+        "id": row['id'],
+        "endpoint": row['endpoint'],
+        "pool": row['pool'],
+        "status": row['status'],
+        "progress": row['progress'],
+        "queue_time": round(queue_end - row['queued_at'], 3),
+        "run_time": round((finished_at or now) - started_at, 3) if started_at else 0,
+        "total_time": round((finished_at or now) - row['queued_at'], 3),
+        "pid": row['pid'],
+        "code": row['code'],
+        "message": json.loads(row['message']) if row['message'] is not None else None,
+        "response": json.loads(row['response']) if row['response'] is not None else None
+    }
+    if row['details'] is not None:
+        job['details'] = json.loads(row['details'])
+    return job
+
+def get_job(job_id):
+    """Return the current state of a job, or None if it is unknown or expired."""
+    row = _connection().execute("SELECT * FROM job_status WHERE job_id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+def get_jobs(job_ids):
+    """Return a mapping of job_id to job state (None for unknown jobs)."""
+    jobs = {job_id: None for job_id in job_ids}
+    if not job_ids:
+        return jobs
+    placeholders = ','.join('?' for _ in job_ids)
+    rows = _connection().execute(f"SELECT * FROM job_status WHERE job_id IN ({placeholders})", list(job_ids)).fetchall()
+    for row in rows:
+        jobs[row['job_id']] = _row_to_job(row)
+    return jobs
+
+def purge_expired_jobs():
+    global _last_purge
+    if time.time() - _last_purge < PURGE_INTERVAL:
+        return
+    _last_purge = time.time()
+    _connection().execute(
+        "DELETE FROM job_status WHERE finished_at IS NOT NULL AND finished_at < ?",
+        (time.time() - JOB_RETENTION_SECONDS,)
+    )
+    purge_detected_languages()
@@ -0,0 +1,101 @@
+import os
+import time
+import logging
+from services.startup import lazy_import
+from services.sqlite_store import get_connection
+from services.whisper_models import acquire_model, resolve_model_size
+from services.thread_budget import lease_threads
+from services.voice_activity import detect_speech
+
+whisper = lazy_import('whisper')
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Seconds of audio, from the first detected speech, the language is identified on
+LANGUAGE_DETECTION_SECONDS = 30
+# How long a detected language is remembered for its audio
+LANGUAGE_CACHE_RETENTION_SECONDS = int(os.environ.get('LANGUAGE_CACHE_RETENTION_SECONDS', 30 * 86400))
+# Most detected languages remembered; the oldest are forgotten beyond this
+LANGUAGE_CACHE_MAX_ENTRIES = int(os.environ.get('LANGUAGE_CACHE_MAX_ENTRIES', 100000))
+
+_initialized_pid = None
+
+def _connection():
+    global _initialized_pid
+    conn = get_connection()
+    if _initialized_pid != os.getpid():
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS detected_languages (
+                audio_hash TEXT PRIMARY KEY,
+                language TEXT NOT NULL,
+                probability REAL NOT NULL,
+                detected_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS detected_languages_detected_at ON detected_languages (detected_at)")
+        _initialized_pid = os.getpid()
+    return conn
+
+def first_speech_window(audio):
+    """Return the LANGUAGE_DETECTION_SECONDS of audio starting at the first detected speech."""
+    regions = detect_speech(audio)
+    start = int(regions[0][0] * SAMPLE_RATE) if regions else 0
+    return audio[start:start + LANGUAGE_DETECTION_SECONDS * SAMPLE_RATE]
+
+def _detect(model, window):
+    with lease_threads():
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(window), model.dims.n_mels).to(model.device)
+        _, probs = model.detect_language(mel)
+    return probs
+
+def detect_language(audio, model_size=None, backend=None, audio_hash=None, model=None):
+    """Identify the spoken language of decoded 16 kHz audio from its first speech window.
+
+    When audio_hash is given the result is remembered for that audio, so
+    later requests for the same media skip detection. model, if given, is
+    an already borrowed model to detect with. English-only (.en) models
+    have no language tokens, so 'en' is returned for them without
+    detecting, as whisper.transcribe does.
+    """
+    english_only = not model.is_multilingual if model is not None else resolve_model_size(model_size).endswith('.en')
+    if english_only:
+        return 'en'
+
+    if audio_hash is not None:
+        row = _connection().execute("SELECT language FROM detected_languages WHERE audio_hash = ?", (audio_hash,)).fetchone()
+        if row is not None:
+            return row['language']
+
+    start_time = time.time()
+    window = first_speech_window(audio)
+    if model is not None:
+        probs = _detect(model, window)
+    else:
+        with acquire_model(model_size, backend) as model:
+            probs = _detect(model, window)
+    language = max(probs, key=probs.get)
+    logger.info(f"Detected language '{language}' ({probs[language]:.2f}) in {time.time() - start_time:.2f}s")
+
+    if audio_hash is not None:
+        _connection().execute(
+            "INSERT OR REPLACE INTO detected_languages (audio_hash, language, probability, detected_at) VALUES (?, ?, ?, ?)",
+            (audio_hash, language, float(probs[language]), time.time())
+        )
+    return language
+
+def purge_detected_languages():
+    """Forget languages detected longer than LANGUAGE_CACHE_RETENTION_SECONDS ago and any beyond LANGUAGE_CACHE_MAX_ENTRIES."""
+    conn = _connection()
+    purged = conn.execute(
+        "DELETE FROM detected_languages WHERE detected_at < ?",
+        (time.time() - LANGUAGE_CACHE_RETENTION_SECONDS,)
+    ).rowcount
+    purged += conn.execute(
+        "DELETE FROM detected_languages WHERE audio_hash IN "
+        "(SELECT audio_hash FROM detected_languages ORDER BY detected_at DESC LIMIT -1 OFFSET ?)",
+        (LANGUAGE_CACHE_MAX_ENTRIES,)
+    ).rowcount
+    if purged:
+        logger.info(f"Purged {purged} remembered language detection(s)")
+    return purged
@@ -0,0 +1,161 @@
+import os
+import time
+import logging
+import threading
+import subprocess
+import ffmpeg
+import requests
+from services.downloader import open_url, DOWNLOAD_BUFFER_BYTES
+from services.file_management import download_file
+
+logger = logging.getLogger(__name__)
+
+# Pipe remote media straight into ffmpeg instead of downloading it to disk first
+STREAM_INPUTS = os.environ.get('STREAM_INPUTS', 'true').lower() == 'true'
+# Bytes fetched to inspect the container before deciding whether it can be streamed
+PROBE_BYTES = 64 * 1024
+# Top-level MP4 boxes inspected while looking for the moov atom
+MAX_MP4_BOXES = 32
+
+class StreamingError(Exception):
+    pass
+
+def _read_head(url):
+    """Return (first bytes of url, whether the server honours Range requests)."""
+    response = open_url(url, {'Range': f"bytes=0-{PROBE_BYTES - 1}"})
+    with response:
+        response.raise_for_status()
+        ranged = response.status_code == 206
+        head = b''
+        for chunk in response.iter_content(chunk_size=PROBE_BYTES):
+            head += chunk
+            if len(head) >= PROBE_BYTES:
+                break
+    return head[:PROBE_BYTES], ranged
+
+def _read_range(url, offset, length):
+    response = open_url(url, {'Range': f"bytes={offset}-{offset + length - 1}"})
+    with response:
+        if response.status_code != 206:
+            return None
+        return response.raw.read(length)
+
+def _mp4_moov_first(url, head, ranged):
+    """Walk the top-level boxes of an MP4/MOV file and report whether moov precedes mdat."""
+    offset = 0
+    for _ in range(MAX_MP4_BOXES):
+        if offset + 16 <= len(head):
+            header = head[offset:offset + 16]
+        elif ranged:
+            header = _read_range(url, offset, 16)
+        else:
+            return False
+        if not header or len(header) < 8:
+            return False
+
+        size = int.from_bytes(header[0:4], 'big')
+        box_type = header[4:8]
+        if box_type == b'moov':
+            return True
+        if box_type == b'mdat':
+            return False
+        if size == 1:
+            if len(header) < 16:
+                return False
+            size = int.from_bytes(header[8:16], 'big')
+        if size < 8:
+            # size 0 means the box runs to the end of the file
+            return False
+        offset += size
+    return False
+
+def is_streamable(url):
+    """Decide whether url can be decoded by ffmpeg from a non-seekable pipe.
+
+    Fragmented or 'faststart' MP4/MOV files are streamable; files whose moov
+    atom follows the media data need random access and are not. Other
+    containers are assumed streamable and fall back to a staged download if
+    ffmpeg fails on them.
+    """
+    try:
+        head, ranged = _read_head(url)
+    except Exception as e:
+        logger.info(f"Could not inspect {url} for streaming: {str(e)}")
+        return False
+    if len(head) >= 8 and head[4:8] == b'ftyp':
+        return _mp4_moov_first(url, head, ranged)
+    return bool(head)
+
+def _stream_to_ffmpeg(url, output_path, output_kwargs):
+    args = ffmpeg.input('pipe:0').output(output_path, **output_kwargs).overwrite_output().compile()
+    process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    # Drain stderr concurrently so ffmpeg never blocks on a full pipe while we feed stdin
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+
+    streamed_bytes = 0
+    try:
+        with open_url(url) as response:
+            response.raise_for_status()
+            expected_bytes = int(response.headers['Content-Length']) if 'Content-Length' in response.headers else None
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_BUFFER_BYTES):
+                process.stdin.write(chunk)
+                streamed_bytes += len(chunk)
+        if expected_bytes is not None and streamed_bytes != expected_bytes:
+            # The server closed the connection early; ffmpeg would happily encode the truncated input
+            process.kill()
+            raise StreamingError(f"Stream of {url} ended after {streamed_bytes} of {expected_bytes} bytes")
+    except BrokenPipeError:
+        # ffmpeg stopped reading; its exit code tells whether that was an error
+        pass
+    except requests.RequestException as e:
+        process.kill()
+        raise StreamingError(f"Streaming {url} failed: {str(e)}")
+    except Exception:
+        process.kill()
+        raise
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+        stderr_reader.join()
+
+    if process.returncode != 0:
+        stderr = b''.join(stderr_chunks).decode('utf-8', errors='replace')
+        raise StreamingError(f"ffmpeg failed on streamed input: {stderr[-2000:]}")
+    return streamed_bytes
+
+def transcode_url(url, output_path, staging_path, **output_kwargs):
+    """Run ffmpeg on the media at url, writing output_path with the given output options.
+
+    The remote bytes are piped into ffmpeg while they download when the
+    container allows it, overlapping network transfer with decoding;
+    otherwise (or if ffmpeg fails on the stream) the input is downloaded to
+    staging_path first. Returns 'stream' or 'staged'.
+    """
+    start_time = time.time()
+    if STREAM_INPUTS and is_streamable(url):
+        try:
+            streamed_bytes = _stream_to_ffmpeg(url, output_path, output_kwargs)
+            logger.info(f"Streamed {streamed_bytes} bytes from {url} into ffmpeg in {time.time() - start_time:.2f}s")
+            return 'stream'
+        except StreamingError as e:
+            logger.warning(f"Streaming {url} failed, falling back to a staged download: {str(e)}")
+
+    input_filename = download_file(url, staging_path)
+    try:
+        (
+            ffmpeg
+            .input(input_filename)
+            .output(output_path, **output_kwargs)
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    finally:
+        os.remove(input_filename)
+    logger.info(f"Transcoded staged download of {url} in {time.time() - start_time:.2f}s")
+    return 'staged'
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from services.sqlite_store import get_connection, owner_is_alive
+from services.job_registry import complete_job
+from services.scheduler import select_next_job, charge_flow
+
+logger = logging.getLogger(__name__)
+
+# Which backend holds queued jobs: 'sqlite' (durable, shared by all workers on the host) or 'memory'
+QUEUE_BACKEND = os.environ.get('QUEUE_BACKEND', 'sqlite')
+# How often idle workers poll the SQLite queue for jobs accepted by other processes
+QUEUE_POLL_INTERVAL = float(os.environ.get('QUEUE_POLL_INTERVAL', 0.5))
+# How many times a job is re-queued after the worker running it died before it is dropped
+QUEUE_MAX_ATTEMPTS = int(os.environ.get('QUEUE_MAX_ATTEMPTS', 3))
+
+class QueueBackend(ABC):
+    """Stores queued jobs for the executor pools.
+
+    Jobs are plain JSON-serializable dictionaries; the executor resolves the
+    view function to run from the job's 'endpoint' when it is pulled. Jobs
+    are handed out in the order chosen by services.scheduler rather than
+    strictly first-in first-out.
+    """
+
+    @abstractmethod
+    def put(self, job):
+        pass
+
+    @abstractmethod
+    def get(self, pool, timeout=None):
+        """Claim the next job for a pool, or return None if none arrives before the timeout."""
+        pass
+
+    @abstractmethod
+    def complete(self, job):
+        pass
+
+    @abstractmethod
+    def set_expected_cost(self, job_id, expected_cost):
+        """Update the expected cost of a job that is still waiting; jobs already claimed are unaffected."""
+        pass
+
+    @abstractmethod
+    def qsize(self, pool):
+        pass
+
+class MemoryQueueBackend(QueueBackend):
+    """Per-process in-memory queues. Jobs are lost if the worker restarts."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.finish_tags = {}
+        self.virtual_time = {}
+        self.condition = threading.Condition()
+
+    def put(self, job):
+        with self.condition:
+            self.jobs.setdefault(job['pool'], []).append(job)
+            self.condition.notify_all()
+
+    def get(self, pool, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.jobs.get(pool), timeout):
+                return None
+            finish_tags = self.finish_tags.setdefault(pool, {})
+            job, start_tag = select_next_job(self.jobs[pool], finish_tags, self.virtual_time.get(pool, 0.0))
+            self.jobs[pool].remove(job)
+            finish_tags[job['flow']] = charge_flow(job, start_tag)
+            self.virtual_time[pool] = start_tag
+            return job
+
+    def complete(self, job):
+        pass
+
+    def set_expected_cost(self, job_id, expected_cost):
+        with self.condition:
+            for jobs in self.jobs.values():
+                for job in jobs:
+                    if job['job_id'] == job_id:
+                        job['expected_cost'] = expected_cost
+                        return
+
+    def qsize(self, pool):
+        with self.condition:
+            return len(self.jobs.get(pool, []))
+
+class SQLiteQueueBackend(QueueBackend):
+    """Durable queue stored in a local SQLite database in WAL mode.
+
+    Every gunicorn worker on the host polls the same table, so any idle
+    worker picks up the next job, and jobs accepted with a 202 survive a
+    worker restart: jobs claimed by a process that is no longer alive are
+    put back in the queue.
+    """
+
+    RECOVERY_INTERVAL = 30
+
+    def __init__(self):
+        self.new_job = threading.Condition()
+        self.last_recovery = 0
+        conn = get_connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_queue (
+                job_id TEXT PRIMARY KEY,
+                pool TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                enqueued_at REAL NOT NULL,
+                claimed_at REAL,
+                owner_pid INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                priority INTEGER NOT NULL DEFAULT 0,
+                flow TEXT NOT NULL DEFAULT '',
+                weight REAL NOT NULL DEFAULT 1,
+                expected_cost REAL NOT NULL DEFAULT 0
+            )
+        """)
+        # Databases created before scheduling support lack the scheduling columns
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(job_queue)")}
+        for column, definition in (
+            ('priority', "INTEGER NOT NULL DEFAULT 0"),
+            ('flow', "TEXT NOT NULL DEFAULT ''"),
+            ('weight', "REAL NOT NULL DEFAULT 1"),
+            ('expected_cost', "REAL NOT NULL DEFAULT 0")
+        ):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE job_queue ADD COLUMN {column} {definition}")
+        conn.execute("CREATE INDEX IF NOT EXISTS job_queue_pool_status ON job_queue (pool, status, enqueued_at)")
+        # Start-time fair queuing state: each flow's finish tag and each pool's virtual time
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS scheduler_flows (
+                pool TEXT NOT NULL,
+                flow TEXT NOT NULL,
+                finish_tag REAL NOT NULL,
+                PRIMARY KEY (pool, flow)
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS scheduler_pools (pool TEXT PRIMARY KEY, virtual_time REAL NOT NULL)")
+        self.recover_orphaned_jobs()
+
+    def put(self, job):
+        get_connection().execute(
+            "INSERT INTO job_queue (job_id, pool, payload, enqueued_at, priority, flow, weight, expected_cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job['job_id'], job['pool'], json.dumps(job), job['queue_start_time'], job['priority'], job['flow'], job['weight'], job['expected_cost'])
+        )
+        with self.new_job:
+            self.new_job.notify()
+
+    def get(self, pool, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            if time.time() - self.last_recovery > self.RECOVERY_INTERVAL:
+                self.recover_orphaned_jobs()
+
+            job = self._claim(pool)
+            if job is not None:
+                return job
+
+            wait = QUEUE_POLL_INTERVAL
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                wait = min(wait, remaining)
+            with self.new_job:
+                self.new_job.wait(wait)
+
+    def _claim(self, pool):
+        conn = get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            candidates = [
+                {
+                    "job_id": row['job_id'],
+                    "priority": row['priority'],
+                    "flow": row['flow'],
+                    "weight": row['weight'],
+                    "expected_cost": row['expected_cost'],
+                    "queue_start_time": row['enqueued_at']
+                }
+                for row in conn.execute(
+                    "SELECT job_id, priority, flow, weight, expected_cost, enqueued_at FROM job_queue WHERE pool = ? AND status = 'queued'",
+                    (pool,)
+                )
+            ]
+            if not candidates:
+                conn.execute("COMMIT")
+                return None
+
+            state = conn.execute("SELECT virtual_time FROM scheduler_pools WHERE pool = ?", (pool,)).fetchone()
+            virtual_time = state['virtual_time'] if state else 0.0
+            finish_tags = {
+                row['flow']: row['finish_tag']
+                for row in conn.execute("SELECT flow, finish_tag FROM scheduler_flows WHERE pool = ?", (pool,))
+            }
+            job, start_tag = select_next_job(candidates, finish_tags, virtual_time)
+
+            conn.execute(
+                "UPDATE job_queue SET status = 'running', claimed_at = ?, owner_pid = ?, attempts = attempts + 1 WHERE job_id = ?",
+                (time.time(), os.getpid(), job['job_id'])
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO scheduler_flows (pool, flow, finish_tag) VALUES (?, ?, ?)",
+                (pool, job['flow'], charge_flow(job, start_tag))
+            )
+            conn.execute("INSERT OR REPLACE INTO scheduler_pools (pool, virtual_time) VALUES (?, ?)", (pool, start_tag))
+            # Flows whose finish tag fell behind the virtual time carry no state any more
+            conn.execute("DELETE FROM scheduler_flows WHERE pool = ? AND finish_tag < ?", (pool, start_tag))
+            row = conn.execute("SELECT payload FROM job_queue WHERE job_id = ?", (job['job_id'],)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return json.loads(row['payload'])
+
+    def complete(self, job):
+        get_connection().execute("DELETE FROM job_queue WHERE job_id = ?", (job['job_id'],))
+
+    def set_expected_cost(self, job_id, expected_cost):
+        get_connection().execute(
+            "UPDATE job_queue SET expected_cost = ? WHERE job_id = ? AND status = 'queued'", (expected_cost, job_id)
+        )
+
+    def qsize(self, pool):
+        row = get_connection().execute(
+            "SELECT COUNT(*) FROM job_queue WHERE pool = ? AND status = 'queued'", (pool,)
+        ).fetchone()
+        return row[0]
+
+    def recover_orphaned_jobs(self):
+        """Re-queue jobs claimed by processes that have since died (e.g. a gunicorn worker timeout)."""
+        self.last_recovery = time.time()
+        conn = get_connection()
+        rows = conn.execute(
+            "SELECT job_id, claimed_at, owner_pid, attempts FROM job_queue WHERE status = 'running'"
+        ).fetchall()
+        for row in rows:
+            if owner_is_alive(row['owner_pid'], row['claimed_at']):
+                continue
+            if row['attempts'] >= QUEUE_MAX_ATTEMPTS:
+                logger.error(f"Job {row['job_id']}: Dropping job after {row['attempts']} interrupted attempts")
+                conn.execute("DELETE FROM job_queue WHERE job_id = ? AND status = 'running'", (row['job_id'],))
+                complete_job(row['job_id'], {"code": 500, "message": f"Job interrupted {row['attempts']} times by worker restarts"})
+            else:
+                logger.warning(f"Job {row['job_id']}: Worker {row['owner_pid']} died while running the job, re-queueing")
+                conn.execute(
+                    "UPDATE job_queue SET status = 'queued', claimed_at = NULL, owner_pid = NULL WHERE job_id = ? AND status = 'running'",
+                    (row['job_id'],)
+                )
+
+def get_queue_backend() -> QueueBackend:
+    """Get the queue backend selected by the QUEUE_BACKEND environment variable."""
+    if QUEUE_BACKEND == 'memory':
+        return MemoryQueueBackend()
+    elif QUEUE_BACKEND == 'sqlite':
+        return SQLiteQueueBackend()
+    raise ValueError(f"Unknown QUEUE_BACKEND: {QUEUE_BACKEND}")
@@ -1,7 +1,9 @@
 import os
-import boto3
 import logging
 from urllib.parse import urlparse
+from services.startup import lazy_import
+
+boto3 = lazy_import('boto3')
 
 logger = logging.getLogger(__name__)
 
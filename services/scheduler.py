@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import logging
+import threading
+import subprocess
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Priority assigned to jobs that do not specify one. Higher priorities always run first.
+DEFAULT_PRIORITY = int(os.environ.get('DEFAULT_JOB_PRIORITY', 5))
+
+# Relative share of worker time per endpoint (or per API client via the
+# X-Client-Id header), e.g. {"/v1/media/transform/mp3": 4}. Flows that are
+# not listed get a weight of 1.
+SCHEDULER_WEIGHTS = json.loads(os.environ.get('SCHEDULER_WEIGHTS', '{}'))
+
+# Probe the duration of the input media of queued jobs so short jobs can be run first
+SCHEDULER_PROBE_DURATION = os.environ.get('SCHEDULER_PROBE_DURATION', 'true').lower() == 'true'
+PROBE_TIMEOUT = int(os.environ.get('SCHEDULER_PROBE_TIMEOUT', 5))
+# Background threads per worker probing the input media of newly queued jobs
+SCHEDULER_PROBE_WORKERS = int(os.environ.get('SCHEDULER_PROBE_WORKERS', 2))
+
+# A waiting job's expected cost is divided by (1 + wait / SCHEDULER_AGING_SECONDS),
+# so long jobs are not starved by a steady stream of short ones.
+SCHEDULER_AGING_SECONDS = float(os.environ.get('SCHEDULER_AGING_SECONDS', 300))
+
+# Expected cost of a job whose media duration is unknown, in seconds
+DEFAULT_JOB_COST = 60.0
+
+# Rough processing seconds per second of input media for each endpoint
+ENDPOINT_COST_FACTORS = {
+    '/v1/media/transform/mp3': 0.05,
+    '/media-to-mp3': 0.05,
+    '/v1/video/concatenate': 0.05,
+    '/combine-videos': 0.05,
+    '/extract-keyframes': 0.1,
+    '/audio-mixing': 0.2,
+    '/v1/media/transcribe': 0.5,
+    '/transcribe-media': 0.5,
+    '/v1/video/caption': 1.0,
+    '/caption-video': 1.0
+}
+ENDPOINT_COST_FACTORS.update(json.loads(os.environ.get('SCHEDULER_COST_FACTORS', '{}')))
+
+# Payload fields that hold the main input media of a request
+MEDIA_URL_FIELDS = ('media_url', 'video_url', 'audio_url', 'file_url')
+# Only remote media is probed; ffprobe would otherwise also open local files and its other protocols
+PROBE_SCHEMES = ('http', 'https')
+
+_probe_executor = None
+_probe_executor_lock = threading.Lock()
+
+def probe_media_duration(url):
+    """Return the duration of a remote http(s) media file in seconds, or None if it cannot be probed quickly."""
+    if urlparse(url).scheme.lower() not in PROBE_SCHEMES:
+        return None
+    cmd = [
+        'ffprobe', '-v', 'error', '-protocol_whitelist', 'http,https,tcp,tls',
+        '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', url
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=PROBE_TIMEOUT)
+        return float(result.stdout.strip())
+    except (subprocess.TimeoutExpired, ValueError, OSError) as e:
+        logger.info(f"Could not probe duration of {url}: {str(e)}")
+        return None
+
+def job_media_urls(data):
+    """Return the input media URLs of a request payload."""
+    urls = [data[field] for field in MEDIA_URL_FIELDS if isinstance(data.get(field), str)]
+    if not urls:
+        # Multi-input endpoints list their media under video_urls / inputs
+        urls = [item.get('video_url') or item.get('file_url') for item in data.get('video_urls', data.get('inputs', [])) if isinstance(item, dict)]
+    return [url for url in urls if isinstance(url, str) and url]
+
+def estimate_job_cost(endpoint, data):
+    """Estimate how many seconds of worker time a job will need. Probes the input media, so it can take up to PROBE_TIMEOUT."""
+    if not SCHEDULER_PROBE_DURATION:
+        return DEFAULT_JOB_COST
+
+    urls = job_media_urls(data)
+    if not urls:
+        return DEFAULT_JOB_COST
+
+    duration = probe_media_duration(urls[0])
+    if duration is None:
+        return DEFAULT_JOB_COST
+    # Assume the remaining inputs of multi-input jobs are of similar length
+    return duration * len(urls) * ENDPOINT_COST_FACTORS.get(endpoint, 1.0)
+
+def estimate_job_cost_later(endpoint, data, on_estimate):
+    """Estimate a job's cost in a background thread and pass it to on_estimate.
+
+    Jobs are queued at DEFAULT_JOB_COST so submitting never waits on a
+    probe; on_estimate is only called when probing is enabled and the job
+    has input media.
+    """
+    global _probe_executor
+    if not SCHEDULER_PROBE_DURATION or not job_media_urls(data):
+        return
+    with _probe_executor_lock:
+        if _probe_executor is None:
+            _probe_executor = ThreadPoolExecutor(max_workers=max(1, SCHEDULER_PROBE_WORKERS), thread_name_prefix='job-cost')
+
+    def estimate():
+        try:
+            on_estimate(estimate_job_cost(endpoint, data))
+        except Exception as e:
+            logger.warning(f"Could not update the expected cost of a {endpoint} job: {str(e)}")
+
+    _probe_executor.submit(estimate)
+
+def get_flow(client, endpoint):
+    return f"{client}:{endpoint}"
+
+def get_flow_weight(client, endpoint):
+    flow = get_flow(client, endpoint)
+    return float(SCHEDULER_WEIGHTS.get(flow, SCHEDULER_WEIGHTS.get(endpoint, SCHEDULER_WEIGHTS.get(client, 1))))
+
+def select_next_job(candidates, finish_tags, virtual_time, now=None):
+    """Pick the next job to run using priority lanes and start-time fair queuing.
+
+    candidates is a list of dicts with job_id, priority, flow, weight,
+    expected_cost and queue_start_time. Only the highest non-empty
+    priority lane is considered. Within it, every flow (API client +
+    endpoint) is tagged with the virtual time at which its next job would
+    start; the flow with the smallest tag goes next, and within a flow the
+    job with the lowest aged expected cost (shortest job first) is chosen.
+
+    Returns (job, flow_start_tag) or (None, None).
+    """
+    if not candidates:
+        return None, None
+    now = now or time.time()
+
+    top_priority = max(job['priority'] for job in candidates)
+    lane = [job for job in candidates if job['priority'] == top_priority]
+
+    def aged_cost(job):
+        return job['expected_cost'] / (1 + (now - job['queue_start_time']) / SCHEDULER_AGING_SECONDS)
+
+    best = None
+    best_key = None
+    for job in lane:
+        start_tag = max(finish_tags.get(job['flow'], 0.0), virtual_time)
+        key = (start_tag, aged_cost(job), job['queue_start_time'])
+        if best_key is None or key < best_key:
+            best, best_key = job, key
+    return best, best_key[0]
+
+def charge_flow(job, start_tag):
+    """Return the flow's new finish tag after dispatching the job."""
+    return start_tag + job['expected_cost'] / job['weight']
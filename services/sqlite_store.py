@@ -0,0 +1,38 @@
+import os
+import sqlite3
+import threading
+import psutil
+
+# Local SQLite database shared by every gunicorn worker on the host
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH', '/tmp/nca_toolkit.db')
+
+_local = threading.local()
+
+def get_connection(db_path=JOB_DB_PATH):
+    """Return this thread's connection to the local SQLite store, opening it in WAL mode if needed."""
+    if getattr(_local, 'pid', None) != os.getpid():
+        # Never reuse connections inherited across a fork
+        _local.pid = os.getpid()
+        _local.connections = {}
+
+    conn = _local.connections.get(db_path)
+    if conn is None:
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.connections[db_path] = conn
+    return conn
+
+def owner_is_alive(pid, claimed_at):
+    """Check that the process which claimed a row (a job, lease or delivery) is still the one running under that PID."""
+    try:
+        # A process started after the claim merely reused the PID
+        return psutil.Process(pid).create_time() <= claimed_at
+    except psutil.AccessDenied:
+        return True
+    except (psutil.NoSuchProcess, TypeError, ValueError):
+        return False
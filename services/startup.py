@@ -0,0 +1,128 @@
+import os
+import time
+import logging
+import importlib
+import threading
+import functools
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Import heavy dependencies and warm caches in a background thread when a worker starts
+STARTUP_WARMUP = os.environ.get('STARTUP_WARMUP', 'true').lower() == 'true'
+
+# component name -> {"status", "seconds", "error"}
+_components = {}
+_components_lock = threading.Lock()
+_warmup_state = {"status": "disabled" if not STARTUP_WARMUP else "pending", "seconds": None}
+_serving_after = None
+
+def _record(name, **fields):
+    with _components_lock:
+        _components.setdefault(name, {"status": None, "seconds": None, "error": None}).update(fields)
+
+def initialize(name, func):
+    """Run func as the initialization of component name, recording how long it took and whether it failed."""
+    _record(name, status="loading", error=None)
+    start_time = time.time()
+    try:
+        result = func()
+    except Exception as e:
+        elapsed = time.time() - start_time
+        _record(name, status="failed", seconds=round(elapsed, 3), error=str(e))
+        logger.error(f"Failed to initialize {name} after {elapsed:.2f}s: {str(e)}")
+        raise
+    elapsed = time.time() - start_time
+    _record(name, status="ready", seconds=round(elapsed, 3))
+    logger.info(f"Initialized {name} in {elapsed:.2f}s")
+    return result
+
+def once(name):
+    """Decorator for a no-argument initializer that runs on first call, as component name.
+
+    Later calls return the first result. Concurrent first calls wait for
+    the one doing the work; if it raises, the next call tries again.
+    """
+    def decorator(func):
+        lock = threading.Lock()
+        result = []
+
+        @functools.wraps(func)
+        def wrapper():
+            if not result:
+                with lock:
+                    if not result:
+                        result.append(initialize(name, func))
+            return result[0]
+        wrapper.component = name
+        return wrapper
+    return decorator
+
+_module_importers = {}
+_module_importers_lock = threading.Lock()
+
+def import_module(name):
+    """Import a module once, timed as the component "import <name>"."""
+    with _module_importers_lock:
+        importer = _module_importers.get(name)
+        if importer is None:
+            importer = _module_importers[name] = once(f"import {name}")(functools.partial(importlib.import_module, name))
+    return importer()
+
+class LazyModule:
+    """Stand-in for a module that is only imported when one of its attributes is first used."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return getattr(import_module(self._name), attribute)
+
+def lazy_import(name):
+    """Return a LazyModule for name, to bind at module level instead of importing it."""
+    return LazyModule(name)
+
+def start_warmup(steps):
+    """Run the initialization steps one after another in a background thread.
+
+    A step is a module name to import or a no-argument callable; callables
+    made with once() are recorded under their own component name. Failures
+    are logged and recorded, and the step is retried on first use.
+    """
+    if not STARTUP_WARMUP:
+        return
+
+    def warm_up():
+        _warmup_state["status"] = "running"
+        start_time = time.time()
+        for step in steps:
+            try:
+                if isinstance(step, str):
+                    import_module(step)
+                elif hasattr(step, 'component'):
+                    step()
+                else:
+                    initialize(step.__name__, step)
+            except Exception:
+                # Already logged and recorded; the component loads again on first use
+                pass
+        _warmup_state.update(status="done", seconds=round(time.time() - start_time, 3))
+        logger.info(f"Startup warm-up finished in {time.time() - start_time:.2f}s")
+
+    threading.Thread(target=warm_up, name="startup-warmup", daemon=True).start()
+
+def mark_serving():
+    """Record how long after process start the app became ready to serve requests."""
+    global _serving_after
+    _serving_after = round(time.time() - psutil.Process().create_time(), 3)
+    logger.info(f"Worker ready to serve {_serving_after:.2f}s after process start")
+
+def get_startup_report():
+    """Describe worker boot and the initialization of each deferred component so far."""
+    with _components_lock:
+        components = {name: dict(state) for name, state in _components.items()}
+    return {
+        "serving_after": _serving_after,
+        "warmup": dict(_warmup_state),
+        "components": components
+    }
@@ -0,0 +1,145 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from services.sqlite_store import get_connection, owner_is_alive
+
+logger = logging.getLogger(__name__)
+
+# Cores shared by all transcription jobs on this host, across every worker process
+TORCH_THREAD_BUDGET = int(os.environ.get('TORCH_THREAD_BUDGET', os.cpu_count() or 1))
+# Fewest intra-op threads a job is given, even when the budget is fully leased
+TORCH_MIN_THREADS_PER_JOB = int(os.environ.get('TORCH_MIN_THREADS_PER_JOB', 1))
+# Most intra-op threads one job is given; defaults to an equal split between the CPU pool's job threads
+TORCH_MAX_THREADS_PER_JOB = int(os.environ.get(
+    'TORCH_MAX_THREADS_PER_JOB', max(1, TORCH_THREAD_BUDGET // int(os.environ.get('CPU_POOL_WORKERS', 1)))
+))
+# Inter-op threads per process; torch only allows setting this once, before any parallel work
+TORCH_INTEROP_THREADS = int(os.environ.get('TORCH_INTEROP_THREADS', 1))
+
+_initialized_pid = None
+_interop_pid = None
+# Leases held by this process: lease_id -> threads
+_local_leases = {}
+_local_lock = threading.Lock()
+# The allocation of the lease held by the current thread, and the allocations being tracked for its job
+_current = threading.local()
+
+def _connection():
+    global _initialized_pid
+    conn = get_connection()
+    if _initialized_pid != os.getpid():
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS thread_leases (
+                lease_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                owner_pid INTEGER NOT NULL,
+                threads INTEGER NOT NULL,
+                claimed_at REAL NOT NULL
+            )
+        """)
+        _initialized_pid = os.getpid()
+    return conn
+
+def _claim_lease():
+    """Record a lease for a new job and return (lease_id, threads, concurrent jobs)."""
+    conn = _connection()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Leases of processes that died mid-job no longer hold cores
+        leases = []
+        for row in conn.execute("SELECT lease_id, owner_pid, threads, claimed_at FROM thread_leases").fetchall():
+            if owner_is_alive(row['owner_pid'], row['claimed_at']):
+                leases.append(row['threads'])
+            else:
+                conn.execute("DELETE FROM thread_leases WHERE lease_id = ?", (row['lease_id'],))
+
+        fair_share = TORCH_THREAD_BUDGET // (len(leases) + 1)
+        available = TORCH_THREAD_BUDGET - sum(leases)
+        threads = max(TORCH_MIN_THREADS_PER_JOB, min(fair_share, available, TORCH_MAX_THREADS_PER_JOB))
+        cursor = conn.execute(
+            "INSERT INTO thread_leases (owner_pid, threads, claimed_at) VALUES (?, ?, ?)",
+            (os.getpid(), threads, now)
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return cursor.lastrowid, threads, len(leases) + 1
+
+def _apply_local_threads():
+    """Size this process's torch thread pool to the leases it holds. Caller holds _local_lock."""
+    global _interop_pid
+    import torch
+    if _interop_pid != os.getpid():
+        try:
+            torch.set_num_interop_threads(TORCH_INTEROP_THREADS)
+        except RuntimeError:
+            # Inter-op work already ran in this process; keep its setting
+            pass
+        _interop_pid = os.getpid()
+    if _local_leases:
+        # Intra-op threads are per process, so concurrent jobs in one worker share the sum of their leases
+        torch.set_num_threads(max(1, min(TORCH_THREAD_BUDGET, sum(_local_leases.values()))))
+
+def current_lease():
+    """Return the allocation of the lease held by the calling thread, or None outside lease_threads()."""
+    return getattr(_current, 'allocation', None)
+
+@contextmanager
+def track_leases():
+    """Collect the allocations of the leases taken by the calling thread inside the block.
+
+    Jobs only hold a lease while a model decodes; this yields a list that
+    each of those allocations is appended to, so the job can report the
+    threads it ran with.
+    """
+    previous = getattr(_current, 'tracked', None)
+    _current.tracked = []
+    try:
+        yield _current.tracked
+    finally:
+        _current.tracked = previous
+
+@contextmanager
+def lease_threads():
+    """Reserve a share of TORCH_THREAD_BUDGET while a model decodes.
+
+    Each lease gets an equal share of the budget given the leases already
+    held on the host, bounded by the cores not yet leased and by
+    TORCH_MAX_THREADS_PER_JOB, and never fewer than TORCH_MIN_THREADS_PER_JOB.
+    The share is fixed when the lease is taken. A thread that already holds
+    a lease keeps using it. Yields a description of the allocation.
+    """
+    allocation = current_lease()
+    if allocation is not None:
+        yield allocation
+        return
+
+    lease_id, threads, concurrent_jobs = _claim_lease()
+    with _local_lock:
+        _local_leases[lease_id] = threads
+        _apply_local_threads()
+    logger.info(f"Leased {threads} of {TORCH_THREAD_BUDGET} torch threads ({concurrent_jobs} concurrent jobs)")
+    allocation = {
+        "threads": threads,
+        "interop_threads": TORCH_INTEROP_THREADS,
+        "concurrent_jobs": concurrent_jobs,
+        "budget": TORCH_THREAD_BUDGET
+    }
+    tracked = getattr(_current, 'tracked', None)
+    if tracked is not None:
+        tracked.append(allocation)
+    _current.allocation = allocation
+    try:
+        yield allocation
+    finally:
+        _current.allocation = None
+        with _local_lock:
+            _local_leases.pop(lease_id, None)
+            _apply_local_threads()
+        try:
+            _connection().execute("DELETE FROM thread_leases WHERE lease_id = ?", (lease_id,))
+        except Exception as e:
+            logger.error(f"Failed to release thread lease {lease_id}: {str(e)}")
@@ -1,14 +1,14 @@
 import os
-import whisper
+import numpy as np
 import srt
 from datetime import timedelta
-from whisper.utils import WriteSRT, WriteVTT
 from services.file_management import download_file
 from services.gcp_toolkit import upload_to_gcs
+from services.transcription_engine import transcribe_media_file
+from services.ass_events import word_columns, segment_ranges, line_ranges, moving_highlight, dialogue_events
+from services.startup import lazy_import, once
 import logging
 import requests
-import nltk
-from nltk.tokenize import word_tokenize, sent_tokenize
 import uuid
 import tempfile
 
@@ -16,194 +16,55 @@ import tempfile
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Download necessary NLTK data
-nltk.download('punkt', quiet=True)
-nltk.download('punkt_tab', quiet=True)
+whisper = lazy_import('whisper')
+
+@once('nltk punkt')
+def sentence_tokenizer():
+    """Import nltk and download its sentence tokenizer data on first use, returning sent_tokenize."""
+    import nltk
+    nltk.download('punkt', quiet=True)
+    nltk.download('punkt_tab', quiet=True)
+    return nltk.sent_tokenize
 
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
 
-def process_transcription(media_url, output_type, max_chars=56, language=None):
-    """Transcribe media and return the transcript, SRT or ASS file path."""
-    logger.info(f"Starting transcription for media URL: {media_url} with output type: {output_type}")
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, 'input_media'))
-    logger.info(f"Downloaded media to local file: {input_filename}")
-
-    try:
-        model = whisper.load_model("base")
-        logger.info("Loaded Whisper model")
-
-        if output_type == 'transcript':
-            result = model.transcribe(input_filename, language=language)
-            output = result['text']
-            logger.info("Generated transcript output")
-        elif output_type in ['srt', 'vtt']:
-            result = model.transcribe(input_filename)
-            srt_subtitles = []
-            for i, segment in enumerate(result['segments'], start=1):
-                start = timedelta(seconds=segment['start'])
-                end = timedelta(seconds=segment['end'])
-                text = segment['text'].strip()
-                srt_subtitles.append(srt.Subtitle(i, start, end, text))
-            
-            output_content = srt.compose(srt_subtitles)
-            
-            # Write the output to a file
-            output_filename = os.path.join(STORAGE_PATH, f"{uuid.uuid4()}.{output_type}")
-            with open(output_filename, 'w') as f:
-                f.write(output_content)
-            
-            output = output_filename
-            logger.info(f"Generated {output_type.upper()} output: {output}")
-
-        elif output_type == 'ass':
-            result = model.transcribe(
-                input_filename,
-                word_timestamps=True,
-                task='transcribe',
-                verbose=False
-            )
-            logger.info("Transcription completed with word-level timestamps")
-            # Generate ASS subtitle content
-            ass_content = generate_ass_subtitle(result, max_chars)
-            logger.info("Generated ASS subtitle content")
-            
-            output_content = ass_content
-
-            # Write the ASS content to a file
-            output_filename = os.path.join(STORAGE_PATH, f"{uuid.uuid4()}.{output_type}")
-            with open(output_filename, 'w') as f:
-               f.write(output_content) 
-            output = output_filename
-            logger.info(f"Generated {output_type.upper()} output: {output}")
-        else:
-            raise ValueError("Invalid output type. Must be 'transcript', 'srt', or 'vtt'.")
-
-        os.remove(input_filename)
-        logger.info(f"Removed local file: {input_filename}")
-        logger.info(f"Transcription successful, output type: {output_type}")
-        return output
-    except Exception as e:
-        logger.error(f"Transcription failed: {str(e)}")
-        raise
-
-def create_word_limited_captions(words, words_per_line):
-    """Create word-limited captions while preserving moving highlight functionality."""
-    caption_groups = []
-    
-    # Group words into chunks of specified size
-    for i in range(0, len(words), words_per_line):
-        chunk = words[i:i + words_per_line]
-        
-        # Get timing for the chunk
-        start_time = chunk[0]['start']
-        end_time = chunk[-1]['end']
-        
-        # Store the chunk info
-        caption_groups.append({
-            'words': chunk,
-            'start': start_time,
-            'end': end_time
-        })
-    
-    return caption_groups
-
 def generate_ass_subtitle(result, max_chars, words_per_line=None):
     """Generate ASS subtitle content with highlighted current words, showing one line at a time."""
     logger.info("Generate ASS subtitle content with highlighted current words")
-    ass_content = ""
-
-    def format_time(t):
-        hours = int(t // 3600)
-        minutes = int((t % 3600) // 60)
-        seconds = int(t % 60)
-        centiseconds = int(round((t - int(t)) * 100))
-        return f"{hours}:{minutes:02d}:{seconds:02d}.{centiseconds:02d}"
-
-    for segment in result['segments']:
-        words = segment.get('words', [])
-        if not words:
-            continue
-
-        if words_per_line:
-            # Get word-limited groups
-            caption_groups = create_word_limited_captions(words, words_per_line)
-            
-            # Process each group
-            for group in caption_groups:
-                group_words = group['words']
-                
-                # Generate moving highlight for each word in the group
-                for i, word_info in enumerate(group_words):
-                    start_time = word_info['start']
-                    
-                    # Calculate end time
-                    if i + 1 < len(group_words):
-                        end_time = group_words[i + 1]['start']
-                    else:
-                        end_time = group['end']
-                    
-                    # Build caption with moving highlight
-                    caption_parts = []
-                    for w in group_words:
-                        word_text = w['word']
-                        if w == word_info:
-                            caption_parts.append(r'{\c&H00FFFF&}' + word_text)
-                        else:
-                            caption_parts.append(r'{\c&HFFFFFF&}' + word_text)
-                    
-                    caption_with_highlight = ' '.join(caption_parts)
-                    
-                    # Format times
-                    start = format_time(start_time)
-                    end = format_time(end_time)
-                    
-                    # Add the dialogue line
-                    ass_content += f"Dialogue: 0,{start},{end},Default,,0,0,0,,{caption_with_highlight}\n"
-        else:
-            # Original logic remains unchanged
-            lines = []
-            current_line = []
+    columns = word_columns(result['segments'])
+
+    if words_per_line:
+        lines = line_ranges(columns.segment_ids, words_per_line)
+    else:
+        # Lines of at most max_chars characters
+        lines = []
+        for start, end in segment_ranges(columns.segment_ids):
+            line_start = start
             current_line_length = 0
-            for word_info in words:
-                word_length = len(word_info['word']) + 1
-                if current_line_length + word_length > max_chars:
-                    lines.append(current_line)
-                    current_line = [word_info]
+            for i in range(start, end):
+                word_length = len(columns.texts[i]) + 1
+                if current_line_length + word_length > max_chars and i > line_start:
+                    lines.append((line_start, i))
+                    line_start = i
                     current_line_length = word_length
                 else:
-                    current_line.append(word_info)
                     current_line_length += word_length
-            if current_line:
-                lines.append(current_line)
-
-            for line in lines:
-                line_start_time = line[0]['start']
-                line_end_time = line[-1]['end']
+            lines.append((line_start, end))
 
-                for i, word_info in enumerate(line):
-                    start_time = word_info['start']
-                    end_time = word_info['end']
+    texts = []
+    end_times = []
+    for start, end in lines:
+        # Each word is shown until the next word of its line starts; the last until the line ends
+        texts.extend(moving_highlight(columns.texts[start:end], r'{\c&H00FFFF&}', '', prefix=r'{\c&HFFFFFF&}'))
+        end_times.append(columns.starts[start + 1:end])
+        end_times.append(columns.ends[end - 1:end])
 
-                    caption_parts = []
-                    for w in line:
-                        word_text = w['word']
-                        if w == word_info:
-                            caption_parts.append(r'{\c&H00FFFF&}' + word_text)
-                        else:
-                            caption_parts.append(r'{\c&HFFFFFF&}' + word_text)
-                    caption_with_highlight = ' '.join(caption_parts)
+    if not texts:
+        return ""
+    ends = np.concatenate(end_times)
+    return dialogue_events(columns.starts, ends, texts) + "\n"
 
-                    start = format_time(start_time)
-                    if i + 1 < len(line):
-                        end_time = line[i + 1]['start']
-                    else:
-                        end_time = line_end_time
-                    end = format_time(end_time)
-
-                    ass_content += f"Dialogue: 0,{start},{end},Default,,0,0,0,,{caption_with_highlight}\n"
-
-    return ass_content
 def format_timestamp(seconds):
     """Convert seconds to HH:MM:SS.mmm format."""
     td = timedelta(seconds=seconds)
@@ -291,117 +152,134 @@ def create_word_level_srt(segments, words_per_subtitle):
     
     return "\n\n".join(srt_content)
 
-def process_transcription(audio_path, output_type, words_per_subtitle=None, max_chars=56, language=None):
-    """Transcribe audio and return the transcript or subtitle content."""
-    logger.info(f"Starting transcription for: {audio_path} with output type: {output_type}")
-
-    try:
-        model = whisper.load_model("base")
-        logger.info("Whisper model loaded successfully")
-
-        result = model.transcribe(audio_path, language=language)
-        logger.info("Transcription completed successfully")
-
-        if output_type == 'transcript':
-            transcript = []
-            timestamps = []
-            text_segments = []
-            duration_sentences = []
-            duration_splitsentence = []
-            split_sentences = []  # New list for split sentences
-            srt_format = []  # List for SRT format
-            for i, segment in enumerate(result['segments'], start=1):
-                start_time = segment['start']
-                end_time = segment['end']
-                text = segment['text'].strip()
-                
-                # Split the segment into sentences
-                sentences = sent_tokenize(text)
-                
-                for sentence in sentences:
-                    formatted_start = format_timestamp(start_time)
-                    formatted_end = format_timestamp(end_time)
-                    transcript.append(f"{formatted_start} - {formatted_end}: {sentence}")
-                    timestamps.append(f"{formatted_start}-{formatted_end}")
-                    text_segments.append(sentence)
-                    duration = end_time - start_time
-                    duration_sentences.append(str(round(duration, 2)))
-                    
-                    # Split sentence analysis
-                    part1, part2, duration1, duration2, split_parts = split_sentence(sentence, start_time, end_time)
-                    duration_splitsentence.extend([str(duration1), str(duration2)])
-                    split_sentences.extend(split_parts)  # Add the split parts
-                    
-                    # Create SRT format entry
-                    srt_entry = f"{i}\n{formatted_start.replace('.', ',')} --> {formatted_end.replace('.', ',')}\n{sentence}"
-                    srt_format.append(srt_entry)
-                    
-                    # Update start_time for the next sentence
-                    start_time = end_time
-                    i += 1  # Increment counter for next SRT entry
-            
-            if words_per_subtitle:
-                srt_format = create_word_level_srt(result['segments'], words_per_subtitle)
-            else:
-                srt_format = "\n\n".join(srt_format)
-
-            # Generate ASS subtitle content
-            ass_content = generate_ass_subtitle(result, max_chars)
+def get_transcribe_options(output_types, language=None):
+    """Return the Whisper options needed to produce every requested output type from one decode."""
+    options = {
+        "task": "transcribe",
+        "verbose": False,
+        # Only ASS highlighting needs word timings; aligning words costs time and changes segment boundaries
+        "word_timestamps": 'ass' in output_types
+    }
+    if language:
+        options["language"] = language
+    return options
+
+def format_transcript(result, words_per_subtitle=None, max_chars=56):
+    """Build the transcript output (sentences, timings, SRT text and ASS file) from a Whisper result."""
+    transcript = []
+    timestamps = []
+    text_segments = []
+    duration_sentences = []
+    duration_splitsentence = []
+    split_sentences = []  # New list for split sentences
+    srt_format = []  # List for SRT format
+    for i, segment in enumerate(result['segments'], start=1):
+        start_time = segment['start']
+        end_time = segment['end']
+        text = segment['text'].strip()
+        
+        # Split the segment into sentences
+        sentences = sentence_tokenizer()(text)
+        
+        for sentence in sentences:
+            formatted_start = format_timestamp(start_time)
+            formatted_end = format_timestamp(end_time)
+            transcript.append(f"{formatted_start} - {formatted_end}: {sentence}")
+            timestamps.append(f"{formatted_start}-{formatted_end}")
+            text_segments.append(sentence)
+            duration = end_time - start_time
+            duration_sentences.append(str(round(duration, 2)))
             
-            # Write the ASS content to a temporary file
-            temp_ass_filename = os.path.join(STORAGE_PATH, f"{uuid.uuid4()}.ass")
-            with open(temp_ass_filename, 'w', encoding='utf-8') as f:
-                f.write(ass_content)
+            # Split sentence analysis
+            part1, part2, duration1, duration2, split_parts = split_sentence(sentence, start_time, end_time)
+            duration_splitsentence.extend([str(duration1), str(duration2)])
+            split_sentences.extend(split_parts)  # Add the split parts
             
-            # Upload the ASS file to GCS and get the URL
-            ass_cloud_url = upload_to_gcs(temp_ass_filename)
+            # Create SRT format entry
+            srt_entry = f"{i}\n{formatted_start.replace('.', ',')} --> {formatted_end.replace('.', ',')}\n{sentence}"
+            srt_format.append(srt_entry)
             
-            # Remove the temporary ASS file
-            os.remove(temp_ass_filename)
+            # Update start_time for the next sentence
+            start_time = end_time
+            i += 1  # Increment counter for next SRT entry
+    
+    if words_per_subtitle:
+        srt_format = create_word_level_srt(result['segments'], words_per_subtitle)
+    else:
+        srt_format = "\n\n".join(srt_format)
 
-            output = {
-                'transcript': "\n".join(transcript),
-                'timestamps': timestamps,
-                'text_segments': text_segments,
-                'duration_sentences': duration_sentences,
-                'duration_splitsentence': duration_splitsentence,
-                'split_sentences': split_sentences,  # Add split sentences to output
-                'srt_format': srt_format,
-                'ass_content': ass_content,
-                'ass_file_url': ass_cloud_url
-            }
-            logger.info("Transcript with timestamps, sentence durations, split sentence durations, SRT format, and ASS file URL generated")
-            return output
-        elif output_type in ['srt', 'vtt', 'ass']:
-            output_filename = os.path.join(STORAGE_PATH, f"{uuid.uuid4()}.{output_type}")
-            
-            if output_type == 'srt':
-                writer = WriteSRT(output_dir=STORAGE_PATH)
-                temp_filename = writer(result, audio_path)
-                os.rename(temp_filename, output_filename)
-            elif output_type == 'vtt':
-                writer = WriteVTT(output_dir=STORAGE_PATH)
-                temp_filename = writer(result, audio_path)
-                os.rename(temp_filename, output_filename)
-            elif output_type == 'ass':
-                result = model.transcribe(
-                    audio_path,
-                    word_timestamps=True,
-                    task='transcribe',
-                    verbose=False
-                )
-                logger.info("Transcription completed with word-level timestamps")
-                # Pass words_per_subtitle to generate_ass_subtitle
-                ass_content = generate_ass_subtitle(result, max_chars, words_per_subtitle)
-                logger.info("Generated ASS subtitle content")
-                
-                with open(output_filename, 'w', encoding='utf-8') as f:
-                    f.write(ass_content)
-            
-            logger.info(f"Generated {output_type.upper()} output: {output_filename}")
-            return output_filename
-        else:
-            raise ValueError(f"Invalid output type: {output_type}")
+    # Generate ASS subtitle content
+    ass_content = generate_ass_subtitle(result, max_chars)
+    
+    # Write the ASS content to a temporary file
+    temp_ass_filename = os.path.join(STORAGE_PATH, f"{uuid.uuid4()}.ass")
+    with open(temp_ass_filename, 'w', encoding='utf-8') as f:
+        f.write(ass_content)
+    
+    # Upload the ASS file to GCS and get the URL
+    ass_cloud_url = upload_to_gcs(temp_ass_filename)
+    
+    # Remove the temporary ASS file
+    os.remove(temp_ass_filename)
+
+    output = {
+        'transcript': "\n".join(transcript),
+        'timestamps': timestamps,
+        'text_segments': text_segments,
+        'duration_sentences': duration_sentences,
+        'duration_splitsentence': duration_splitsentence,
+        'split_sentences': split_sentences,  # Add split sentences to output
+        'srt_format': srt_format,
+        'ass_content': ass_content,
+        'ass_file_url': ass_cloud_url
+    }
+    logger.info("Transcript with timestamps, sentence durations, split sentence durations, SRT format, and ASS file URL generated")
+    return output
+
+def write_subtitle_file(result, output_type, audio_path, words_per_subtitle=None, max_chars=56):
+    """Write an SRT, VTT or ASS file for a Whisper result and return its path."""
+    output_filename = os.path.join(STORAGE_PATH, f"{uuid.uuid4()}.{output_type}")
+    
+    if output_type in ('srt', 'vtt'):
+        # Write straight to the output file; the writers' __call__ names files after the input and returns nothing
+        writer = whisper.utils.WriteSRT(output_dir=STORAGE_PATH) if output_type == 'srt' else whisper.utils.WriteVTT(output_dir=STORAGE_PATH)
+        with open(output_filename, 'w', encoding='utf-8') as f:
+            writer.write_result(result, file=f)
+    elif output_type == 'ass':
+        # Pass words_per_subtitle to generate_ass_subtitle
+        ass_content = generate_ass_subtitle(result, max_chars, words_per_subtitle)
+        logger.info("Generated ASS subtitle content")
+        
+        with open(output_filename, 'w', encoding='utf-8') as f:
+            f.write(ass_content)
+    
+    logger.info(f"Generated {output_type.upper()} output: {output_filename}")
+    return output_filename
+
+def process_transcription_outputs(audio_path, output_types, words_per_subtitle=None, max_chars=56, language=None, model_size=None):
+    """Transcribe audio once and return a dict with every requested output type.
+
+    'transcript' maps to the transcript details; 'srt', 'vtt' and 'ass' map
+    to the path of the generated subtitle file.
+    """
+    logger.info(f"Starting transcription for: {audio_path} with output types: {', '.join(output_types)}")
+
+    try:
+        for output_type in output_types:
+            if output_type not in ('transcript', 'srt', 'vtt', 'ass'):
+                raise ValueError(f"Invalid output type: {output_type}")
+
+        options = get_transcribe_options(output_types, language)
+        result = transcribe_media_file(audio_path, model_size, **options)
+        logger.info(f"Transcription completed successfully (word timestamps: {options['word_timestamps']})")
+
+        outputs = {}
+        for output_type in output_types:
+            if output_type == 'transcript':
+                outputs[output_type] = format_transcript(result, words_per_subtitle, max_chars)
+            else:
+                outputs[output_type] = write_subtitle_file(result, output_type, audio_path, words_per_subtitle, max_chars)
+        return outputs
 
     except Exception as e:
         logger.error(f"Error during transcription: {str(e)}")
@@ -0,0 +1,61 @@
+import os
+import logging
+from abc import ABC, abstractmethod
+from services.startup import lazy_import
+
+whisper = lazy_import('whisper')
+
+logger = logging.getLogger(__name__)
+
+WHISPER_DOWNLOAD_ROOT = os.environ.get('WHISPER_DOWNLOAD_ROOT')
+
+class TranscriptionBackend(ABC):
+    """Loads whisper models of a given size for one way of running inference.
+
+    load() returns an object with the whisper model interface (transcribe,
+    detect_language, dims, device) so the model pool, long-form workers and
+    transcription engine work the same with every backend.
+    """
+
+    name = None
+    description = None
+
+    @abstractmethod
+    def load(self, size):
+        """Load and return the model of the given size."""
+        pass
+
+class WhisperBackend(TranscriptionBackend):
+    name = 'whisper'
+    description = 'openai-whisper in float32 (float16 on GPU)'
+
+    def load(self, size):
+        return whisper.load_model(size, download_root=WHISPER_DOWNLOAD_ROOT)
+
+class QuantizedWhisperBackend(TranscriptionBackend):
+    name = 'int8'
+    description = 'openai-whisper on CPU with linear layers dynamically quantized to int8'
+
+    def load(self, size):
+        import torch
+        model = whisper.load_model(size, device='cpu', download_root=WHISPER_DOWNLOAD_ROOT)
+        # whisper's Linear subclass only adds dtype casting for fp16; quantize_dynamic
+        # matches exact module types, so turn them back into plain nn.Linear first
+        for module in model.modules():
+            if type(module) is whisper.model.Linear:
+                module.__class__ = torch.nn.Linear
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend(), QuantizedWhisperBackend())}
+
+# Backend used when a request does not choose one
+WHISPER_BACKEND = os.environ.get('WHISPER_BACKEND', 'whisper')
+
+def resolve_backend(name=None):
+    name = name or WHISPER_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Transcription backend '{name}' is not available. Choose one of: {', '.join(BACKENDS)}")
+    return name
+
+def get_backend(name=None):
+    return BACKENDS[resolve_backend(name)]
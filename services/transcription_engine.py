@@ -0,0 +1,292 @@
+import os
+import gzip
+import json
+import time
+import uuid
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from services.audio_extraction import extracted_audio, extract_audio, load_audio
+from services.file_management import DOWNLOAD_CONCURRENCY
+from services.whisper_models import acquire_model, resolve_model_size
+from services.thread_budget import lease_threads
+from services.transcription_backends import resolve_backend
+from services.voice_activity import detect_speech, clip_timestamps, VAD_ENABLED
+from services.language_detection import detect_language
+from services.chunked_transcription import (
+    transcribe_long_form, find_split_points, offset_result,
+    LONG_FORM_CHUNK_SECONDS, SAMPLE_RATE
+)
+
+logger = logging.getLogger(__name__)
+
+# Whisper results are cached on disk by decoded audio content so repeat requests skip transcription
+TRANSCRIPT_CACHE_ENABLED = os.environ.get('TRANSCRIPT_CACHE_ENABLED', 'true').lower() == 'true'
+TRANSCRIPT_CACHE_DIR = os.environ.get('TRANSCRIPT_CACHE_DIR', '/tmp/nca_transcript_cache')
+# Oldest cached transcripts are removed once the cache grows beyond this size
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get('TRANSCRIPT_CACHE_MAX_BYTES', 1024 ** 3))
+# Length of the windows streamed transcriptions are decoded in; segments are emitted as each window finishes
+TRANSCRIBE_STREAM_WINDOW_SECONDS = float(os.environ.get('TRANSCRIBE_STREAM_WINDOW_SECONDS', 60))
+
+def hash_audio(audio):
+    """Return the sha256 of decoded audio samples, independent of the container it came from."""
+    # Hash the buffer in place; tobytes() would copy the whole recording
+    return hashlib.sha256(memoryview(np.ascontiguousarray(audio)).cast('B')).hexdigest()
+
+def _cache_path(audio_hash, model_size, task, language, word_timestamps, backend, vad):
+    key = f"{audio_hash}:{model_size}:{backend}:{task}:{language or 'auto'}:{int(bool(word_timestamps))}:{int(bool(vad))}"
+    return os.path.join(TRANSCRIPT_CACHE_DIR, f"{hashlib.sha256(key.encode()).hexdigest()}.json.gz")
+
+def _read_cache(path):
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            result = json.load(f)
+        # Mark as recently used for eviction
+        os.utime(path)
+        return result
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable cached transcript {path}: {str(e)}")
+        return None
+
+def _write_cache(path, result):
+    os.makedirs(TRANSCRIPT_CACHE_DIR, exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with gzip.open(temp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        json.dump(result, f, separators=(',', ':'), default=float)
+    os.replace(temp_path, path)
+    _evict()
+
+def _evict():
+    entries = []
+    for name in os.listdir(TRANSCRIPT_CACHE_DIR):
+        if not name.endswith('.json.gz'):
+            continue
+        try:
+            stat = os.stat(os.path.join(TRANSCRIPT_CACHE_DIR, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= TRANSCRIPT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(os.path.join(TRANSCRIPT_CACHE_DIR, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def _strip_word_timestamps(result):
+    for segment in result['segments']:
+        segment.pop('words', None)
+    return result
+
+def lookup_transcript(audio_hash, model_size, task, language, word_timestamps, backend, vad):
+    """Return a cached Whisper result for the given audio and options, or None."""
+    result = _read_cache(_cache_path(audio_hash, model_size, task, language, word_timestamps, backend, vad))
+    if result is None and not word_timestamps:
+        # A result with word timings (e.g. from a caption job) also serves requests without them
+        result = _read_cache(_cache_path(audio_hash, model_size, task, language, True, backend, vad))
+        if result is not None:
+            result = _strip_word_timestamps(result)
+    return result
+
+def transcribe_media_file(media_path, model_size=None, task='transcribe', language=None, word_timestamps=False, long_form=False, on_progress=None, backend=None, vad=None, **options):
+    """Transcribe (or translate) a media file or URL with Whisper and return its result dict.
+
+    The audio track is extracted once to 16 kHz mono float32 PCM and
+    memory-mapped (see services.audio_extraction); its content hash together with the model,
+    task, language and word_timestamps setting keys a gzip-compressed JSON
+    cache, so the same media transcribed again - by any endpoint - returns
+    without running the model.
+
+    With long_form, audio longer than two chunks is split at silences and
+    transcribed in parallel worker processes (see services.chunked_transcription).
+    on_progress, if given, is called with a 0-100 completion percentage.
+    backend chooses how the model runs (see services.transcription_backends).
+    With vad (default VAD_ENABLED) Whisper only decodes the regions
+    services.voice_activity detects as speech; timestamps stay on the
+    original timeline.
+    """
+    model_size = resolve_model_size(model_size)
+    backend = resolve_backend(backend)
+    vad = VAD_ENABLED if vad is None else vad
+    with extracted_audio(media_path) as audio:
+        return _transcribe_audio(audio, media_path, model_size, backend, vad, task, language, word_timestamps, long_form, on_progress, options)
+
+def _speech_regions(audio, media_path):
+    start_time = time.time()
+    regions = detect_speech(audio)
+    speech_seconds = sum(end - start for start, end in regions)
+    logger.info(
+        f"Voice activity in {media_path}: {speech_seconds:.1f}s of {len(audio) / SAMPLE_RATE:.1f}s "
+        f"in {len(regions)} regions, detected in {time.time() - start_time:.2f}s"
+    )
+    return regions
+
+def _cached_transcript(audio_hash, media_path, model_size, backend, vad, task, language, word_timestamps):
+    if not TRANSCRIPT_CACHE_ENABLED:
+        return None
+    result = lookup_transcript(audio_hash, model_size, task, language, word_timestamps, backend, vad)
+    if result is not None:
+        logger.info(f"Transcript cache hit for {media_path} ({model_size}, {backend}, {task}, {language or 'auto'})")
+    return result
+
+def _decode(model, audio, options):
+    # Torch threads are leased only while the model runs, not while media downloads or encodes
+    with lease_threads():
+        return model.transcribe(audio, **options)
+
+def _transcribe_audio(audio, media_path, model_size, backend, vad, task, language, word_timestamps, long_form, on_progress, options, model=None):
+    audio_hash = hash_audio(audio)
+    result = _cached_transcript(audio_hash, media_path, model_size, backend, vad, task, language, word_timestamps)
+    if result is not None:
+        return result
+    cache_path = _cache_path(audio_hash, model_size, task, language, word_timestamps, backend, vad) if TRANSCRIPT_CACHE_ENABLED else None
+
+    speech_regions = _speech_regions(audio, media_path) if vad else None
+    if speech_regions == []:
+        return {"text": "", "segments": [], "language": language}
+
+    if not language:
+        # Identify the language once, from the first speech, instead of letting Whisper detect it;
+        # the result is remembered for this audio, so repeat requests skip detection
+        language = detect_language(audio, model_size, backend, audio_hash, model)
+        result = _cached_transcript(audio_hash, media_path, model_size, backend, vad, task, language, word_timestamps)
+        if result is not None:
+            return result
+
+    transcribe_options = dict(options, task=task, word_timestamps=word_timestamps, language=language)
+    if speech_regions is not None:
+        transcribe_options['clip_timestamps'] = clip_timestamps(speech_regions)
+
+    if long_form and len(audio) > 2 * LONG_FORM_CHUNK_SECONDS * SAMPLE_RATE:
+        transcribe_options.pop('clip_timestamps', None)
+        result = transcribe_long_form(audio, model_size, transcribe_options, on_progress, backend, speech_regions)
+    elif model is not None:
+        result = _decode(model, audio, transcribe_options)
+    else:
+        with acquire_model(model_size, backend) as model:
+            result = _decode(model, audio, transcribe_options)
+
+    if cache_path is not None:
+        try:
+            _write_cache(cache_path, result)
+        except OSError as e:
+            logger.warning(f"Failed to cache transcript for {media_path}: {str(e)}")
+    return result
+
+def transcribe_media_batch(sources, model_size=None, task='transcribe', language=None, word_timestamps=False, on_item=None, backend=None, vad=None, **options):
+    """Transcribe many media files or URLs with one resident model and return a result or exception per source.
+
+    Audio is extracted from up to DOWNLOAD_CONCURRENCY sources at once while
+    the model, borrowed once for the whole batch, transcribes whichever clip
+    is ready next. A failing item does not stop the others. on_item, if
+    given, is called with (index, result or exception) as each item finishes.
+    """
+    model_size = resolve_model_size(model_size)
+    backend = resolve_backend(backend)
+    vad = VAD_ENABLED if vad is None else vad
+    results = [None] * len(sources)
+    if not sources:
+        return results
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_CONCURRENCY, len(sources))) as executor:
+        futures = {executor.submit(extract_audio, source): index for index, source in enumerate(sources)}
+        try:
+            with acquire_model(model_size, backend) as model:
+                for future in as_completed(futures):
+                    index = futures[future]
+                    audio_path = None
+                    try:
+                        audio_path = future.result()
+                        results[index] = _transcribe_audio(
+                            load_audio(audio_path), sources[index], model_size, backend, vad, task, language,
+                            word_timestamps, False, None, options, model=model
+                        )
+                    except Exception as e:
+                        logger.error(f"Batch item {index} ({sources[index]}) failed: {str(e)}")
+                        results[index] = e
+                    finally:
+                        if audio_path and os.path.exists(audio_path):
+                            os.remove(audio_path)
+                    if on_item:
+                        on_item(index, results[index])
+        finally:
+            # Remove audio extracted for items that were never transcribed (e.g. the model failed to load)
+            for future in futures:
+                if not future.cancel() and future.exception() is None and os.path.exists(future.result()):
+                    os.remove(future.result())
+
+    logger.info(f"Transcribed a batch of {len(sources)} items in {time.time() - start_time:.2f}s")
+    return results
+
+def stream_transcription(media_path, model_size=None, task='transcribe', language=None, word_timestamps=False, backend=None, vad=None, on_language=None, on_progress=None, **options):
+    """Transcribe a media file or URL and yield lists of finished segments as they become available.
+
+    The audio is cut at silences into TRANSCRIBE_STREAM_WINDOW_SECONDS windows
+    that are decoded in order, each prompted with the text of the previous
+    one, and every window's segments are yielded with timestamps relative to
+    the start of the media. A cached transcript is yielded in one piece.
+    The full result is cached once the last window is done. on_language, if
+    given, is called with the (requested or detected) language before the
+    first segments are yielded; on_progress, if given, is called with a 0-100
+    completion percentage before each window's segments are yielded.
+    """
+    model_size = resolve_model_size(model_size)
+    backend = resolve_backend(backend)
+    vad = VAD_ENABLED if vad is None else vad
+    with extracted_audio(media_path) as audio:
+        audio_hash = hash_audio(audio)
+        result = _cached_transcript(audio_hash, media_path, model_size, backend, vad, task, language, word_timestamps)
+        if result is not None:
+            if on_language:
+                on_language(result.get('language') or language)
+            if on_progress:
+                on_progress(100)
+            yield result['segments']
+            return
+        cache_path = _cache_path(audio_hash, model_size, task, language, word_timestamps, backend, vad) if TRANSCRIPT_CACHE_ENABLED else None
+
+        speech_regions = _speech_regions(audio, media_path) if vad else None
+        points = find_split_points(audio, TRANSCRIBE_STREAM_WINDOW_SECONDS)
+        bounds = list(zip([0] + points, points + [len(audio)]))
+        transcribe_options = dict(options, task=task, word_timestamps=word_timestamps, verbose=None)
+        if not language:
+            # Decide the language once so every window is decoded consistently
+            language = detect_language(audio, model_size, backend, audio_hash)
+        transcribe_options['language'] = language
+        if on_language:
+            on_language(language)
+
+        segments = []
+        texts = []
+        with acquire_model(model_size, backend) as model:
+            for start, end in bounds:
+                if speech_regions is not None:
+                    clips = clip_timestamps(speech_regions, start / SAMPLE_RATE, end / SAMPLE_RATE)
+                    if not clips:
+                        # Nothing but silence or music in this window
+                        continue
+                    transcribe_options['clip_timestamps'] = clips
+                if texts:
+                    transcribe_options['initial_prompt'] = texts[-1]
+                result = offset_result(_decode(model, audio[start:end], transcribe_options), start / SAMPLE_RATE)
+                for segment in result['segments']:
+                    segment['id'] = len(segments)
+                    segments.append(segment)
+                if result['text'].strip():
+                    texts.append(result['text'].strip())
+                if on_progress:
+                    on_progress(int(end * 100 / len(audio)))
+                yield result['segments']
+
+        if cache_path is not None:
+            try:
+                _write_cache(cache_path, {"text": " ".join(texts), "segments": segments, "language": language})
+            except OSError as e:
+                logger.warning(f"Failed to cache transcript for {media_path}: {str(e)}")
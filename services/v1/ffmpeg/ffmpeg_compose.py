@@ -1,7 +1,7 @@
 import os
 import subprocess
 import json
-from services.file_management import download_file
+from services.file_management import download_files_concurrently
 
 STORAGE_PATH = "/tmp/"
 
@@ -79,6 +79,11 @@ def get_metadata(filename, metadata_requests, job_id):
 def process_ffmpeg_compose(data, job_id):
     output_filenames = []
     
+    # Fetch all inputs in parallel before building the command
+    input_paths, download_timings = download_files_concurrently([
+        (input_data["file_url"], STORAGE_PATH) for input_data in data["inputs"]
+    ])
+    
     # Build FFmpeg command
     command = ["ffmpeg"]
     
@@ -89,13 +94,12 @@ def process_ffmpeg_compose(data, job_id):
             command.append(str(option["argument"]))
     
     # Add inputs
-    for input_data in data["inputs"]:
+    for input_data, input_path in zip(data["inputs"], input_paths):
         if "options" in input_data:
             for option in input_data["options"]:
                 command.append(option["option"])
                 if "argument" in option and option["argument"] is not None:
                     command.append(str(option["argument"]))
-        input_path = download_file(input_data["file_url"], STORAGE_PATH)
         command.extend(["-i", input_path])
     
     # Add filters
@@ -128,8 +132,7 @@ def process_ffmpeg_compose(data, job_id):
         raise Exception(f"FFmpeg command failed: {e.stderr}")
     
     # Clean up input files
-    for input_data in data["inputs"]:
-        input_path = os.path.join(STORAGE_PATH, os.path.basename(input_data["file_url"]))
+    for input_path in input_paths:
         if os.path.exists(input_path):
             os.remove(input_path)
     
@@ -139,4 +142,4 @@ def process_ffmpeg_compose(data, job_id):
         for output_filename in output_filenames:
             metadata.append(get_metadata(output_filename, data["metadata"], job_id))
     
-    return output_filenames, metadata
\ No newline at end of file
+    return output_filenames, metadata, download_timings
\ No newline at end of file
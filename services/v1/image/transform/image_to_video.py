@@ -1,13 +1,16 @@
 import os
+import time
 import subprocess
 import logging
 from services.file_management import download_file
+from services.encoding_profiles import get_profile, encoding_report
 from PIL import Image
 
 STORAGE_PATH = "/tmp/"
 logger = logging.getLogger(__name__)
 
-def process_image_to_video(image_url, length, frame_rate, zoom_speed, job_id, webhook_url=None):
+def process_image_to_video(image_url, length, frame_rate, zoom_speed, job_id, webhook_url=None, encoding_profile=None):
+    """Render a zooming video from an image. Returns (output_path, encoding report)."""
     try:
         # Download the image file
         image_path = download_file(image_url, STORAGE_PATH)
@@ -38,26 +41,29 @@ def process_image_to_video(image_url, length, frame_rate, zoom_speed, job_id, we
         logger.info(f"Zoom speed: {zoom_speed}/s, Final zoom factor: {zoom_factor}")
 
         # Prepare FFmpeg command
+        profile = get_profile(encoding_profile)
         cmd = [
             'ffmpeg', '-framerate', str(frame_rate), '-loop', '1', '-i', image_path,
             '-vf', f"scale={scale_dims},zoompan=z='min(1+({zoom_speed}*{length})*on/{total_frames}, {zoom_factor})':d={total_frames}:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={output_dims}",
-            '-c:v', 'libx264', '-t', str(length), '-pix_fmt', 'yuv420p', output_path
+            *profile.video_args(), '-t', str(length), '-pix_fmt', 'yuv420p', output_path
         ]
 
         logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
 
         # Run FFmpeg command
+        encode_start = time.time()
         result = subprocess.run(cmd, capture_output=True, text=True)
         if result.returncode != 0:
             logger.error(f"FFmpeg command failed. Error: {result.stderr}")
             raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
 
-        logger.info(f"Video created successfully: {output_path}")
+        encoding = encoding_report(profile, output_path, time.time() - encode_start)
+        logger.info(f"Video created successfully with the {profile.name} profile in {encoding['encode_seconds']}s: {output_path}")
 
         # Clean up input file
         os.remove(image_path)
 
-        return output_path
+        return output_path, encoding
     except Exception as e:
         logger.error(f"Error in process_image_to_video: {str(e)}", exc_info=True)
         raise
\ No newline at end of file
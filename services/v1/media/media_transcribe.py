@@ -1,9 +1,8 @@
 import os
-import whisper
 import srt
 from datetime import timedelta
-from whisper.utils import WriteSRT, WriteVTT
-from services.file_management import download_file
+from services.transcription_engine import transcribe_media_file, transcribe_media_batch, stream_transcription
+from services.job_registry import update_job_progress
 import logging
 
 # Set up logging
@@ -13,19 +12,76 @@ logging.basicConfig(level=logging.INFO)
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
 
-def process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id):
-    """Transcribe or translate media and return the transcript/translation, SRT or VTT file path."""
+def build_transcription_outputs(result, task, include_text, include_srt, include_segments, response_type, output_name):
+    """Turn a Whisper result into the (text, srt, segments) values, or files named output_name.* for cloud responses."""
+    # For translation task, the result['text'] will be in English
+    text = None
+    srt_text = None
+    segments_json = None
+
+    if include_text is True:
+        text = result['text']
+
+    if include_srt is True:
+        srt_subtitles = []
+        for i, segment in enumerate(result['segments'], start=1):
+            start = timedelta(seconds=segment['start'])
+            end = timedelta(seconds=segment['end'])
+            # Use translated text if available, otherwise use transcribed text
+            segment_text = segment['text'].strip()
+            srt_subtitles.append(srt.Subtitle(i, start, end, segment_text))
+        
+        srt_text = srt.compose(srt_subtitles)
+
+    if include_segments is True:
+        segments_json = result['segments']
+
+    logger.info(f"{task.capitalize()} successful, output type: {response_type}")
+
+    if response_type == "direct":
+        return text, srt_text, segments_json
+    else:
+        
+        if include_text is True:
+            text_filename = os.path.join(STORAGE_PATH, f"{output_name}.txt")
+            with open(text_filename, 'w') as f:
+                f.write(text)
+        else:
+            text_filename = None
+        
+        if include_srt is True:
+            srt_filename = os.path.join(STORAGE_PATH, f"{output_name}.srt")
+            with open(srt_filename, 'w') as f:
+                f.write(srt_text)
+        else:
+            srt_filename = None
+
+        if include_segments is True:
+            segments_filename = os.path.join(STORAGE_PATH, f"{output_name}.json")
+            with open(segments_filename, 'w') as f:
+                f.write(str(segments_json))
+        else:
+            segments_filename = None
+
+        return text_filename, srt_filename, segments_filename
+
+def collect_streamed_segments(windows, on_segments):
+    """Pass each window of segments to on_segments and return them combined as a Whisper result."""
+    segments = []
+    for window in windows:
+        segments.extend(window)
+        on_segments(window)
+    return {"text": "".join(segment['text'] for segment in segments), "segments": segments}
+
+def process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id, model_size=None, long_form=False, on_segments=None, backend=None, vad=None):
+    """Transcribe or translate media and return the transcript/translation, SRT or VTT file path, and the language.
+
+    If on_segments is given the media is transcribed window by window and it
+    is called with each window's finished segments as soon as they are ready.
+    """
     logger.info(f"Starting {task} for media URL: {media_url}")
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, 'input_media'))
-    logger.info(f"Downloaded media to local file: {input_filename}")
 
     try:
-        # Load a larger model for better translation quality
-        #model_size = "large" if task == "translate" else "base"
-        model_size = "base"
-        model = whisper.load_model(model_size)
-        logger.info(f"Loaded Whisper {model_size} model")
-
         # Configure transcription/translation options
         options = {
             "task": task,
@@ -37,63 +93,65 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         if language:
             options["language"] = language
 
-        result = model.transcribe(input_filename, **options)
+        # Only the audio track is fetched and decoded; the media file itself is not stored
+        if on_segments is not None:
+            detected = {}
+            windows = stream_transcription(media_url, model_size, backend=backend, vad=vad, on_language=lambda language: detected.update(language=language), **options)
+            result = collect_streamed_segments(windows, on_segments)
+            result['language'] = detected.get('language')
+        else:
+            result = transcribe_media_file(
+                media_url,
+                model_size,
+                long_form=long_form,
+                backend=backend,
+                vad=vad,
+                on_progress=lambda progress: update_job_progress(job_id, progress),
+                **options
+            )
         
-        # For translation task, the result['text'] will be in English
-        text = None
-        srt_text = None
-        segments_json = None
-
         logger.info(f"Generated {task} output")
-
-        if include_text is True:
-            text = result['text']
-
-        if include_srt is True:
-            srt_subtitles = []
-            for i, segment in enumerate(result['segments'], start=1):
-                start = timedelta(seconds=segment['start'])
-                end = timedelta(seconds=segment['end'])
-                # Use translated text if available, otherwise use transcribed text
-                segment_text = segment['text'].strip()
-                srt_subtitles.append(srt.Subtitle(i, start, end, segment_text))
-            
-            srt_text = srt.compose(srt_subtitles)
-
-        if include_segments is True:
-            segments_json = result['segments']
-
-        os.remove(input_filename)
-        logger.info(f"Removed local file: {input_filename}")
-        logger.info(f"{task.capitalize()} successful, output type: {response_type}")
-
-        if response_type == "direct":
-            return text, srt_text, segments_json
-        else:
-            
-            if include_text is True:
-                text_filename = os.path.join(STORAGE_PATH, f"{job_id}.txt")
-                with open(text_filename, 'w') as f:
-                    f.write(text)
-            else:
-                text_file = None
-            
-            if include_srt is True:
-                srt_filename = os.path.join(STORAGE_PATH, f"{job_id}.srt")
-                with open(srt_filename, 'w') as f:
-                    f.write(srt_text)
-            else:
-                srt_filename = None
-
-            if include_segments is True:
-                segments_filename = os.path.join(STORAGE_PATH, f"{job_id}.json")
-                with open(segments_filename, 'w') as f:
-                    f.write(str(segments_json))
-            else:
-                segments_filename = None
-
-            return text_filename, srt_filename, segments_filename 
+        outputs = build_transcription_outputs(result, task, include_text, include_srt, include_segments, response_type, job_id)
+        return (*outputs, result.get('language'))
 
     except Exception as e:
         logger.error(f"{task.capitalize()} failed: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def process_transcribe_media_batch(media_urls, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id, model_size=None, backend=None, vad=None):
+    """Transcribe or translate several media URLs with a shared model.
+
+    Returns one (outputs, error) pair per URL, in order; outputs is the
+    process_transcribe_media tuple for that item and error is None unless
+    the item failed.
+    """
+    logger.info(f"Starting batch {task} of {len(media_urls)} media URLs")
+
+    options = {
+        "task": task,
+        "word_timestamps": word_timestamps,
+        "verbose": False
+    }
+    if language:
+        options["language"] = language
+
+    completed = []
+    def on_item(index, result):
+        completed.append(index)
+        update_job_progress(job_id, len(completed) * 100 / len(media_urls))
+
+    results = transcribe_media_batch(media_urls, model_size, on_item=on_item, backend=backend, vad=vad, **options)
+
+    items = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            items.append((None, str(result)))
+            continue
+        try:
+            outputs = build_transcription_outputs(result, task, include_text, include_srt, include_segments, response_type, f"{job_id}_{index}")
+            outputs = (*outputs, result.get('language'))
+            items.append((outputs, None))
+        except Exception as e:
+            logger.error(f"Failed to build outputs for batch item {index}: {str(e)}")
+            items.append((None, str(e)))
+    return items
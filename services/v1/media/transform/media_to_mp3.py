@@ -3,27 +3,26 @@ import os
 import ffmpeg
 import requests
 from services.file_management import download_file
+from services.media_stream import transcode_url
 
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
 
 def process_media_to_mp3(media_url, job_id, bitrate='128k', webhook_url=None):
     """Convert media to MP3 format with specified bitrate."""
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, f"{job_id}_input"))
     output_filename = f"{job_id}.mp3"
     output_path = os.path.join(STORAGE_PATH, output_filename)
 
     try:
-        # Convert media file to MP3 with specified bitrate
-        (
-            ffmpeg
-            .input(input_filename)
-            .output(output_path, acodec='libmp3lame', audio_bitrate=bitrate)
-            .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True)
+        # Convert media file to MP3 with specified bitrate, streaming the input when possible
+        input_mode = transcode_url(
+            media_url,
+            output_path,
+            os.path.join(STORAGE_PATH, f"{job_id}_input"),
+            acodec='libmp3lame',
+            audio_bitrate=bitrate
         )
-        os.remove(input_filename)
-        print(f"Conversion successful: {output_path} with bitrate {bitrate}")
+        print(f"Conversion successful: {output_path} with bitrate {bitrate} ({input_mode} input)")
 
         # Ensure the output file exists locally before attempting upload
         if not os.path.exists(output_path):
@@ -0,0 +1,226 @@
+import os
+import re
+import bisect
+import logging
+import tempfile
+import subprocess
+import ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# How /v1/video/caption burns in captions when a request does not say: full, segments or auto
+CAPTION_RENDER_MODE = os.environ.get('CAPTION_RENDER_MODE', 'full')
+# Gaps between captioned spans shorter than this are re-encoded too rather than cut into a separate copied segment
+CAPTION_SEGMENT_MIN_COPY_SECONDS = float(os.environ.get('CAPTION_SEGMENT_MIN_COPY_SECONDS', 2.0))
+# In auto render mode, segments are only used when at most this fraction of the video needs re-encoding
+CAPTION_SEGMENT_MAX_COVERAGE = float(os.environ.get('CAPTION_SEGMENT_MAX_COVERAGE', 0.5))
+RENDER_MODES = ['full', 'segments', 'auto']
+# x264 names of the H.264 profiles ffprobe reports that a re-encoded segment can be made to match
+X264_PROFILES = {'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main', 'High': 'high'}
+
+ASS_TIME = re.compile(r'(\d+):(\d{1,2}):(\d{1,2}(?:\.\d+)?)')
+
+def _ass_seconds(value):
+    match = ASS_TIME.fullmatch(value.strip())
+    if not match:
+        raise ValueError(f"Invalid ASS time '{value}'")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def subtitle_event_ranges(ass_content):
+    """Return the merged (start, end) seconds during which any Dialogue event of an ASS script is shown."""
+    fields = ['Layer', 'Start', 'End']
+    in_events = False
+    ranges = []
+    for line in ass_content.splitlines():
+        line = line.strip()
+        if line.startswith('['):
+            in_events = line.lower() == '[events]'
+        elif in_events and line.startswith('Format:'):
+            fields = [field.strip() for field in line[len('Format:'):].split(',')]
+        elif in_events and line.startswith('Dialogue:'):
+            values = line[len('Dialogue:'):].split(',', len(fields) - 1)
+            start = _ass_seconds(values[fields.index('Start')])
+            end = _ass_seconds(values[fields.index('End')])
+            if end > start:
+                ranges.append((start, end))
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def parse_framecrc(output):
+    """Return the sorted presentation times, in seconds, of the packets listed in ffmpeg framecrc output."""
+    time_base = None
+    times = []
+    for line in output.splitlines():
+        if line.startswith('#tb 0:'):
+            numerator, denominator = line.split(':', 1)[1].strip().split('/')
+            time_base = int(numerator) / int(denominator)
+        elif line and not line.startswith('#') and time_base is not None:
+            # stream index, dts, pts, duration, size, crc
+            fields = [field.strip() for field in line.split(',')]
+            pts = int(fields[2])
+            if fields[0] == '0' and pts != -2 ** 63:
+                times.append(pts * time_base)
+    return sorted(times)
+
+def keyframe_times(video_path):
+    """Return the sorted presentation times of the first video stream's IDR frames, without decoding.
+
+    Only IDR frames are safe cut points: packets of open-GOP I frames are
+    flagged as keyframes too, but the frames after them can reference the
+    GOP before. The stream is copied through filter_units keeping only IDR
+    slices (NAL type 5), which drops every other packet, and the times of
+    the remaining packets are read from framecrc output.
+    """
+    result = subprocess.run([
+        'ffmpeg', '-v', 'error', '-copyts', '-i', video_path, '-map', '0:v:0', '-c', 'copy',
+        '-bsf:v', 'filter_units=pass_types=5', '-f', 'framecrc', '-'
+    ], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {result.returncode}: {result.stderr[-2000:]}")
+    return parse_framecrc(result.stdout)
+
+def video_parameters(video_stream):
+    """Return the parameters of a probed video stream that copied and re-encoded segments must share."""
+    sample_aspect_ratio = video_stream.get('sample_aspect_ratio')
+    return {
+        "codec": video_stream.get('codec_name'),
+        "profile": X264_PROFILES.get(video_stream.get('profile'), video_stream.get('profile')),
+        "level": video_stream.get('level'),
+        "width": video_stream.get('width'),
+        "height": video_stream.get('height'),
+        # Unset and 0:1 both mean square pixels to players
+        "sample_aspect_ratio": sample_aspect_ratio if sample_aspect_ratio not in (None, '0:1', 'N/A') else '1:1',
+        "pix_fmt": video_stream.get('pix_fmt')
+    }
+
+def plan_segments(event_ranges, keyframes, duration):
+    """Split [0, duration] into (start, end, encode) segments at keyframes.
+
+    Each event range is widened to the keyframes around it so that the
+    spans to re-encode are whole GOPs; everything between them can be
+    stream copied.
+    """
+    spans = []
+    for start, end in event_ranges:
+        if start >= duration:
+            break
+        index = bisect.bisect_right(keyframes, start) - 1
+        span_start = keyframes[index] if index > 0 else 0.0
+        index = bisect.bisect_left(keyframes, end)
+        span_end = keyframes[index] if index < len(keyframes) else duration
+        if spans and span_start - spans[-1][1] < CAPTION_SEGMENT_MIN_COPY_SECONDS:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], span_end))
+        else:
+            spans.append((span_start, span_end))
+
+    segments = []
+    position = 0.0
+    for start, end in spans:
+        if start > position:
+            segments.append((position, start, False))
+        segments.append((start, end, True))
+        position = end
+    if position < duration:
+        segments.append((position, duration, False))
+    return segments
+
+def plan_caption_render(video_path, ass_content, mode):
+    """Decide how to burn captions into a video.
+
+    Returns (segments, reason): segments is the plan_segments() list when
+    the video should be rendered in segments, or None to re-encode it
+    whole, with reason saying why.
+    """
+    probe = ffmpeg.probe(video_path)
+    video_stream = next((s for s in probe['streams'] if s['codec_type'] == 'video'), None)
+    if video_stream is None:
+        return None, "no video stream"
+    # Copied segments keep the source's codec parameters, so the re-encoded ones must be made to match them
+    params = video_parameters(video_stream)
+    if params['codec'] != 'h264' or params['pix_fmt'] != 'yuv420p':
+        return None, f"source is {params['codec']}/{params['pix_fmt']}, not H.264 4:2:0"
+    if params['profile'] not in X264_PROFILES.values() or not params['level'] or params['level'] <= 0:
+        return None, f"source H.264 profile {video_stream.get('profile')} level {params['level']} cannot be matched"
+
+    duration = float(probe['format']['duration'])
+    # Seeking and subtitle times are relative to the start of the file, packet times are not
+    start_time = float(probe['format'].get('start_time', 0))
+    keyframes = [time - start_time for time in keyframe_times(video_path)]
+    if not keyframes:
+        return None, "source has no IDR frames to cut at"
+    segments = plan_segments(subtitle_event_ranges(ass_content), keyframes, duration)
+    encoded = sum(end - start for start, end, encode in segments if encode)
+    coverage = encoded / duration if duration > 0 else 1.0
+    if mode == 'auto' and coverage > CAPTION_SEGMENT_MAX_COVERAGE:
+        return None, f"captions span {coverage:.0%} of the video"
+    return segments, f"captions span {coverage:.0%} of the video"
+
+def _run(cmd):
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{cmd[0]} exited with {result.returncode}: {result.stderr[-2000:]}")
+
+def render_caption_segments(video_path, subtitle_path, output_path, segments, profile, job_id):
+    """Burn subtitles into only the segments marked for encoding, copy the rest and join them.
+
+    The video stream is first split without re-encoding at the segment
+    boundaries, which are IDR frames, into MPEG-TS pieces (they carry codec
+    parameters in band, so re-encoded and copied pieces concatenate
+    cleanly). Only the pieces to encode are then decoded and re-encoded
+    with the source's profile, level and sample aspect ratio, and the
+    original audio is muxed back in untouched. Raises RuntimeError if a
+    re-encoded piece does not match the source, so the caller can render
+    the video whole instead. Returns a summary of the work.
+    """
+    source = video_parameters(ffmpeg.probe(video_path, select_streams='v:0')['streams'][0])
+    encoder_args = ['-profile:v', source['profile'], '-level:v', f"{source['level'] / 10:g}"]
+    sample_aspect_ratio = source['sample_aspect_ratio'].replace(':', '/')
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output_path)) as work_dir:
+        cmd = ['ffmpeg', '-y', '-i', video_path, '-map', '0:v:0', '-an', '-c', 'copy', '-f', 'segment', '-segment_format', 'mpegts', '-reset_timestamps', '1']
+        if len(segments) > 1:
+            # The segment muxer cuts at the first keyframe at or after each time; stay just below it
+            cmd += ['-segment_times', ','.join(f"{max(0.0, start - 0.001):.6f}" for start, _, _ in segments[1:])]
+        _run(cmd + [os.path.join(work_dir, 'copy%05d.ts')])
+        pieces = sorted(name for name in os.listdir(work_dir) if name.startswith('copy'))
+        if len(pieces) != len(segments):
+            raise RuntimeError(f"expected {len(segments)} pieces at the planned keyframes, got {len(pieces)}")
+
+        list_path = os.path.join(work_dir, 'segments.txt')
+        with open(list_path, 'w') as list_file:
+            for index, (piece, (start, end, encode)) in enumerate(zip(pieces, segments)):
+                piece_path = os.path.join(work_dir, piece)
+                if encode:
+                    encoded_path = os.path.join(work_dir, f"encoded{index:05d}.ts")
+                    # Shift frames to the original timeline so subtitle times line up, then back to zero
+                    _run([
+                        'ffmpeg', '-y', '-i', piece_path,
+                        '-vf', f"setpts=PTS+{start:.6f}/TB,subtitles='{subtitle_path}',setpts=PTS-STARTPTS,setsar={sample_aspect_ratio}",
+                        *profile.video_args(), *encoder_args, '-pix_fmt', 'yuv420p', '-f', 'mpegts', encoded_path
+                    ])
+                    encoded = video_parameters(ffmpeg.probe(encoded_path, select_streams='v:0')['streams'][0])
+                    if encoded != source:
+                        raise RuntimeError(f"re-encoded segment {index} has {encoded}, the source has {source}")
+                    piece_path = encoded_path
+                list_file.write(f"file '{piece_path}'\n")
+
+        _run([
+            'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', list_path, '-i', video_path,
+            '-map', '0:v:0', '-map', '1:a:0?', '-c', 'copy', '-movflags', '+faststart', output_path
+        ])
+
+    encoded = [end - start for start, end, encode in segments if encode]
+    copied = [end - start for start, end, encode in segments if not encode]
+    logger.info(f"Job {job_id}: Re-encoded {len(encoded)} segments ({sum(encoded):.1f}s) and copied {len(copied)} ({sum(copied):.1f}s)")
+    return {
+        "encoded_segments": len(encoded),
+        "encoded_seconds": round(sum(encoded), 3),
+        "copied_segments": len(copied),
+        "copied_seconds": round(sum(copied), 3)
+    }
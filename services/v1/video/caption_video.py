@@ -1,12 +1,18 @@
 import os
+import time
 import ffmpeg
 import logging
 import subprocess
-import whisper
 from datetime import timedelta
 import srt
 import re
+import numpy as np
 from services.file_management import download_file
+from services.transcription_engine import transcribe_media_file
+from services.font_catalog import find_font, list_font_families
+from services.encoding_profiles import get_profile, encoding_report
+from services.v1.video.caption_segments import CAPTION_RENDER_MODE, plan_caption_render, render_caption_segments
+from services.ass_events import word_columns, make_text_transform, segment_ranges, line_ranges, moving_highlight, dialogue_events
 from services.cloud_storage import upload_file  # Ensure this import is present
 import requests  # Ensure requests is imported for webhook handling
 from urllib.parse import urlparse
@@ -45,16 +51,15 @@ def rgb_to_ass_color(rgb_color):
             return f"&H00{b:02X}{g:02X}{r:02X}"
     return "&H00FFFFFF"
 
-def generate_transcription(video_path, language='auto'):
+def generate_transcription(video_path, language='auto', model_size=None, backend=None, vad=None):
     try:
-        model = whisper.load_model("base")
         transcription_options = {
             'word_timestamps': True,
             'verbose': True,
         }
         if language != 'auto':
             transcription_options['language'] = language
-        result = model.transcribe(video_path, **transcription_options)
+        result = transcribe_media_file(video_path, model_size, backend=backend, vad=vad, **transcription_options)
         logger.info(f"Transcription generated successfully for video: {video_path}")
         return result
     except Exception as e:
@@ -78,23 +83,8 @@ def get_video_resolution(video_path):
         return 384, 288
 
 def get_available_fonts():
-    """Get the list of available fonts on the system."""
-    try:
-        import matplotlib.font_manager as fm
-    except ImportError:
-        logger.error("matplotlib not installed. Install via 'pip install matplotlib'.")
-        return []
-    font_list = fm.findSystemFonts(fontpaths=None, fontext='ttf')
-    font_names = set()
-    for font in font_list:
-        try:
-            font_prop = fm.FontProperties(fname=font)
-            font_name = font_prop.get_name()
-            font_names.add(font_name)
-        except Exception:
-            continue
-    logger.info(f"Available fonts retrieved: {font_names}")
-    return list(font_names)
+    """Get the list of available font families on the system."""
+    return list_font_families()
 
 def format_ass_time(seconds):
     """Convert float seconds to ASS time format H:MM:SS.cc"""
@@ -231,10 +221,11 @@ def create_style_line(style_options, video_resolution):
     Create the style line for ASS subtitles.
     """
     font_family = style_options.get('font_family', 'Arial')
-    available_fonts = get_available_fonts()
-    if font_family not in available_fonts:
+    font = find_font(font_family)
+    if font is None or font.family is None:
         logger.warning(f"Font '{font_family}' not found.")
-        return {'error': f"Font '{font_family}' not available.", 'available_fonts': available_fonts}
+        return {'error': f"Font '{font_family}' not available.", 'available_fonts': get_available_fonts()}
+    font_family = font.family
 
     line_color = rgb_to_ass_color(style_options.get('line_color', '#FFFFFF'))
     secondary_color = line_color
@@ -351,44 +342,23 @@ def handle_karaoke(transcription_result, style_options, replace_dict, video_reso
 
     logger.info(f"[Karaoke] position={position_str}, alignment={alignment_str}, x={final_x}, y={final_y}, an_code={an_code}")
 
-    events = []
-    for segment in transcription_result['segments']:
-        words = segment.get('words', [])
-        if not words:
-            continue
-
-        if max_words_per_line > 0:
-            lines_content = []
-            current_line = []
-            current_line_words = 0
-            for w_info in words:
-                w = process_subtitle_text(w_info.get('word', ''), replace_dict, all_caps, 0)
-                duration_cs = int(round((w_info['end'] - w_info['start']) * 100))
-                highlighted_word = f"{{\\k{duration_cs}}}{w} "
-                current_line.append(highlighted_word)
-                current_line_words += 1
-                if current_line_words >= max_words_per_line:
-                    lines_content.append(''.join(current_line).strip())
-                    current_line = []
-                    current_line_words = 0
-            if current_line:
-                lines_content.append(''.join(current_line).strip())
-        else:
-            line_content = []
-            for w_info in words:
-                w = process_subtitle_text(w_info.get('word', ''), replace_dict, all_caps, 0)
-                duration_cs = int(round((w_info['end'] - w_info['start']) * 100))
-                highlighted_word = f"{{\\k{duration_cs}}}{w} "
-                line_content.append(highlighted_word)
-            lines_content = [''.join(line_content).strip()]
-
-        dialogue_text = '\\N'.join(lines_content)
-        start_time = format_ass_time(words[0]['start'])
-        end_time = format_ass_time(words[-1]['end'])
-        position_tag = f"{{\\an{an_code}\\pos({final_x},{final_y})}}"
-        events.append(f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{position_tag}{{\\c{word_color}}}{dialogue_text}")
-    logger.info(f"Handled {len(events)} dialogues in karaoke style.")
-    return "\n".join(events)
+    columns = word_columns(transcription_result['segments'], make_text_transform(replace_dict, all_caps))
+    durations = np.round((columns.ends - columns.starts) * 100).astype(np.int64).tolist()
+    pieces = [f"{{\\k{duration_cs}}}{w} " for duration_cs, w in zip(durations, columns.texts)]
+
+    starts = []
+    ends = []
+    texts = []
+    for start, end in segment_ranges(columns.segment_ids):
+        step = max_words_per_line if max_words_per_line > 0 else end - start
+        texts.append('\\N'.join(''.join(pieces[i:min(i + step, end)]).strip() for i in range(start, end, step)))
+        starts.append(columns.starts[start])
+        ends.append(columns.ends[end - 1])
+
+    position_tag = f"{{\\an{an_code}\\pos({final_x},{final_y})}}"
+    events = dialogue_events(starts, ends, texts, f"{position_tag}{{\\c{word_color}}}")
+    logger.info(f"Handled {len(texts)} dialogues in karaoke style.")
+    return events
 
 def handle_highlight(transcription_result, style_options, replace_dict, video_resolution):
     """
@@ -412,43 +382,18 @@ def handle_highlight(transcription_result, style_options, replace_dict, video_re
 
     word_color = rgb_to_ass_color(style_options.get('word_color', '#FFFF00'))
     line_color = rgb_to_ass_color(style_options.get('line_color', '#FFFFFF'))
-    events = []
 
     logger.info(f"[Highlight] position={position_str}, alignment={alignment_str}, x={final_x}, y={final_y}, an_code={an_code}")
 
-    for segment in transcription_result['segments']:
-        words = segment.get('words', [])
-        if not words:
-            continue
-        processed_words = []
-        for w_info in words:
-            w = process_subtitle_text(w_info.get('word', ''), replace_dict, all_caps, 0)
-            if w:
-                processed_words.append((w, w_info['start'], w_info['end']))
-
-        if not processed_words:
-            continue
-
-        if max_words_per_line > 0:
-            line_sets = [processed_words[i:i+max_words_per_line] for i in range(0, len(processed_words), max_words_per_line)]
-        else:
-            line_sets = [processed_words]
-
-        for line_set in line_sets:
-            for idx, (word, w_start, w_end) in enumerate(line_set):
-                line_words = []
-                for w_idx, (w_text, _, _) in enumerate(line_set):
-                    if w_idx == idx:
-                        line_words.append(f"{{\\c{word_color}}}{w_text}{{\\c{line_color}}}")
-                    else:
-                        line_words.append(w_text)
-                full_text = ' '.join(line_words)
-                start_time = format_ass_time(w_start)
-                end_time = format_ass_time(w_end)
-                position_tag = f"{{\\an{an_code}\\pos({final_x},{final_y})}}"
-                events.append(f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{position_tag}{{\\c{line_color}}}{full_text}")
-    logger.info(f"Handled {len(events)} dialogues in highlight style.")
-    return "\n".join(events)
+    columns = word_columns(transcription_result['segments'], make_text_transform(replace_dict, all_caps), drop_empty=True)
+    texts = []
+    for start, end in line_ranges(columns.segment_ids, max_words_per_line):
+        texts.extend(moving_highlight(columns.texts[start:end], f"{{\\c{word_color}}}", f"{{\\c{line_color}}}"))
+
+    position_tag = f"{{\\an{an_code}\\pos({final_x},{final_y})}}"
+    events = dialogue_events(columns.starts, columns.ends, texts, f"{position_tag}{{\\c{line_color}}}")
+    logger.info(f"Handled {len(texts)} dialogues in highlight style.")
+    return events
 
 def handle_underline(transcription_result, style_options, replace_dict, video_resolution):
     """
@@ -470,43 +415,18 @@ def handle_underline(transcription_result, style_options, replace_dict, video_re
         video_height=video_resolution[1]
     )
     line_color = rgb_to_ass_color(style_options.get('line_color', '#FFFFFF'))
-    events = []
 
     logger.info(f"[Underline] position={position_str}, alignment={alignment_str}, x={final_x}, y={final_y}, an_code={an_code}")
 
-    for segment in transcription_result['segments']:
-        words = segment.get('words', [])
-        if not words:
-            continue
-        processed_words = []
-        for w_info in words:
-            w = process_subtitle_text(w_info.get('word', ''), replace_dict, all_caps, 0)
-            if w:
-                processed_words.append((w, w_info['start'], w_info['end']))
-
-        if not processed_words:
-            continue
-
-        if max_words_per_line > 0:
-            line_sets = [processed_words[i:i+max_words_per_line] for i in range(0, len(processed_words), max_words_per_line)]
-        else:
-            line_sets = [processed_words]
-
-        for line_set in line_sets:
-            for idx, (word, w_start, w_end) in enumerate(line_set):
-                line_words = []
-                for w_idx, (w_text, _, _) in enumerate(line_set):
-                    if w_idx == idx:
-                        line_words.append(f"{{\\u1}}{w_text}{{\\u0}}")
-                    else:
-                        line_words.append(w_text)
-                full_text = ' '.join(line_words)
-                start_time = format_ass_time(w_start)
-                end_time = format_ass_time(w_end)
-                position_tag = f"{{\\an{an_code}\\pos({final_x},{final_y})}}"
-                events.append(f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{position_tag}{{\\c{line_color}}}{full_text}")
-    logger.info(f"Handled {len(events)} dialogues in underline style.")
-    return "\n".join(events)
+    columns = word_columns(transcription_result['segments'], make_text_transform(replace_dict, all_caps), drop_empty=True)
+    texts = []
+    for start, end in line_ranges(columns.segment_ids, max_words_per_line):
+        texts.extend(moving_highlight(columns.texts[start:end], "{\\u1}", "{\\u0}"))
+
+    position_tag = f"{{\\an{an_code}\\pos({final_x},{final_y})}}"
+    events = dialogue_events(columns.starts, columns.ends, texts, f"{position_tag}{{\\c{line_color}}}")
+    logger.info(f"Handled {len(texts)} dialogues in underline style.")
+    return events
 
 def handle_word_by_word(transcription_result, style_options, replace_dict, video_resolution):
     """
@@ -528,31 +448,15 @@ def handle_word_by_word(transcription_result, style_options, replace_dict, video
         video_height=video_resolution[1]
     )
     word_color = rgb_to_ass_color(style_options.get('word_color', '#FFFF00'))
-    events = []
 
     logger.info(f"[Word-by-Word] position={position_str}, alignment={alignment_str}, x={final_x}, y={final_y}, an_code={an_code}")
 
-    for segment in transcription_result['segments']:
-        words = segment.get('words', [])
-        if not words:
-            continue
-
-        if max_words_per_line > 0:
-            grouped_words = [words[i:i+max_words_per_line] for i in range(0, len(words), max_words_per_line)]
-        else:
-            grouped_words = [words]
-
-        for word_group in grouped_words:
-            for w_info in word_group:
-                w = process_subtitle_text(w_info.get('word', ''), replace_dict, all_caps, 0)
-                if not w:
-                    continue
-                start_time = format_ass_time(w_info['start'])
-                end_time = format_ass_time(w_info['end'])
-                position_tag = f"{{\\an{an_code}\\pos({final_x},{final_y})}}"
-                events.append(f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{position_tag}{{\\c{word_color}}}{w}")
-    logger.info(f"Handled {len(events)} dialogues in word-by-word style.")
-    return "\n".join(events)
+    # Line grouping does not change the output here: every word is its own event
+    columns = word_columns(transcription_result['segments'], make_text_transform(replace_dict, all_caps), drop_empty=True)
+    position_tag = f"{{\\an{an_code}\\pos({final_x},{final_y})}}"
+    events = dialogue_events(columns.starts, columns.ends, columns.texts, f"{position_tag}{{\\c{word_color}}}")
+    logger.info(f"Handled {len(columns)} dialogues in word-by-word style.")
+    return events
 
 STYLE_HANDLERS = {
     'classic': handle_classic,
@@ -612,11 +516,20 @@ def process_subtitle_events(transcription_result, style_type, settings, replace_
     """
     return srt_to_ass(transcription_result, style_type, settings, replace_dict, video_resolution)
 
-def process_captioning_v1(video_url, captions, settings, replace, job_id, language='auto'):
+def process_captioning_v1(video_url, captions, settings, replace, job_id, language='auto', model_size=None, backend=None, vad=None, encoding_profile=None, render_mode=None):
     """
     Captioning process with transcription fallback and multiple styles.
     Integrates with the updated logic for positioning and alignment.
+    Returns (output_path, language, encoding), language being the transcription
+    language or None when captions were supplied, and encoding the
+    encoding_report of the burn-in.
+
+    render_mode 'segments' re-encodes only the keyframe-aligned parts of
+    the video that show captions and stream copies the rest; 'auto' does
+    so when captions cover a small part of the video; 'full' re-encodes
+    everything.
     """
+    detected_language = None
     try:
         if not isinstance(settings, dict):
             logger.error(f"Job {job_id}: 'settings' should be a dictionary.")
@@ -644,13 +557,15 @@ def process_captioning_v1(video_url, captions, settings, replace, job_id, langua
 
         # Check font availability
         font_family = style_options.get('font_family', 'Arial')
-        available_fonts = get_available_fonts()
-        if font_family not in available_fonts:
+        font = find_font(font_family)
+        if font is None or font.family is None:
             logger.warning(f"Job {job_id}: Font '{font_family}' not found.")
             # Return font error with available_fonts
-            return {"error": f"Font '{font_family}' not available.", "available_fonts": available_fonts}
+            return {"error": f"Font '{font_family}' not available.", "available_fonts": get_available_fonts()}
 
-        logger.info(f"Job {job_id}: Font '{font_family}' is available.")
+        # Family names are matched case-insensitively; use the font's own spelling
+        style_options['font_family'] = font.family
+        logger.info(f"Job {job_id}: Font '{font.family}' is available.")
 
         # Determine if captions is a URL or raw content
         if captions and is_url(captions):
@@ -706,7 +621,8 @@ def process_captioning_v1(video_url, captions, settings, replace, job_id, langua
         else:
             # No captions provided, generate transcription
             logger.info(f"Job {job_id}: No captions provided, generating transcription.")
-            transcription_result = generate_transcription(video_path, language=language)
+            transcription_result = generate_transcription(video_path, language=language, model_size=model_size, backend=backend, vad=vad)
+            detected_language = transcription_result.get('language')
             # Generate ASS based on chosen style
             subtitle_content = process_subtitle_events(transcription_result, style_type, style_options, replace_dict, video_resolution)
             subtitle_type = 'ass'
@@ -736,19 +652,44 @@ def process_captioning_v1(video_url, captions, settings, replace, job_id, langua
         output_path = os.path.join(STORAGE_PATH, output_filename)
 
         # Process video with subtitles using FFmpeg
-        try:
-            ffmpeg.input(video_path).output(
-                output_path,
-                vf=f"subtitles='{subtitle_path}'",
-                acodec='copy'
-            ).run(overwrite_output=True)
-            logger.info(f"Job {job_id}: FFmpeg processing completed. Output saved to {output_path}")
-        except ffmpeg.Error as e:
-            stderr_output = e.stderr.decode('utf8') if e.stderr else 'Unknown error'
-            logger.error(f"Job {job_id}: FFmpeg error: {stderr_output}")
-            return {"error": f"FFmpeg error: {stderr_output}"}
-
-        return output_path
+        profile = get_profile(encoding_profile)
+        render_mode = render_mode or CAPTION_RENDER_MODE
+        segments = None
+        if render_mode != 'full':
+            try:
+                segments, reason = plan_caption_render(video_path, subtitle_content, render_mode)
+                logger.info(f"Job {job_id}: {'Rendering captions in segments' if segments is not None else 'Re-encoding the whole video'}: {reason}")
+            except Exception as e:
+                logger.warning(f"Job {job_id}: Could not plan segmented rendering, re-encoding the whole video: {str(e)}")
+
+        render_summary = {}
+        if segments is not None:
+            try:
+                encode_start = time.time()
+                render_summary = render_caption_segments(video_path, subtitle_path, output_path, segments, profile, job_id)
+            except Exception as e:
+                logger.warning(f"Job {job_id}: Segmented rendering failed, re-encoding the whole video: {str(e)}")
+                segments = None
+
+        if segments is None:
+            try:
+                encode_start = time.time()
+                ffmpeg.input(video_path).output(
+                    output_path,
+                    vf=f"subtitles='{subtitle_path}'",
+                    acodec='copy',
+                    **profile.video_options()
+                ).run(overwrite_output=True)
+            except ffmpeg.Error as e:
+                stderr_output = e.stderr.decode('utf8') if e.stderr else 'Unknown error'
+                logger.error(f"Job {job_id}: FFmpeg error: {stderr_output}")
+                return {"error": f"FFmpeg error: {stderr_output}"}
+
+        encoding = encoding_report(profile, output_path, time.time() - encode_start)
+        encoding.update(render_mode='segments' if segments is not None else 'full', **render_summary)
+        logger.info(f"Job {job_id}: FFmpeg processing completed with the {profile.name} profile in {encoding['encode_seconds']}s. Output saved to {output_path}")
+
+        return output_path, detected_language, encoding
 
     except Exception as e:
         logger.error(f"Job {job_id}: Error in process_captioning_v1: {str(e)}", exc_info=True)
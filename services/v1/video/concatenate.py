@@ -1,23 +1,26 @@
 import os
 import ffmpeg
 import requests
-from services.file_management import download_file
+from services.file_management import download_files_concurrently
 
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
 
 def process_video_concatenate(media_urls, job_id, webhook_url=None):
-    """Combine multiple videos into one."""
+    """Combine multiple videos into one.
+
+    Returns the output path and the download timings of each input.
+    """
     input_files = []
     output_filename = f"{job_id}.mp4"
     output_path = os.path.join(STORAGE_PATH, output_filename)
 
     try:
-        # Download all media files
-        for i, media_item in enumerate(media_urls):
-            url = media_item['video_url']
-            input_filename = download_file(url, os.path.join(STORAGE_PATH, f"{job_id}_input_{i}"))
-            input_files.append(input_filename)
+        # Download all media files in parallel
+        input_files, download_timings = download_files_concurrently([
+            (media_item['video_url'], os.path.join(STORAGE_PATH, f"{job_id}_input_{i}"))
+            for i, media_item in enumerate(media_urls)
+        ])
 
         # Generate an absolute path concat list file for FFmpeg
         concat_file_path = os.path.join(STORAGE_PATH, f"{job_id}_concat_list.txt")
@@ -45,7 +48,7 @@ def process_video_concatenate(media_urls, job_id, webhook_url=None):
         if not os.path.exists(output_path):
             raise FileNotFoundError(f"Output file {output_path} does not exist after combination.")
 
-        return output_path
+        return output_path, download_timings
     except Exception as e:
         print(f"Video combination failed: {str(e)}")
         raise 
\ No newline at end of file
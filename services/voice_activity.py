@@ -0,0 +1,79 @@
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Run a voice activity pre-pass so Whisper only decodes regions that contain speech
+VAD_ENABLED = os.environ.get('VAD_ENABLED', 'false').lower() == 'true'
+# How far above the recording's noise floor a frame must be to count as speech
+VAD_THRESHOLD_DB = float(os.environ.get('VAD_THRESHOLD_DB', 12))
+# Fraction of a frame's energy that must fall in the voice band (300-3400 Hz)
+VAD_SPEECH_BAND_RATIO = float(os.environ.get('VAD_SPEECH_BAND_RATIO', 0.5))
+# Context kept around each speech region so word onsets and endings are not cut
+VAD_PAD_SECONDS = float(os.environ.get('VAD_PAD_SECONDS', 0.3))
+# Speech regions closer than this are merged into one
+VAD_MIN_GAP_SECONDS = float(os.environ.get('VAD_MIN_GAP_SECONDS', 1.0))
+# Shorter regions are treated as noise
+VAD_MIN_SPEECH_SECONDS = float(os.environ.get('VAD_MIN_SPEECH_SECONDS', 0.25))
+FRAME_SECONDS = 0.03
+# Frames analysed per FFT batch, bounding memory use on long recordings
+BLOCK_FRAMES = 8192
+
+def frame_features(audio):
+    """Return per-frame energy in dB and the fraction of it in the voice band."""
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    count = len(audio) // frame
+    frequencies = np.fft.rfftfreq(frame, 1 / SAMPLE_RATE)
+    voice_band = (frequencies >= 300) & (frequencies <= 3400)
+    window = np.hanning(frame).astype(np.float32)
+
+    energy_db = np.empty(count, dtype=np.float32)
+    band_ratio = np.empty(count, dtype=np.float32)
+    for start in range(0, count, BLOCK_FRAMES):
+        end = min(count, start + BLOCK_FRAMES)
+        frames = np.asarray(audio[start * frame:end * frame], dtype=np.float32).reshape(-1, frame)
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+        total = power.sum(axis=1) + 1e-10
+        energy_db[start:end] = 10 * np.log10(total)
+        band_ratio[start:end] = power[:, voice_band].sum(axis=1) / total
+    return energy_db, band_ratio
+
+def detect_speech(audio):
+    """Return [(start, end), ...] in seconds for the regions of audio that likely contain speech.
+
+    A frame is speech when it is VAD_THRESHOLD_DB above the noise floor (the
+    10th percentile of frame energy) and most of its energy is in the voice
+    band. Regions are padded, nearby regions merged and very short ones dropped.
+    """
+    energy_db, band_ratio = frame_features(audio)
+    if not len(energy_db):
+        return []
+    noise_floor = np.percentile(energy_db, 10)
+    speech = (energy_db > noise_floor + VAD_THRESHOLD_DB) & (band_ratio >= VAD_SPEECH_BAND_RATIO)
+
+    # Edges of runs of speech frames
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    duration = len(audio) / SAMPLE_RATE
+    regions = []
+    for start_frame, end_frame in zip(edges[::2], edges[1::2]):
+        start = max(0.0, start_frame * FRAME_SECONDS - VAD_PAD_SECONDS)
+        end = min(duration, end_frame * FRAME_SECONDS + VAD_PAD_SECONDS)
+        if regions and start - regions[-1][1] < VAD_MIN_GAP_SECONDS:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return [(round(float(start), 3), round(float(end), 3)) for start, end in regions if end - start >= VAD_MIN_SPEECH_SECONDS]
+
+def clip_timestamps(regions, start=0.0, end=None):
+    """Flatten the speech regions overlapping [start, end) into Whisper's clip_timestamps, relative to start."""
+    clips = []
+    for region_start, region_end in regions:
+        if end is not None and region_start >= end:
+            break
+        if region_end <= start:
+            continue
+        clips.append(round(max(region_start, start) - start, 3))
+        clips.append(round((min(region_end, end) if end is not None else region_end) - start, 3))
+    return clips
@@ -1,14 +1,257 @@
-import requests
+import os
+import json
+import time
+import random
 import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from services.sqlite_store import get_connection, owner_is_alive
 
 logger = logging.getLogger(__name__)
 
+WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT', 30))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 8))
+WEBHOOK_RETRY_BASE_DELAY = float(os.environ.get('WEBHOOK_RETRY_BASE_DELAY', 2))
+WEBHOOK_RETRY_MAX_DELAY = float(os.environ.get('WEBHOOK_RETRY_MAX_DELAY', 600))
+WEBHOOK_DISPATCHER_THREADS = int(os.environ.get('WEBHOOK_DISPATCHER_THREADS', 4))
+# Undeliverable webhooks are kept for inspection this many seconds after their last attempt
+WEBHOOK_FAILED_RETENTION = float(os.environ.get('WEBHOOK_FAILED_RETENTION', 7 * 24 * 3600))
+WEBHOOK_POLL_INTERVAL = 1.0
+# How often each worker removes undeliverable webhooks past their retention
+WEBHOOK_PURGE_INTERVAL = 3600
+
+# Client errors other than these will not succeed on retry
+RETRYABLE_CLIENT_ERRORS = {408, 425, 429}
+
+_session = None
+_initialized_pid = None
+_dispatcher_pid = None
+_dispatcher_lock = threading.Lock()
+_new_delivery = threading.Condition()
+_last_purge = 0
+
+def get_session():
+    """Return the pooled HTTP session shared by the dispatcher threads of this process."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=WEBHOOK_DISPATCHER_THREADS, pool_maxsize=WEBHOOK_DISPATCHER_THREADS)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
+def _connection():
+    global _initialized_pid
+    conn = get_connection()
+    if _initialized_pid != os.getpid():
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS webhook_outbox (
+                delivery_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                claimed_at REAL,
+                owner_pid INTEGER,
+                last_error TEXT,
+                job_id TEXT,
+                partial INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Outboxes created before per-job ordering lack the job columns
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(webhook_outbox)")}
+        for column, definition in (('job_id', "TEXT"), ('partial', "INTEGER NOT NULL DEFAULT 0")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE webhook_outbox ADD COLUMN {column} {definition}")
+        conn.execute("CREATE INDEX IF NOT EXISTS webhook_outbox_due ON webhook_outbox (status, next_attempt_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS webhook_outbox_job ON webhook_outbox (job_id, delivery_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS webhook_stats (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+        _initialized_pid = os.getpid()
+    return conn
+
+def _increment_stat(conn, name, amount=1):
+    conn.execute(
+        "INSERT INTO webhook_stats (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount)
+    )
+
 def send_webhook(webhook_url, data):
-    """Send a POST request to a webhook URL with the provided data."""
+    """Queue a POST of data to webhook_url for background delivery.
+
+    The payload is written to a persistent outbox before this returns, so
+    job workers never wait on the receiver, and undelivered results survive
+    restarts. Delivery is retried with exponential backoff. Webhooks of the
+    same job_id are delivered one at a time in the order they were queued,
+    and queuing a job's final webhook (one without "partial": true) drops
+    its partial webhooks that have not been sent yet.
+    """
+    if not webhook_url:
+        return
     try:
-        logger.info(f"Attempting to send webhook to {webhook_url} with data: {data}")
-        response = requests.post(webhook_url, json=data)
-        response.raise_for_status()
-        logger.info(f"Webhook sent: {data}")
+        now = time.time()
+        job_id = data.get('job_id')
+        partial = bool(data.get('partial'))
+        conn = _connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if job_id is not None and not partial:
+                # The final result supersedes progress the receiver has not seen yet
+                superseded = conn.execute(
+                    "DELETE FROM webhook_outbox WHERE job_id = ? AND partial = 1 AND status = 'pending'", (job_id,)
+                ).rowcount
+                if superseded:
+                    logger.info(f"Dropped {superseded} pending partial webhook(s) for job {job_id}")
+            conn.execute(
+                "INSERT INTO webhook_outbox (url, payload, created_at, next_attempt_at, job_id, partial) VALUES (?, ?, ?, ?, ?, ?)",
+                (webhook_url, json.dumps(data, default=str), now, now, job_id, int(partial))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Queued webhook to {webhook_url} for job {data.get('job_id')}")
+    except Exception as e:
+        logger.error(f"Failed to queue webhook to {webhook_url}: {e}")
+        return
+    start_dispatcher()
+    with _new_delivery:
+        _new_delivery.notify()
+
+def start_dispatcher():
+    """Start the webhook dispatcher threads for this process if they are not running yet."""
+    global _dispatcher_pid
+    with _dispatcher_lock:
+        if _dispatcher_pid == os.getpid():
+            return
+        _dispatcher_pid = os.getpid()
+        for i in range(WEBHOOK_DISPATCHER_THREADS):
+            threading.Thread(target=_dispatch_loop, name=f"webhook-dispatcher-{i}", daemon=True).start()
+        logger.info(f"Started {WEBHOOK_DISPATCHER_THREADS} webhook dispatcher thread(s)")
+
+def _dispatch_loop():
+    global _last_purge
+    while True:
+        try:
+            if time.time() - _last_purge > WEBHOOK_PURGE_INTERVAL:
+                _last_purge = time.time()
+                purge_failed_deliveries()
+            delivery = _claim_delivery()
+            if delivery is None:
+                with _new_delivery:
+                    _new_delivery.wait(WEBHOOK_POLL_INTERVAL)
+                continue
+            _deliver(delivery)
+        except Exception as e:
+            logger.error(f"Webhook dispatcher error: {e}", exc_info=True)
+            time.sleep(WEBHOOK_POLL_INTERVAL)
+
+def _claim_delivery():
+    conn = _connection()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Deliveries claimed by a process that died mid-send are due again
+        for row in conn.execute("SELECT delivery_id, owner_pid, claimed_at FROM webhook_outbox WHERE status = 'sending'").fetchall():
+            if not owner_is_alive(row['owner_pid'], row['claimed_at']):
+                conn.execute("UPDATE webhook_outbox SET status = 'pending' WHERE delivery_id = ?", (row['delivery_id'],))
+
+        # Only the oldest undelivered webhook of each job is eligible, so a job's webhooks arrive in order
+        row = conn.execute(
+            """
+            SELECT * FROM webhook_outbox AS delivery
+            WHERE status = 'pending' AND next_attempt_at <= ? AND (
+                job_id IS NULL OR NOT EXISTS (
+                    SELECT 1 FROM webhook_outbox AS earlier
+                    WHERE earlier.job_id = delivery.job_id AND earlier.delivery_id < delivery.delivery_id
+                    AND earlier.status IN ('pending', 'sending')
+                )
+            )
+            ORDER BY next_attempt_at LIMIT 1
+            """,
+            (now,)
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE webhook_outbox SET status = 'sending', claimed_at = ?, owner_pid = ? WHERE delivery_id = ?",
+                (now, os.getpid(), row['delivery_id'])
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return dict(row) if row is not None else None
+
+def _deliver(delivery):
+    conn = _connection()
+    attempts = delivery['attempts'] + 1
+    start_time = time.time()
+    error = None
+    retryable = True
+    try:
+        response = get_session().post(
+            delivery['url'],
+            data=delivery['payload'],
+            headers={'Content-Type': 'application/json'},
+            timeout=WEBHOOK_TIMEOUT
+        )
+        if response.status_code < 400:
+            latency = time.time() - start_time
+            conn.execute("DELETE FROM webhook_outbox WHERE delivery_id = ?", (delivery['delivery_id'],))
+            _increment_stat(conn, 'delivered')
+            _increment_stat(conn, 'delivery_seconds', latency)
+            logger.info(f"Webhook sent to {delivery['url']} after {attempts} attempt(s) in {latency:.3f}s")
+            return
+        error = f"HTTP {response.status_code}"
+        retryable = response.status_code >= 500 or response.status_code in RETRYABLE_CLIENT_ERRORS
     except requests.RequestException as e:
-        logger.error(f"Webhook failed: {e}")
\ No newline at end of file
+        error = str(e)
+
+    if retryable and attempts < WEBHOOK_MAX_ATTEMPTS:
+        delay = min(WEBHOOK_RETRY_MAX_DELAY, WEBHOOK_RETRY_BASE_DELAY * (2 ** (attempts - 1)))
+        delay *= random.uniform(0.8, 1.2)
+        conn.execute(
+            "UPDATE webhook_outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? WHERE delivery_id = ?",
+            (attempts, time.time() + delay, error, delivery['delivery_id'])
+        )
+        _increment_stat(conn, 'retried')
+        logger.warning(f"Webhook to {delivery['url']} failed ({error}), retrying in {delay:.1f}s")
+    else:
+        # Keep the payload in the outbox so it can be inspected or replayed
+        conn.execute(
+            "UPDATE webhook_outbox SET status = 'failed', attempts = ?, last_error = ? WHERE delivery_id = ?",
+            (attempts, error, delivery['delivery_id'])
+        )
+        _increment_stat(conn, 'failed')
+        logger.error(f"Webhook failed: giving up on {delivery['url']} after {attempts} attempt(s): {error}")
+
+def purge_failed_deliveries(retention=None):
+    """Delete undeliverable webhooks whose last attempt is older than retention seconds (default: WEBHOOK_FAILED_RETENTION)."""
+    retention = WEBHOOK_FAILED_RETENTION if retention is None else retention
+    purged = _connection().execute(
+        "DELETE FROM webhook_outbox WHERE status = 'failed' AND COALESCE(claimed_at, created_at) < ?",
+        (time.time() - retention,)
+    ).rowcount
+    if purged:
+        logger.info(f"Purged {purged} undeliverable webhook(s) older than {retention:.0f}s")
+    return purged
+
+def get_webhook_metrics():
+    """Return host-wide webhook delivery counters and the current outbox state."""
+    conn = _connection()
+    stats = {row['name']: row['value'] for row in conn.execute("SELECT name, value FROM webhook_stats")}
+    outbox = {row['status']: row['count'] for row in conn.execute("SELECT status, COUNT(*) AS count FROM webhook_outbox GROUP BY status")}
+    oldest = conn.execute("SELECT MIN(created_at) FROM webhook_outbox WHERE status != 'failed'").fetchone()[0]
+    delivered = int(stats.get('delivered', 0))
+    return {
+        "delivered": delivered,
+        "retried": int(stats.get('retried', 0)),
+        "failed": int(stats.get('failed', 0)),
+        "average_delivery_time": round(stats.get('delivery_seconds', 0) / delivered, 3) if delivered else None,
+        "pending": outbox.get('pending', 0) + outbox.get('sending', 0),
+        "undeliverable": outbox.get('failed', 0),
+        "oldest_pending_age": round(time.time() - oldest, 3) if oldest else None
+    }
@@ -0,0 +1,139 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from services.transcription_backends import get_backend, resolve_backend
+
+logger = logging.getLogger(__name__)
+
+# Model used when a request does not choose one
+WHISPER_MODEL = os.environ.get('WHISPER_MODEL', 'base')
+# Comma separated model sizes loaded when the worker starts instead of on first use
+WHISPER_PRELOAD_MODELS = [size.strip() for size in os.environ.get('WHISPER_PRELOAD_MODELS', '').split(',') if size.strip()]
+# Every size whisper provides (whisper.available_models()), listed here so workers need not import torch to validate requests
+WHISPER_MODEL_SIZES = [
+    'tiny.en', 'tiny', 'base.en', 'base', 'small.en', 'small', 'medium.en', 'medium',
+    'large-v1', 'large-v2', 'large-v3', 'large', 'large-v3-turbo', 'turbo'
+]
+# Model sizes requests may choose from; defaults to every size whisper provides
+WHISPER_ALLOWED_MODELS = [
+    size.strip() for size in os.environ.get('WHISPER_ALLOWED_MODELS', ','.join(WHISPER_MODEL_SIZES)).split(',') if size.strip()
+]
+# Upper bound on distinct model sizes kept in memory; the least recently used one is unloaded beyond it
+WHISPER_MAX_LOADED_MODELS = int(os.environ.get('WHISPER_MAX_LOADED_MODELS', 2))
+# Instances of one size that may be in use at the same time (whisper models are not safe to share between threads)
+WHISPER_INSTANCES_PER_MODEL = int(os.environ.get('WHISPER_INSTANCES_PER_MODEL', os.environ.get('CPU_POOL_WORKERS', 1)))
+
+class ModelPool:
+    """Resident instances of one whisper model size on one backend."""
+
+    def __init__(self, size, backend):
+        self.size = size
+        self.backend = backend
+        self.idle = []
+        self.in_use = 0
+        self.instances = 0
+        self.load_seconds = None
+        self.last_used = time.time()
+
+_pools = OrderedDict()
+_condition = threading.Condition()
+
+def resolve_model_size(size=None):
+    size = size or WHISPER_MODEL
+    if size not in WHISPER_ALLOWED_MODELS:
+        raise ValueError(f"Whisper model '{size}' is not available. Choose one of: {', '.join(WHISPER_ALLOWED_MODELS)}")
+    return size
+
+def _load(size, backend):
+    start_time = time.time()
+    model = get_backend(backend).load(size)
+    elapsed = time.time() - start_time
+    logger.info(f"Loaded Whisper {size} model on the {backend} backend in {elapsed:.2f}s")
+    return model, elapsed
+
+def _unload_idle_pools():
+    """Drop the least recently used pools beyond WHISPER_MAX_LOADED_MODELS. Caller holds _condition."""
+    loaded = [pool for pool in _pools.values() if pool.instances]
+    excess = len(loaded) - WHISPER_MAX_LOADED_MODELS
+    for pool in loaded:
+        if excess <= 0:
+            break
+        if pool.in_use == 0 and pool.size not in WHISPER_PRELOAD_MODELS:
+            logger.info(f"Unloading Whisper {pool.size} model from the {pool.backend} backend")
+            pool.idle.clear()
+            pool.instances = 0
+            excess -= 1
+
+@contextmanager
+def acquire_model(size=None, backend=None):
+    """Borrow a loaded whisper model of the given size and backend for the duration of the block.
+
+    Models are loaded once per process and kept resident. Up to
+    WHISPER_INSTANCES_PER_MODEL callers can use the same size at once; further
+    callers wait for an instance to be returned.
+    """
+    size = resolve_model_size(size)
+    backend = resolve_backend(backend)
+    key = (backend, size)
+    with _condition:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ModelPool(size, backend)
+        _pools.move_to_end(key)
+        while not pool.idle and pool.instances >= WHISPER_INSTANCES_PER_MODEL:
+            _condition.wait()
+        if pool.idle:
+            model = pool.idle.pop()
+        else:
+            model = None
+            # Reserve the slot before loading outside the lock
+            pool.instances += 1
+        pool.in_use += 1
+
+    if model is None:
+        try:
+            model, load_seconds = _load(size, backend)
+            pool.load_seconds = load_seconds
+        except Exception:
+            with _condition:
+                pool.instances -= 1
+                pool.in_use -= 1
+                _condition.notify_all()
+            raise
+
+    try:
+        yield model
+    finally:
+        with _condition:
+            pool.in_use -= 1
+            pool.last_used = time.time()
+            pool.idle.append(model)
+            _unload_idle_pools()
+            _condition.notify_all()
+
+def preload_models(sizes=None):
+    """Load the given (default: WHISPER_PRELOAD_MODELS) model sizes so the first requests do not pay for it."""
+    for size in sizes if sizes is not None else WHISPER_PRELOAD_MODELS:
+        try:
+            with acquire_model(size):
+                pass
+        except Exception as e:
+            logger.error(f"Failed to preload Whisper {size} model: {str(e)}")
+
+def get_loaded_models():
+    """Describe the model sizes currently resident in this process, keyed by backend/size."""
+    with _condition:
+        return {
+            f"{pool.backend}/{pool.size}": {
+                "size": pool.size,
+                "backend": pool.backend,
+                "instances": pool.instances,
+                "in_use": pool.in_use,
+                "load_seconds": round(pool.load_seconds, 3) if pool.load_seconds is not None else None,
+                "last_used": pool.last_used
+            }
+            for pool in _pools.values() if pool.instances
+        }
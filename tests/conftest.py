@@ -0,0 +1,104 @@
+import os
+import tempfile
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Services read their settings from the environment when they are imported, so
+# point the local stores at a scratch directory before any test imports them
+SCRATCH_DIR = tempfile.mkdtemp(prefix='nca-toolkit-tests-')
+os.environ.setdefault('API_KEY', 'test-api-key')
+os.environ['JOB_DB_PATH'] = os.path.join(SCRATCH_DIR, 'toolkit.db')
+os.environ['DOWNLOAD_CACHE_DIR'] = os.path.join(SCRATCH_DIR, 'download_cache')
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Downloads close connections early on purpose (cancelled segments, Range fallbacks)
+        pass
+
+class MediaServer:
+    """A local HTTP server for download tests that honours ETag revalidation and Range requests.
+
+    files maps paths to their content. ignore_range makes it answer Range
+    requests with the whole file, and cut_after drops the connection of the
+    next response after that many body bytes. requests records the headers
+    of every request received.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.etag = '"v1"'
+        self.ignore_range = False
+        self.cut_after = None
+        self.requests = []
+        self.lock = threading.Lock()
+        self.httpd = QuietHTTPServer(('127.0.0.1', 0), self._handler())
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def statuses(self):
+        return [request['status'] for request in self.requests]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                body = server.files.get(self.path)
+                request = dict(self.headers)
+                server.requests.append(request)
+                if body is None:
+                    request['status'] = 404
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if server.etag and self.headers.get('If-None-Match') == server.etag:
+                    request['status'] = 304
+                    self.send_response(304)
+                    self.send_header('ETag', server.etag)
+                    self.end_headers()
+                    return
+
+                status = 200
+                byte_range = self.headers.get('Range')
+                if_range = self.headers.get('If-Range')
+                if byte_range and not server.ignore_range and (if_range is None or if_range == server.etag):
+                    start, end = byte_range.split('=', 1)[1].split('-')
+                    start, end = int(start), int(end) if end else len(body) - 1
+                    status = 206
+                request['status'] = status
+                self.send_response(status)
+                if status == 206:
+                    self.send_header('Content-Range', f"bytes {start}-{end}/{len(body)}")
+                    body = body[start:end + 1]
+                self.send_header('Accept-Ranges', 'bytes')
+                if server.etag:
+                    self.send_header('ETag', server.etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+
+                with server.lock:
+                    limit, server.cut_after = server.cut_after, None
+                try:
+                    self.wfile.write(body if limit is None else body[:limit])
+                except OSError:
+                    return
+                if limit is not None:
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+@pytest.fixture
+def media_server():
+    server = MediaServer()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
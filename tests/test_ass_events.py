@@ -0,0 +1,139 @@
+import random
+import pytest
+from services.v1.video.caption_video import (
+    STYLE_HANDLERS, determine_alignment_code, process_subtitle_text, rgb_to_ass_color, format_ass_time
+)
+from services.transcription import generate_ass_subtitle
+
+RESOLUTION = (1920, 1080)
+VOCABULARY = ["the", "Caption", "render", "speed", "um", "per", "line", "transcript", "video", "audio"]
+
+def transcript(word_count=400, seed=0):
+    rng = random.Random(seed)
+    segments = []
+    t = 0.0
+    first = 0
+    while first < word_count:
+        words = []
+        for _ in range(min(rng.randint(1, 15), word_count - first)):
+            duration = rng.uniform(0.05, 0.8)
+            words.append({"word": " " + rng.choice(VOCABULARY), "start": t, "end": t + duration})
+            t += duration + rng.uniform(0.0, 0.3)
+        first += len(words)
+        segments.append({"start": words[0]["start"], "end": words[-1]["end"], "text": "".join(w["word"] for w in words), "words": words})
+    # A segment without word timings is skipped by the word based styles
+    segments.append({"start": t, "end": t + 1.0, "text": " no words", "words": []})
+    return {"segments": segments}
+
+# The generators as they were before the columnar rewrite, kept as reference output
+
+def previous_style(style, result, style_options, replace_dict):
+    max_words_per_line = int(style_options.get('max_words_per_line', 0))
+    all_caps = style_options.get('all_caps', False)
+    an_code, _, x, y = determine_alignment_code(
+        style_options.get('position', 'middle_center'), style_options.get('alignment', 'center'),
+        style_options.get('x'), style_options.get('y'), video_width=RESOLUTION[0], video_height=RESOLUTION[1]
+    )
+    word_color = rgb_to_ass_color(style_options.get('word_color', '#FFFF00'))
+    line_color = rgb_to_ass_color(style_options.get('line_color', '#FFFFFF'))
+    position_tag = f"{{\\an{an_code}\\pos({x},{y})}}"
+
+    def dialogue(start, end, text):
+        return f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},Default,,0,0,0,,{position_tag}{text}"
+
+    events = []
+    for segment in result['segments']:
+        words = segment.get('words', [])
+        if not words:
+            continue
+        step = max_words_per_line if max_words_per_line > 0 else len(words)
+        if style == 'karaoke':
+            lines = []
+            for i in range(0, len(words), step):
+                parts = [
+                    f"{{\\k{int(round((w['end'] - w['start']) * 100))}}}{process_subtitle_text(w['word'], replace_dict, all_caps, 0)} "
+                    for w in words[i:i + step]
+                ]
+                lines.append(''.join(parts).strip())
+            events.append(dialogue(words[0]['start'], words[-1]['end'], f"{{\\c{word_color}}}" + '\\N'.join(lines)))
+        elif style == 'word_by_word':
+            for w_info in words:
+                w = process_subtitle_text(w_info['word'], replace_dict, all_caps, 0)
+                if w:
+                    events.append(dialogue(w_info['start'], w_info['end'], f"{{\\c{word_color}}}{w}"))
+        else:
+            processed = [(process_subtitle_text(w['word'], replace_dict, all_caps, 0), w['start'], w['end']) for w in words]
+            processed = [p for p in processed if p[0]]
+            step = max_words_per_line if max_words_per_line > 0 else len(processed)
+            for line_set in [processed[i:i + step] for i in range(0, len(processed), step)]:
+                for idx, (_, w_start, w_end) in enumerate(line_set):
+                    line_words = []
+                    for w_idx, (w_text, _, _) in enumerate(line_set):
+                        if w_idx != idx:
+                            line_words.append(w_text)
+                        elif style == 'highlight':
+                            line_words.append(f"{{\\c{word_color}}}{w_text}{{\\c{line_color}}}")
+                        else:
+                            line_words.append(f"{{\\u1}}{w_text}{{\\u0}}")
+                    events.append(dialogue(w_start, w_end, f"{{\\c{line_color}}}" + ' '.join(line_words)))
+    return "\n".join(events)
+
+def previous_legacy(result, max_chars, words_per_line=None):
+    def format_time(t):
+        return f"{int(t // 3600)}:{int((t % 3600) // 60):02d}:{int(t % 60):02d}.{int(round((t - int(t)) * 100)):02d}"
+
+    ass_content = ""
+    for segment in result['segments']:
+        words = segment.get('words', [])
+        if not words:
+            continue
+        if words_per_line:
+            lines = [words[i:i + words_per_line] for i in range(0, len(words), words_per_line)]
+        else:
+            lines = []
+            current_line = []
+            current_line_length = 0
+            for word_info in words:
+                word_length = len(word_info['word']) + 1
+                if current_line_length + word_length > max_chars:
+                    lines.append(current_line)
+                    current_line = [word_info]
+                    current_line_length = word_length
+                else:
+                    current_line.append(word_info)
+                    current_line_length += word_length
+            if current_line:
+                lines.append(current_line)
+        for line in lines:
+            for i, word_info in enumerate(line):
+                end_time = line[i + 1]['start'] if i + 1 < len(line) else line[-1]['end']
+                caption = ' '.join((r'{\c&H00FFFF&}' if w == word_info else r'{\c&HFFFFFF&}') + w['word'] for w in line)
+                ass_content += f"Dialogue: 0,{format_time(word_info['start'])},{format_time(end_time)},Default,,0,0,0,,{caption}\n"
+    return ass_content
+
+@pytest.mark.parametrize('style', ['karaoke', 'highlight', 'underline', 'word_by_word'])
+@pytest.mark.parametrize('max_words_per_line', [0, 1, 4])
+@pytest.mark.parametrize('all_caps', [False, True])
+def test_caption_styles_match_previous_output(style, max_words_per_line, all_caps):
+    result = transcript()
+    style_options = {
+        'font_size': 48, 'max_words_per_line': max_words_per_line, 'all_caps': all_caps,
+        'position': 'bottom_left', 'word_color': '#00FF88', 'line_color': '#EEEEEE'
+    }
+    # "um" is replaced by nothing, so some words disappear from their line
+    replace_dict = {'um': '', 'caption': 'subtitle'}
+    expected = previous_style(style, result, dict(style_options), replace_dict)
+    actual = STYLE_HANDLERS[style](result, dict(style_options), replace_dict, RESOLUTION)
+    assert actual.encode() == expected.encode()
+
+@pytest.mark.parametrize('max_chars,words_per_line', [(56, None), (20, None), (56, 1), (56, 5)])
+def test_legacy_ass_writer_matches_previous_output(max_chars, words_per_line):
+    result = transcript()
+    expected = previous_legacy(result, max_chars, words_per_line)
+    assert generate_ass_subtitle(result, max_chars, words_per_line).encode() == expected.encode()
+
+def test_empty_transcript_has_no_events():
+    result = {"segments": [{"start": 0.0, "end": 1.0, "text": "", "words": []}]}
+    assert generate_ass_subtitle(result, 56) == previous_legacy(result, 56) == ""
+    for style in ('karaoke', 'highlight', 'underline', 'word_by_word'):
+        assert STYLE_HANDLERS[style](result, {'font_size': 48}, {}, RESOLUTION) == ""
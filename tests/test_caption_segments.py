@@ -0,0 +1,105 @@
+import os
+import pytest
+from services.v1.video import caption_segments
+from services.v1.video.caption_segments import parse_framecrc, plan_segments, plan_caption_render, render_caption_segments
+from services.encoding_profiles import EncodingProfile
+
+ASS = """[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Dialogue: 0,0:00:01.00,0:00:03.00,Default,,0,0,0,,Title
+Dialogue: 0,0:00:50.50,0:00:51.00,Default,,0,0,0,,Callout
+"""
+
+def video_stream(**overrides):
+    stream = {
+        "codec_type": "video", "codec_name": "h264", "profile": "High", "level": 41,
+        "width": 1280, "height": 720, "sample_aspect_ratio": "1:1", "pix_fmt": "yuv420p"
+    }
+    stream.update(overrides)
+    return stream
+
+def probe(stream):
+    return {"streams": [stream], "format": {"duration": "120.0", "start_time": "0.000000"}}
+
+def test_parse_framecrc_reads_video_packet_times():
+    output = "\n".join([
+        "#tb 0: 1/90000",
+        "#tb 1: 1/48000",
+        "0,          0,          0,     3000,      100, 0x00000000",
+        "1,          0,          0,     1024,       10, 0x00000000",
+        "0,     450000,     450000,     3000,      100, 0x00000000",
+        "0,     -9223372036854775808, -9223372036854775808, 3000, 100, 0x00000000"
+    ])
+    assert parse_framecrc(output) == [0.0, 5.0]
+
+def test_plan_segments_widens_events_to_keyframes_and_copies_gaps():
+    keyframes = [0.0, 4.0, 10.0, 50.0, 52.0, 90.0]
+    segments = plan_segments([(1.0, 3.0), (50.5, 51.0)], keyframes, 120.0)
+    assert segments == [(0.0, 4.0, True), (4.0, 50.0, False), (50.0, 52.0, True), (52.0, 120.0, False)]
+
+def test_plan_segments_merges_short_gaps():
+    segments = plan_segments([(1.0, 3.0), (4.5, 5.0)], [0.0, 4.0, 6.0], 20.0)
+    assert segments == [(0.0, 6.0, True), (6.0, 20.0, False)]
+
+@pytest.mark.parametrize("overrides", [
+    {"profile": "High 10"},
+    {"pix_fmt": "yuv422p"},
+    {"codec_name": "hevc"},
+    {"level": -99}
+])
+def test_plan_caption_render_falls_back_for_unmatchable_sources(mocker, overrides):
+    mocker.patch.object(caption_segments.ffmpeg, 'probe', return_value=probe(video_stream(**overrides)))
+    keyframes = mocker.patch.object(caption_segments, 'keyframe_times', return_value=[0.0, 4.0])
+    segments, reason = plan_caption_render('video.mp4', ASS, 'segments')
+    assert segments is None
+    assert reason
+    keyframes.assert_not_called()
+
+def test_plan_caption_render_falls_back_without_idr_frames(mocker):
+    mocker.patch.object(caption_segments.ffmpeg, 'probe', return_value=probe(video_stream()))
+    mocker.patch.object(caption_segments, 'keyframe_times', return_value=[])
+    assert plan_caption_render('video.mp4', ASS, 'segments')[0] is None
+
+def test_plan_caption_render_plans_segments_at_idr_frames(mocker):
+    mocker.patch.object(caption_segments.ffmpeg, 'probe', return_value=probe(video_stream(profile="Constrained Baseline")))
+    mocker.patch.object(caption_segments, 'keyframe_times', return_value=[0.0, 4.0, 50.0, 52.0])
+    segments, _ = plan_caption_render('video.mp4', ASS, 'auto')
+    assert [encode for _, _, encode in segments] == [True, False, True, False]
+
+def fake_run(commands):
+    def run(cmd):
+        commands.append(cmd)
+        output = cmd[-1]
+        if output.endswith('copy%05d.ts'):
+            pieces = len(cmd[cmd.index('-segment_times') + 1].split(',')) + 1
+            for index in range(pieces):
+                open(output % index, 'w').close()
+        else:
+            open(output, 'w').close()
+    return run
+
+def test_render_caption_segments_encodes_with_source_parameters(mocker, tmp_path):
+    commands = []
+    mocker.patch.object(caption_segments, '_run', side_effect=fake_run(commands))
+    mocker.patch.object(caption_segments.ffmpeg, 'probe', return_value=probe(video_stream(sample_aspect_ratio="4:3")))
+    mocker.patch('services.encoding_profiles.available_video_encoder', return_value='libx264')
+    segments = [(0.0, 4.0, True), (4.0, 50.0, False), (50.0, 52.0, True), (52.0, 120.0, False)]
+
+    summary = render_caption_segments('video.mp4', 'captions.ass', str(tmp_path / 'out.mp4'), segments, EncodingProfile('fast', 'veryfast', 23), 'job')
+
+    encodes = [cmd for cmd in commands if '-vf' in cmd]
+    assert len(encodes) == 2
+    for cmd in encodes:
+        assert cmd[cmd.index('-profile:v') + 1] == 'high'
+        assert cmd[cmd.index('-level:v') + 1] == '4.1'
+        assert cmd[cmd.index('-vf') + 1].endswith('setsar=4/3')
+    assert summary == {"encoded_segments": 2, "encoded_seconds": 6.0, "copied_segments": 2, "copied_seconds": 114.0}
+
+def test_render_caption_segments_rejects_mismatched_segments(mocker, tmp_path):
+    mocker.patch.object(caption_segments, '_run', side_effect=fake_run([]))
+    mocker.patch.object(caption_segments.ffmpeg, 'probe', side_effect=lambda path, **kwargs: probe(
+        video_stream(profile="Main") if os.path.basename(path).startswith('encoded') else video_stream()
+    ))
+    mocker.patch('services.encoding_profiles.available_video_encoder', return_value='libx264')
+    with pytest.raises(RuntimeError):
+        render_caption_segments('video.mp4', 'captions.ass', str(tmp_path / 'out.mp4'), [(0.0, 4.0, True), (4.0, 10.0, False)], EncodingProfile('fast', 'veryfast', 23), 'job')
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import threading
+import subprocess
+import pytest
+from services import download_cache
+from services.download_cache import fetch, evict, sweep_partials, get_cache_stats, _connection, _url_key, _url_lock
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    conn = _connection()
+    conn.execute("DELETE FROM download_cache")
+    conn.execute("DELETE FROM download_cache_stats")
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_unchanged_files_are_served_from_the_cache(media_server, tmp_path):
+    media_server.files['/a.mp4'] = os.urandom(100_000)
+    url = media_server.url('/a.mp4')
+
+    assert fetch(url, str(tmp_path / 'first.mp4'))['cache_hit'] is False
+    assert fetch(url, str(tmp_path / 'second.mp4'))['cache_hit'] is True
+
+    assert read(tmp_path / 'second.mp4') == media_server.files['/a.mp4']
+    assert media_server.requests[-1]['If-None-Match'] == '"v1"'
+    assert media_server.statuses() == [200, 304]
+    stats = get_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['bytes_saved'], stats['files']) == (1, 1, 100_000, 1)
+
+def test_changed_files_are_downloaded_again(media_server, tmp_path):
+    media_server.files['/a.mp4'] = b'old' * 1000
+    url = media_server.url('/a.mp4')
+    fetch(url, str(tmp_path / 'old.mp4'))
+
+    media_server.files['/a.mp4'] = b'new' * 1000
+    media_server.etag = '"v2"'
+    assert fetch(url, str(tmp_path / 'new.mp4'))['cache_hit'] is False
+    assert read(tmp_path / 'new.mp4') == b'new' * 1000
+    # The superseded copy is no longer stored
+    assert get_cache_stats()['files'] == 1
+
+def test_files_without_validators_are_not_cached(media_server, tmp_path):
+    media_server.etag = None
+    media_server.files['/a.mp4'] = b'data' * 1000
+    url = media_server.url('/a.mp4')
+    fetch(url, str(tmp_path / 'first.mp4'))
+    assert fetch(url, str(tmp_path / 'second.mp4'))['cache_hit'] is False
+    assert get_cache_stats()['files'] == 0
+
+def test_concurrent_fetches_of_a_url_download_it_once(media_server, tmp_path):
+    media_server.files['/a.mp4'] = os.urandom(500_000)
+    url = media_server.url('/a.mp4')
+    errors = []
+
+    def run(index):
+        try:
+            fetch(url, str(tmp_path / f"{index}.mp4"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(media_server.statuses()) == [200, 304, 304, 304]
+    for index in range(4):
+        assert read(tmp_path / f"{index}.mp4") == media_server.files['/a.mp4']
+
+def test_least_recently_used_files_are_evicted(media_server, tmp_path):
+    for name in ('a', 'b', 'c'):
+        media_server.files[f"/{name}.mp4"] = os.urandom(10_000)
+        fetch(media_server.url(f"/{name}.mp4"), str(tmp_path / f"{name}.mp4"))
+        time.sleep(0.01)
+    # Using a makes b the least recently used
+    fetch(media_server.url('/a.mp4'), str(tmp_path / 'a2.mp4'))
+
+    evict(max_bytes=20_000)
+    cached = {row['url'] for row in _connection().execute("SELECT url FROM download_cache")}
+    assert cached == {media_server.url('/a.mp4'), media_server.url('/c.mp4')}
+    assert get_cache_stats()['evictions'] == 1
+    # Files already handed out stay intact
+    assert read(tmp_path / 'b.mp4') == media_server.files['/b.mp4']
+
+def make_partial(url, age, owner_pid, claimed_at=None):
+    base = os.path.join(download_cache.DOWNLOAD_CACHE_DIR, f".{_url_key(url)}")
+    with open(f"{base}.part", 'wb') as f:
+        f.write(b'x' * 8192)
+    with open(f"{base}.part.json", 'w') as f:
+        json.dump({"url": url, "owner_pid": owner_pid, "claimed_at": claimed_at or time.time() - age}, f)
+    for path in (f"{base}.part", f"{base}.part.json"):
+        os.utime(path, (time.time() - age, time.time() - age))
+    return f"{base}.part"
+
+def test_abandoned_partial_downloads_are_swept():
+    process = subprocess.Popen(['true'])
+    process.wait()
+    abandoned = make_partial('https://example.com/abandoned.mp4', 3600, process.pid)
+    recent = make_partial('https://example.com/recent.mp4', 0, process.pid)
+    # A download stalled for a long time whose worker is still alive
+    running = make_partial('https://example.com/running.mp4', 3600, os.getpid(), time.time())
+    locked = make_partial('https://example.com/locked.mp4', 3600, process.pid)
+
+    with _url_lock('https://example.com/locked.mp4'):
+        held = sweep_partials(ttl=60)
+
+    assert not os.path.exists(abandoned)
+    assert not os.path.exists(f"{abandoned}.json")
+    for path in (recent, running, locked):
+        assert os.path.exists(path)
+    assert held >= 3 * 8192
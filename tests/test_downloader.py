@@ -0,0 +1,88 @@
+import os
+import hashlib
+import pytest
+import requests
+from services import downloader
+from services.downloader import download
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(downloader, 'DOWNLOAD_SEGMENT_BYTES', 64 * 1024)
+    monkeypatch.setattr(downloader, 'DOWNLOAD_BUFFER_BYTES', 16 * 1024)
+    monkeypatch.setattr(downloader, 'DOWNLOAD_CONNECTIONS', 4)
+    monkeypatch.setattr(downloader.time, 'sleep', lambda seconds: None)
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_large_files_are_fetched_over_parallel_ranges(media_server, tmp_path):
+    media_server.files['/a.mp4'] = os.urandom(1024 * 1024)
+    stats = download(media_server.url('/a.mp4'), str(tmp_path / 'a.mp4'))
+
+    assert read(tmp_path / 'a.mp4') == media_server.files['/a.mp4']
+    assert stats['connections'] == 4
+    assert stats['bytes'] == 1024 * 1024
+    ranges = sorted(request['Range'] for request in media_server.requests if 'Range' in request)
+    assert len(ranges) == 4
+    assert all(request.get('If-Range') == '"v1"' for request in media_server.requests if 'Range' in request)
+
+def test_dropped_connection_resumes_where_it_stopped(media_server, tmp_path):
+    media_server.files['/a.mp4'] = os.urandom(48 * 1024)
+    media_server.cut_after = 32 * 1024
+    stats = download(media_server.url('/a.mp4'), str(tmp_path / 'a.mp4'))
+
+    assert read(tmp_path / 'a.mp4') == media_server.files['/a.mp4']
+    assert stats['connections'] == 1
+    assert media_server.requests[-1]['Range'] == f"bytes={32 * 1024}-{48 * 1024 - 1}"
+
+def test_failed_download_resumes_on_the_next_attempt(media_server, tmp_path, monkeypatch):
+    media_server.files['/a.mp4'] = os.urandom(48 * 1024)
+    url = media_server.url('/a.mp4')
+    monkeypatch.setattr(downloader, 'DOWNLOAD_RETRIES', 0)
+    media_server.cut_after = 32 * 1024
+    with pytest.raises(requests.RequestException):
+        download(url, str(tmp_path / 'first.mp4'))
+
+    # The next attempt picks up the partial copy whatever path it downloads to
+    stats = download(url, str(tmp_path / 'second.mp4'))
+    assert read(tmp_path / 'second.mp4') == media_server.files['/a.mp4']
+    assert stats['resumed_bytes'] == 32 * 1024
+    assert media_server.requests[-1]['Range'] == f"bytes={32 * 1024}-{48 * 1024 - 1}"
+
+def test_partial_copy_of_a_changed_file_is_discarded(media_server, tmp_path, monkeypatch):
+    media_server.files['/a.mp4'] = os.urandom(48 * 1024)
+    url = media_server.url('/a.mp4')
+    monkeypatch.setattr(downloader, 'DOWNLOAD_RETRIES', 0)
+    media_server.cut_after = 32 * 1024
+    with pytest.raises(requests.RequestException):
+        download(url, str(tmp_path / 'first.mp4'))
+
+    media_server.files['/a.mp4'] = os.urandom(48 * 1024)
+    media_server.etag = '"v2"'
+    stats = download(url, str(tmp_path / 'second.mp4'))
+    assert read(tmp_path / 'second.mp4') == media_server.files['/a.mp4']
+    assert stats['resumed_bytes'] == 0
+
+def test_servers_ignoring_range_fall_back_to_one_connection(media_server, tmp_path):
+    media_server.files['/a.mp4'] = os.urandom(512 * 1024)
+    media_server.ignore_range = True
+    stats = download(media_server.url('/a.mp4'), str(tmp_path / 'a.mp4'))
+
+    assert read(tmp_path / 'a.mp4') == media_server.files['/a.mp4']
+    assert stats['connections'] == 1
+    # One restart with Range requests, then a single plain GET
+    assert 'Range' not in media_server.requests[-1]
+    assert len(media_server.requests) <= 2 * (downloader.RANGE_RESTARTS + 1) * 4
+    key = hashlib.sha256(media_server.url('/a.mp4').encode()).hexdigest()
+    assert not [name for name in os.listdir(downloader.DOWNLOAD_PARTIAL_DIR) if name.startswith(f".{key}")]
+
+def test_weak_etags_are_not_used_for_if_range(media_server, tmp_path):
+    media_server.files['/a.mp4'] = os.urandom(256 * 1024)
+    media_server.etag = 'W/"v1"'
+    download(media_server.url('/a.mp4'), str(tmp_path / 'a.mp4'))
+
+    assert read(tmp_path / 'a.mp4') == media_server.files['/a.mp4']
+    ranged = [request for request in media_server.requests if 'Range' in request]
+    assert ranged
+    assert not any('If-Range' in request for request in ranged)
@@ -0,0 +1,79 @@
+import time
+import threading
+from services import job_executor
+from services.job_executor import JobExecutor, get_pool_name
+from services.queue_backend import MemoryQueueBackend
+
+def make_job(job_id, path):
+    return {
+        "job_id": job_id,
+        "data": {},
+        "endpoint": path,
+        "path": path,
+        "view_args": {},
+        "queue_start_time": time.time(),
+        "priority": 5,
+        "flow": f"default:{path}",
+        "weight": 1.0,
+        "expected_cost": 60.0
+    }
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_endpoints_are_routed_to_their_pool():
+    assert get_pool_name('/gdrive-upload') == 'io'
+    assert get_pool_name('/v1/toolkit/test') == 'io'
+    assert get_pool_name('/v1/media/transcribe') == 'cpu'
+    assert get_pool_name('/v1/video/caption') == 'cpu'
+
+def test_io_jobs_are_not_blocked_by_a_busy_cpu_pool(monkeypatch):
+    monkeypatch.setattr(job_executor, 'POOL_SIZES', {'cpu': 1, 'io': 2})
+    release = threading.Event()
+    ran = {}
+
+    def handler(job, pool):
+        ran[job['job_id']] = pool.name
+        if job['job_id'] == 'encode':
+            release.wait(5)
+
+    executor = JobExecutor(handler, MemoryQueueBackend())
+    executor.start()
+    try:
+        assert executor.submit('/v1/video/caption', make_job('encode', '/v1/video/caption')).name == 'cpu'
+        wait_for(lambda: 'encode' in ran)
+        executor.submit('/gdrive-upload', make_job('upload', '/gdrive-upload'))
+        executor.submit('/v1/media/transcribe', make_job('transcribe', '/v1/media/transcribe'))
+        wait_for(lambda: 'upload' in ran)
+
+        assert ran == {'encode': 'cpu', 'upload': 'io'}
+        assert executor.stats()['cpu'] == {"workers": 1, "active": 1, "queue_length": 1}
+    finally:
+        release.set()
+    wait_for(lambda: 'transcribe' in ran)
+    assert ran['transcribe'] == 'cpu'
+
+def test_pool_runs_up_to_its_size_concurrently(monkeypatch):
+    monkeypatch.setattr(job_executor, 'POOL_SIZES', {'cpu': 2, 'io': 1})
+    release = threading.Event()
+    running = []
+
+    def handler(job, pool):
+        running.append(job['job_id'])
+        release.wait(5)
+
+    executor = JobExecutor(handler, MemoryQueueBackend())
+    executor.start()
+    try:
+        for job_id in ('a', 'b', 'c'):
+            executor.submit('/v1/video/caption', make_job(job_id, '/v1/video/caption'))
+        wait_for(lambda: len(running) == 2)
+        time.sleep(0.1)
+        assert len(running) == 2
+        assert executor.get_pool('/v1/video/caption').active_count() == 2
+    finally:
+        release.set()
+    wait_for(lambda: len(running) == 3)
@@ -0,0 +1,108 @@
+import os
+import time
+import subprocess
+import pytest
+from services import queue_backend
+from services.queue_backend import SQLiteQueueBackend
+from services.sqlite_store import get_connection
+from services.job_registry import register_job, get_job
+
+@pytest.fixture
+def backend():
+    conn = get_connection()
+    for table in ('job_queue', 'scheduler_flows', 'scheduler_pools'):
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    return SQLiteQueueBackend()
+
+def make_job(job_id, pool='cpu', **fields):
+    job = {
+        "job_id": job_id,
+        "pool": pool,
+        "data": {"media_url": "https://example.com/a.mp4"},
+        "endpoint": "v1_media_transcribe.transcribe",
+        "path": "/v1/media/transcribe",
+        "view_args": {},
+        "queue_start_time": time.time(),
+        "priority": 5,
+        "flow": "default:/v1/media/transcribe",
+        "weight": 1.0,
+        "expected_cost": 60.0
+    }
+    job.update(fields)
+    return job
+
+def dead_pid():
+    process = subprocess.Popen(['true'])
+    process.wait()
+    return process.pid
+
+def orphan(job_id):
+    """Make a claimed job look like it was running in a worker that has since died."""
+    get_connection().execute("UPDATE job_queue SET owner_pid = ? WHERE job_id = ?", (dead_pid(), job_id))
+
+def test_jobs_are_shared_by_every_worker(backend):
+    other_worker = SQLiteQueueBackend()
+    backend.put(make_job('a'))
+    assert other_worker.qsize('cpu') == 1
+    assert backend.qsize('io') == 0
+
+    job = other_worker.get('cpu', timeout=1)
+    assert job['job_id'] == 'a'
+    assert job['data'] == {"media_url": "https://example.com/a.mp4"}
+    assert backend.qsize('cpu') == 0
+    assert backend.get('cpu', timeout=0.1) is None
+
+    other_worker.complete(job)
+    assert get_connection().execute("SELECT COUNT(*) FROM job_queue").fetchone()[0] == 0
+
+def test_jobs_of_a_dead_worker_are_requeued(backend):
+    backend.put(make_job('a'))
+    assert backend.get('cpu', timeout=1)['job_id'] == 'a'
+    orphan('a')
+
+    backend.recover_orphaned_jobs()
+    assert backend.qsize('cpu') == 1
+    assert backend.get('cpu', timeout=1)['job_id'] == 'a'
+    row = get_connection().execute("SELECT attempts, owner_pid FROM job_queue WHERE job_id = 'a'").fetchone()
+    assert row['attempts'] == 2
+    assert row['owner_pid'] == os.getpid()
+
+def test_jobs_of_a_live_worker_are_left_running(backend):
+    backend.put(make_job('a'))
+    backend.get('cpu', timeout=1)
+    backend.recover_orphaned_jobs()
+    assert backend.qsize('cpu') == 0
+    assert backend.get('cpu', timeout=0.1) is None
+
+def test_jobs_interrupted_too_often_are_dropped_and_marked_failed(backend, monkeypatch):
+    monkeypatch.setattr(queue_backend, 'QUEUE_MAX_ATTEMPTS', 2)
+    register_job('a', '/v1/media/transcribe', 'cpu')
+    backend.put(make_job('a'))
+    for _ in range(2):
+        backend.get('cpu', timeout=1)
+        orphan('a')
+        backend.recover_orphaned_jobs()
+
+    assert get_connection().execute("SELECT COUNT(*) FROM job_queue").fetchone()[0] == 0
+    job = get_job('a')
+    assert job['status'] == 'failed'
+    assert job['code'] == 500
+
+def test_tables_from_before_scheduling_are_migrated(backend):
+    conn = get_connection()
+    conn.execute("DROP TABLE job_queue")
+    conn.execute("""
+        CREATE TABLE job_queue (
+            job_id TEXT PRIMARY KEY,
+            pool TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            enqueued_at REAL NOT NULL,
+            claimed_at REAL,
+            owner_pid INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    backend = SQLiteQueueBackend()
+    backend.put(make_job('a', priority=9))
+    assert backend.get('cpu', timeout=1)['priority'] == 9
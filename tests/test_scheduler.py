@@ -0,0 +1,96 @@
+import threading
+from services import scheduler
+from services.scheduler import select_next_job, charge_flow, estimate_job_cost, estimate_job_cost_later, DEFAULT_JOB_COST
+from services.queue_backend import MemoryQueueBackend
+
+NOW = 1_000_000.0
+
+def make_job(job_id, flow='default:/v1/media/transcribe', priority=5, expected_cost=60.0, waited=0.0, weight=1.0):
+    return {
+        "job_id": job_id,
+        "pool": "cpu",
+        "priority": priority,
+        "flow": flow,
+        "weight": weight,
+        "expected_cost": expected_cost,
+        "queue_start_time": NOW - waited
+    }
+
+def dispatch_order(jobs):
+    """Drain the jobs with the scheduler the way the queue backends do and return their ids in order."""
+    jobs = list(jobs)
+    finish_tags = {}
+    virtual_time = 0.0
+    order = []
+    while jobs:
+        job, start_tag = select_next_job(jobs, finish_tags, virtual_time, now=NOW)
+        jobs.remove(job)
+        finish_tags[job['flow']] = charge_flow(job, start_tag)
+        virtual_time = start_tag
+        order.append(job['job_id'])
+    return order
+
+def test_higher_priority_lane_runs_first():
+    jobs = [make_job('cheap', expected_cost=1.0, waited=1000), make_job('urgent', priority=9, expected_cost=500.0)]
+    assert dispatch_order(jobs) == ['urgent', 'cheap']
+
+def test_shortest_job_runs_first_within_a_flow():
+    jobs = [make_job('long', expected_cost=300.0, waited=1), make_job('short', expected_cost=30.0)]
+    assert dispatch_order(jobs) == ['short', 'long']
+
+def test_aged_jobs_overtake_shorter_ones():
+    # 600s of expected work that waited four aging periods counts as 120s
+    aged = make_job('aged', expected_cost=600.0, waited=4 * scheduler.SCHEDULER_AGING_SECONDS)
+    fresh = make_job('fresh', expected_cost=150.0)
+    assert dispatch_order([fresh, aged]) == ['aged', 'fresh']
+    assert dispatch_order([fresh, make_job('new', expected_cost=600.0)]) == ['fresh', 'new']
+
+def test_flows_share_the_pool_fairly():
+    busy = [make_job(f"busy{i}", flow='busy:/v1/video/caption') for i in range(4)]
+    quiet = [make_job(f"quiet{i}", flow='quiet:/v1/video/caption') for i in range(2)]
+    order = dispatch_order(busy + quiet)
+    assert [job_id.rstrip('0123456789') for job_id in order[:4]] == ['busy', 'quiet', 'busy', 'quiet']
+
+def test_flow_weights_set_the_share():
+    heavy = [make_job(f"heavy{i}", flow='heavy', weight=2.0) for i in range(4)]
+    light = [make_job(f"light{i}", flow='light') for i in range(4)]
+    order = dispatch_order(light + heavy)
+    assert [job_id.rstrip('0123456789') for job_id in order[:6]].count('heavy') == 4
+
+def test_memory_backend_uses_updated_costs():
+    backend = MemoryQueueBackend()
+    backend.put(make_job('a', expected_cost=60.0))
+    backend.put(make_job('b', expected_cost=60.0))
+    backend.set_expected_cost('a', 600.0)
+    assert backend.get('cpu', timeout=1)['job_id'] == 'b'
+
+def test_estimate_scales_probed_duration_by_endpoint(monkeypatch):
+    monkeypatch.setattr(scheduler, 'probe_media_duration', lambda url: 100.0)
+    assert estimate_job_cost('/v1/media/transcribe', {"media_url": "https://example.com/a.mp4"}) == 50.0
+    assert estimate_job_cost('/v1/video/concatenate', {"video_urls": [{"video_url": "https://a"}, {"video_url": "https://b"}]}) == 10.0
+    assert estimate_job_cost('/v1/media/transcribe', {}) == DEFAULT_JOB_COST
+
+def test_only_remote_media_is_probed(monkeypatch):
+    def run(*args, **kwargs):
+        raise AssertionError("ffprobe should not run")
+    monkeypatch.setattr(scheduler.subprocess, 'run', run)
+    assert scheduler.probe_media_duration('file:///etc/passwd') is None
+    assert estimate_job_cost('/v1/media/transcribe', {"media_url": "/tmp/local.mp4"}) == DEFAULT_JOB_COST
+
+def test_estimate_runs_in_the_background(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    def probe(url):
+        started.set()
+        release.wait(5)
+        return 10.0
+    monkeypatch.setattr(scheduler, 'probe_media_duration', probe)
+    estimates = []
+    done = threading.Event()
+
+    estimate_job_cost_later('/v1/video/caption', {"video_url": "https://example.com/a.mp4"}, lambda cost: (estimates.append(cost), done.set()))
+    assert started.wait(5)
+    assert estimates == []
+    release.set()
+    assert done.wait(5)
+    assert estimates == [10.0]
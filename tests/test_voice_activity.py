@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from services import voice_activity
+from services.voice_activity import detect_speech, clip_timestamps, frame_features, SAMPLE_RATE
+
+def tone(seconds, frequency, amplitude=0.3):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+def noise(seconds, rng, amplitude=0.001):
+    return (amplitude * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+def assert_regions(actual, expected, tolerance=0.05):
+    assert len(actual) == len(expected), actual
+    for (start, end), (expected_start, expected_end) in zip(actual, expected):
+        assert abs(start - expected_start) <= tolerance, actual
+        assert abs(end - expected_end) <= tolerance, actual
+
+def test_voice_band_regions_are_detected_with_padding(rng):
+    audio = np.concatenate([noise(2, rng), tone(2, 1000), noise(3, rng), tone(1.5, 800), noise(2, rng)])
+    pad = voice_activity.VAD_PAD_SECONDS
+    assert_regions(detect_speech(audio), [(2 - pad, 4 + pad), (7 - pad, 8.5 + pad)])
+
+def test_loud_audio_outside_the_voice_band_is_skipped(rng):
+    audio = np.concatenate([noise(2, rng), tone(3, 100), noise(2, rng), tone(1, 1000), noise(2, rng)])
+    pad = voice_activity.VAD_PAD_SECONDS
+    assert_regions(detect_speech(audio), [(7 - pad, 8 + pad)])
+
+def test_close_regions_are_merged_and_short_ones_dropped(rng, monkeypatch):
+    monkeypatch.setattr(voice_activity, 'VAD_PAD_SECONDS', 0.0)
+    audio = np.concatenate([
+        noise(2, rng), tone(1, 1000), noise(0.5, rng), tone(1, 1000), noise(3, rng), tone(0.1, 1000), noise(2, rng)
+    ])
+    assert_regions(detect_speech(audio), [(2, 4.5)])
+
+def test_silence_has_no_speech(rng):
+    assert detect_speech(noise(5, rng)) == []
+    assert detect_speech(np.zeros(0, dtype=np.float32)) == []
+
+def test_features_do_not_depend_on_the_block_size(rng, monkeypatch):
+    audio = np.concatenate([noise(1, rng), tone(1, 1000), noise(1, rng)])
+    energy, ratio = frame_features(audio)
+    monkeypatch.setattr(voice_activity, 'BLOCK_FRAMES', 7)
+    blocked_energy, blocked_ratio = frame_features(audio)
+    np.testing.assert_allclose(energy, blocked_energy, rtol=1e-5)
+    np.testing.assert_allclose(ratio, blocked_ratio, rtol=1e-5)
+
+def test_clip_timestamps_are_relative_to_the_window():
+    regions = [(1.0, 3.0), (10.0, 12.5), (20.0, 25.0)]
+    assert clip_timestamps(regions) == [1.0, 3.0, 10.0, 12.5, 20.0, 25.0]
+    # Regions are cut at the window edges and those outside it are left out
+    assert clip_timestamps(regions, 2.0, 11.0) == [0.0, 1.0, 8.0, 9.0]
+    assert clip_timestamps(regions, 13.0, 19.0) == []
+    assert clip_timestamps(regions, 22.0) == [0.0, 3.0]
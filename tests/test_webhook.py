@@ -0,0 +1,104 @@
+import json
+import pytest
+from services import webhook
+from services.webhook import send_webhook, purge_failed_deliveries, _claim_delivery, _deliver, _connection
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+class Session:
+    """Records posted payloads and answers with the queued status codes (default 200)."""
+
+    def __init__(self):
+        self.posted = []
+        self.statuses = []
+
+    def post(self, url, data, headers, timeout):
+        self.posted.append(json.loads(data))
+        return Response(self.statuses.pop(0) if self.statuses else 200)
+
+@pytest.fixture
+def session(monkeypatch):
+    conn = _connection()
+    conn.execute("DELETE FROM webhook_outbox")
+    conn.execute("DELETE FROM webhook_stats")
+    # Deliveries are driven by the test instead of the dispatcher threads
+    monkeypatch.setattr(webhook, 'start_dispatcher', lambda: None)
+    session = Session()
+    monkeypatch.setattr(webhook, 'get_session', lambda: session)
+    return session
+
+def label(delivery):
+    payload = json.loads(delivery['payload'])
+    return f"{payload['job_id']}:{payload.get('sequence', 'final')}"
+
+def partial(job_id, sequence):
+    return {"job_id": job_id, "partial": True, "sequence": sequence}
+
+def test_webhooks_of_a_job_are_delivered_one_at_a_time_in_order(session):
+    send_webhook('https://example.com/hook', partial('a', 1))
+    send_webhook('https://example.com/hook', partial('a', 2))
+    send_webhook('https://example.com/hook', {"job_id": "b"})
+
+    first = _claim_delivery()
+    second = _claim_delivery()
+    assert [label(first), label(second)] == ['a:1', 'b:final']
+    # a:2 waits until a:1 has been delivered
+    assert _claim_delivery() is None
+
+    _deliver(first)
+    third = _claim_delivery()
+    assert label(third) == 'a:2'
+    _deliver(second)
+    _deliver(third)
+    assert [payload['job_id'] for payload in session.posted] == ['a', 'b', 'a']
+    assert webhook.get_webhook_metrics()['delivered'] == 3
+
+def test_final_webhook_drops_pending_partials(session):
+    send_webhook('https://example.com/hook', partial('a', 1))
+    sending = _claim_delivery()
+    send_webhook('https://example.com/hook', partial('a', 2))
+    send_webhook('https://example.com/hook', partial('a', 3))
+    send_webhook('https://example.com/hook', {"job_id": "a"})
+
+    # The partial already being sent is kept; the unsent ones are superseded
+    assert _claim_delivery() is None
+    _deliver(sending)
+    final = _claim_delivery()
+    assert label(final) == 'a:final'
+    _deliver(final)
+    assert [payload.get('sequence') for payload in session.posted] == [1, None]
+
+def test_retried_webhook_still_blocks_later_ones_of_its_job(session, monkeypatch):
+    monkeypatch.setattr(webhook, 'WEBHOOK_RETRY_BASE_DELAY', 0)
+    session.statuses = [503]
+    send_webhook('https://example.com/hook', partial('a', 1))
+    sending = _claim_delivery()
+    send_webhook('https://example.com/hook', {"job_id": "a"})
+
+    _deliver(sending)
+    retry = _claim_delivery()
+    assert label(retry) == 'a:1'
+    assert retry['attempts'] == 1
+    _deliver(retry)
+    assert label(_claim_delivery()) == 'a:final'
+
+def test_undeliverable_webhooks_do_not_block_and_are_purged(session):
+    session.statuses = [404]
+    send_webhook('https://example.com/hook', partial('a', 1))
+    sending = _claim_delivery()
+    send_webhook('https://example.com/hook', {"job_id": "a"})
+
+    _deliver(sending)
+    assert label(_claim_delivery()) == 'a:final'
+    assert webhook.get_webhook_metrics()['undeliverable'] == 1
+
+    assert purge_failed_deliveries() == 0
+    assert purge_failed_deliveries(retention=-1) == 1
+    statuses = [row['status'] for row in _connection().execute("SELECT status FROM webhook_outbox")]
+    assert statuses == ['sending']
+
+def test_webhook_without_url_is_not_queued(session):
+    send_webhook(None, {"job_id": "a"})
+    assert _claim_delivery() is None